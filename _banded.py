@@ -0,0 +1,130 @@
+"""
+This script is used to store cohort x year matrices of the capacity flow as cohort x age bands
+
+It contains:
+- BandedCohortMatrix: a square [cohort, year] matrix stored as [cohort, age] for the ages inside the band,
+  plus one value per cohort for the years before its installation and one for the years after the band
+- get_band_width: the number of ages to keep so that the dropped tail of the lifetime pdfs is below a tolerance
+
+Memory grows with (number of cohorts x band width) instead of (number of years) ** 2.
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+import numpy as np
+
+"""
+==============
+Define classes
+==============
+"""
+class BandedCohortMatrix:
+    """
+    This class is used to hold a [cohort, year] matrix M where cohort j is installed in year j
+
+    Arguments:
+    ----------
+    values: np.ndarray
+        [n, width] array, values[j, a] = M[j, j + a]; ages beyond the horizon are ignored
+    before: np.ndarray
+        [n] value of M[j, i] for the years i < j (defaults to 0)
+    after: np.ndarray
+        [n] value of M[j, i] for the years i >= j + width (defaults to 0)
+    """
+    def __init__(self, values, before=None, after=None):
+        self.values = np.asarray(values, dtype=float)
+        self.n, self.width = self.values.shape
+        # drop the ages falling beyond the last year
+        self.values = np.where(self.year_index() < self.n, self.values, 0.0)
+        self.before = np.zeros(self.n) if before is None else np.asarray(before, dtype=float)
+        self.after = np.zeros(self.n) if after is None else np.asarray(after, dtype=float)
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def shape(self):
+        return (self.n, self.n)
+
+    def __repr__(self):
+        return 'BandedCohortMatrix(n={}, width={})'.format(self.n, self.width)
+
+    def year_index(self):
+        """[n, width] calendar year index of each band entry"""
+        return np.arange(self.n)[:, None] + np.arange(self.width)[None, :]
+
+    def to_dense(self):
+        """Full [cohort, year] matrix"""
+        cohort = np.arange(self.n)[:, None]
+        age = np.arange(self.n)[None, :] - cohort
+        dense = np.where(age < 0, self.before[:, None], np.where(age >= self.width, self.after[:, None], 0.0))
+        year = self.year_index()
+        inside = year < self.n
+        dense[np.broadcast_to(cohort, year.shape)[inside], year[inside]] = self.values[inside]
+        return dense
+
+    def scale_rows(self, factor):
+        """Multiply each cohort by a factor"""
+        factor = np.asarray(factor, dtype=float)
+        return BandedCohortMatrix(self.values * factor[:, None], self.before * factor, self.after * factor)
+
+    def survivors(self, inflow):
+        """Stock of each cohort by year: inflow minus the cumulative outflow (self is the outflow)"""
+        inflow = np.asarray(inflow, dtype=float)
+        return BandedCohortMatrix(inflow[:, None] - np.cumsum(self.values, axis=1),
+                                  before=inflow, after=inflow - self.values.sum(axis=1))
+
+    def sum_years(self, start=0, stop=None):
+        """Sum of each cohort over the years [start, stop)"""
+        stop = self.n if stop is None else min(stop, self.n)
+        cohort = np.arange(self.n)
+        year = self.year_index()
+        band = np.where((year >= start) & (year < stop), self.values, 0.0).sum(axis=1)
+        n_before = np.clip(np.minimum(stop, cohort) - start, 0, None)
+        n_after = np.clip(stop - np.maximum(start, cohort + self.width), 0, None)
+        return band + n_before * self.before + n_after * self.after
+
+    def dot_cohorts(self, x):
+        """M.T @ x, i.e. the sum over the cohorts of each year, x is [n] or [n, k]"""
+        x = np.asarray(x, dtype=float)
+        shape = (-1,) + (1,) * (x.ndim - 1)
+        out = np.zeros(x.shape)
+        for a in range(min(self.width, self.n)):
+            out[a:] += self.values[:self.n - a, a].reshape(shape) * x[:self.n - a]
+        if np.any(self.before):
+            # cohorts installed after year i
+            weighted = self.before.reshape(shape) * x
+            out[:-1] += np.cumsum(weighted[::-1], axis=0)[::-1][1:]
+        if np.any(self.after) and self.width < self.n:
+            # cohorts older than the band in year i
+            weighted = self.after.reshape(shape) * x
+            out[self.width:] += np.cumsum(weighted, axis=0)[:self.n - self.width]
+        return out
+
+"""
+================
+Define functions
+================
+"""
+# smallest number of ages so that every lifetime pdf loses at most tol of its mass
+def get_band_width(kernels, n, tol=0.0):
+    '''
+    :param kernels: list of failure rates by age (age 0 first)
+    :param n: number of years of the horizon
+    :param tol: dropped tail mass relative to the total mass of each kernel, 0 keeps every non-zero age
+    :return: band width between 1 and n
+    '''
+    width = 1
+    for kernel in kernels:
+        kernel = np.asarray(kernel, dtype=float)[:n]
+        if not np.any(kernel):
+            continue
+        # tail[a] is the mass of the ages >= a
+        tail = np.cumsum(kernel[::-1])[::-1]
+        keep = np.nonzero(tail > tol * tail[0])[0]
+        width = max(width, int(keep[-1]) + 1)
+    return width
@@ -0,0 +1,469 @@
+"""
+This script is used to evaluate the whole model for a batch of parameter samples at once
+
+It contains:
+- NOMINAL_PARAMETERS: the point estimates used by the deterministic model (a_ to d_ scripts)
+  (BatchModel.nominal adds the lifetimes, material intensities, nacelle market shares, closed-loop recycling rates and impact factors)
+- BatchModel: capacity flows, material demand, EoL flows and environmental impact of one (tp, scen),
+  every array carrying a leading sample axis, so thousands of parameter draws are one vectorized pass.
+  Given a regional input package (see _regions.load_regional_inputs), the inputs carry a leading region axis
+  and every (region, sample) is a row of the same pass
+
+With every parameter at its nominal value the outputs equal those of the deterministic scripts.
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+import collections
+import numpy as np
+
+from _inputs import get_model_inputs, NACELLE_TYPES
+from _labelled import LabelledArray
+from _utils import COMPONENTS, get_composition_matrix, get_future_share_tensor, get_offshore_foundation_scale
+from _time_axis import get_time_axis
+from _banded import get_band_width
+from _regions import check_regional_inputs
+from _impact import IMPACT_FACTORS, IMPACTS, get_impact_material, carry_forward
+from a_capacity_flow import CapacityFlow
+
+# point estimates hard-coded in the deterministic model
+NOMINAL_PARAMETERS = collections.OrderedDict([
+    ('weibull_shape', 4.07),                 # CapacityFlow.get_weibull_pdf
+    ('onshore_height_coef', 4.1099),         # b_onshore_material.get_height
+    ('onshore_height_exp', 0.3974),
+    ('onshore_diameter_coef', 2.1464),       # b_onshore_material.get_diameter
+    ('onshore_diameter_exp', 0.4913),
+    ('offshore_height_coef', 5.0679),        # b_offshore_material.get_height
+    ('offshore_height_exp', 0.3373),
+    ('offshore_diameter_coef', 0.9466),      # b_offshore_material.get_diameter
+    ('offshore_diameter_exp', 0.5872),
+    ('nacelle_mass_coef', 0.0091),           # _utils.calculate_component_masses
+    ('nacelle_mass_exp', 2.0456),
+    ('tower_mass_coef', 0.0176),
+    ('tower_mass_exp', 0.6839),
+    ('rotor_mass_coef', 0.0035),
+    ('rotor_mass_exp', 2.1412),
+])
+
+STRATEGIES = ['EoL_C', 'EoL_O']
+RECYCLING_KEYS = ['EoL_C_onshore', 'EoL_O_onshore', 'EoL_C_offshore', 'EoL_O_offshore']
+
+"""
+================
+Define functions
+================
+"""
+# component masses (nacelle, tower, rotor, foundation) with sampled power laws, p values are [S, 1]
+def get_batch_component_masses(p, d, h, foundation_scale):
+    nacl = p['nacelle_mass_coef'] * d ** p['nacelle_mass_exp']
+    tower = p['tower_mass_coef'] * (d ** 2 * h) ** p['tower_mass_exp']
+    rotor = p['rotor_mass_coef'] * d ** p['rotor_mass_exp']
+    found = foundation_scale * (nacl + tower + rotor)
+    return np.stack([nacl, tower, rotor, found], axis=-1)
+
+# sum of each cohort of [R * S, cohort, age] bands over the years [start, stop), as BandedCohortMatrix.sum_years
+def sum_band_years(values, before, after, start, stop):
+    '''
+    :param values: [R * S, cohort, age] values inside the band, zero beyond the horizon
+    :param before, after: [R * S, cohort] value of the years before the installation and after the band
+    :return: [R * S, cohort] sum over the years
+    '''
+    n, width = values.shape[1:]
+    cohort = np.arange(n)
+    year = cohort[:, None] + np.arange(width)[None, :]
+    # the 0/1 mask of the years is contracted without a band-sized temporary
+    band = np.einsum('sca,ca->sc', values, ((year >= start) & (year < stop)).astype(float))
+    n_before = np.clip(np.minimum(stop, cohort) - start, 0, None)
+    n_after = np.clip(stop - np.maximum(start, cohort + width), 0, None)
+    return band + n_before * before + n_after * after
+
+# [R * S, year, material] sum over the cohorts of a [R * S, cohort, age] band times x [R * S, cohort, material], as BandedCohortMatrix.dot_cohorts
+def dot_band_cohorts(values, x):
+    n, width = values.shape[1:]
+    out = np.zeros(x.shape)
+    for a in range(min(width, n)):
+        out[:, a:] += values[:, :n - a, a, None] * x[:, :n - a]
+    return out
+
+"""
+==============
+Define classes
+==============
+"""
+class BatchModel:
+    """
+    This class is used to run the model of one scenario for a batch of parameter samples
+
+    Arguments:
+    ----------
+    tp: int
+        Tech scenario
+    scen: str
+        Energy demand scenario (Gcam or GNZ)
+    inputs: ModelInputs or dict
+        Inputs loaded from the excel file, loaded from the default path if not given,
+        or {region: ModelInputs} of a regional input package, the results then have a leading 'region' dim
+    axis: TimeAxis
+        Horizon and time step, annual up to the last year of the capacity scenarios if not given.
+        The cohort operators are [R * S, n_periods, band width] bands (see _banded), the band width being the longest lifetime kernel
+    truncation_tol: float
+        Tail mass of the lifetime pdfs dropped from the bands, 0 keeps every non-zero age (see CapacityFlow)
+    """
+    def __init__(self, tp=0, scen='Gcam', inputs=None, axis=None, truncation_tol=0.0):
+        self.tp, self.scen = tp, scen
+        self.truncation_tol = truncation_tol
+        inputs = inputs if inputs is not None else get_model_inputs()
+        if isinstance(inputs, dict):
+            check_regional_inputs(inputs)
+            self.regions, self.region_inputs = list(inputs), list(inputs.values())
+        else:
+            self.regions, self.region_inputs = None, [inputs]
+        self.inputs = self.region_inputs[0]
+        self.axis = axis if axis is not None else get_time_axis(self.inputs)
+        # the input arrays below carry a leading region axis, of length 1 without a regional input package
+        capacity_flows = [CapacityFlow(inputs=x, axis=self.axis) for x in self.region_inputs]
+        self.capacity_flow = capacity_flows[0]
+        stocks = [cf.get_future_stock([scen]) for cf in capacity_flows]
+        self.stock_future_onshore = np.stack([s[0][0] for s in stocks])
+        self.stock_future_offshore = np.stack([s[1][0] for s in stocks])
+        self.inflow_history = np.stack([cf.inflow_history_onshore for cf in capacity_flows])
+        self.n_history = self.inflow_history.shape[1]
+        self.n_future = self.stock_future_onshore.shape[1]
+        self.years_onshore = self.axis.periods
+        self.years_offshore = self.axis.get_periods(self.inputs.years_future_offshore[0], self.stock_future_offshore.shape[1])
+
+        self.materials = list(self.inputs.onshore_dict['DFIG/SCIG'])
+        self.is_ree = np.isin(self.materials, ['Nd', 'Dy'])
+        self.types_onshore = list(self.inputs.onshore_dict.keys())
+        self.types_offshore = list(self.inputs.offshore_dict.keys())
+        self.composition_onshore = self.stack_regions(lambda x: get_composition_matrix(x.onshore_dict, self.types_onshore, self.materials))
+        self.composition_offshore = self.stack_regions(lambda x: get_composition_matrix(x.offshore_dict, self.types_offshore, self.materials))
+        self.share_onshore = self.stack_regions(lambda x: get_future_share_tensor(x.nacl_share_onshore, x.tower_share, self.types_onshore, 'flat')[tp])
+        self.share_offshore = self.stack_regions(lambda x: get_future_share_tensor(x.nacl_share_offshore, x.tower_share, self.types_offshore, 'Monopile')[tp])
+        self.nacl_share_onshore = self.stack_regions(lambda x: [x.nacl_share_onshore[k][tp] for k in NACELLE_TYPES])
+        self.nacl_share_offshore = self.stack_regions(lambda x: [x.nacl_share_offshore[k][tp] for k in NACELLE_TYPES])
+        self.capacity_per_turbine_onshore = self.stack_regions(lambda x: self.get_capacity_per_turbine(x.per_cap_onshore, self.axis.future))
+        self.capacity_per_turbine_offshore = self.stack_regions(lambda x: self.get_capacity_per_turbine(x.per_cap_offshore, self.years_offshore))
+        self.foundation_scale_offshore = get_offshore_foundation_scale(self.years_offshore)
+
+        # replacement of nacelles and rotors
+        shares = [x.market_share_series(tp, self.axis) for x in self.region_inputs]
+        self.nacl_share_series = np.stack([np.asarray([share[k] for k in NACELLE_TYPES], dtype=float).T for share in shares]) # [region, year, nacelle type]
+        self.avg_data = [np.stack(x) for x in zip(*[[np.asarray(v, dtype=float) for v in x.avg_series(self.axis)] for x in self.region_inputs])]
+        self.replacement = self.stack_regions(lambda x: x.replacement_rates(tp)) # [region, rate]
+
+        self.prepare_historical_fleet()
+
+        # EoL treatment [region, strategy, material, process]
+        self.processes = list(self.inputs.proc_methods)
+        self.recy_onshore = self.stack_regions(lambda x: [[x.recy_table[s + '_onshore'][m] for m in self.materials] for s in STRATEGIES])
+        self.recy_offshore = self.stack_regions(lambda x: [[x.recy_table[s + '_offshore'][m] for m in self.materials] for s in STRATEGIES])
+        self.impact_materials = [get_impact_material(m) for m in self.materials]
+
+    def stack_regions(self, func):
+        """[region, ...] array of func(ModelInputs) of every region"""
+        return np.stack([np.asarray(func(x), dtype=float) for x in self.region_inputs])
+
+    def per_row(self, values, S):
+        """[region, ...] input array repeated for the S samples of each region, [R * S, ...] as the rows of the batch"""
+        return np.repeat(values, S, axis=0)
+
+    def get_capacity_per_turbine(self, per_cap_list, periods):
+        """Average capacity per wind turbine of 2020-29, 2030-39 and 2040 to the end of the horizon, for each period"""
+        return self.axis.expand_decades(per_cap_list[:3], periods)
+
+    def prepare_historical_fleet(self):
+        """Sparse maps from each historical wind turbine of every region to (region, installation year, component type)"""
+        from scipy import sparse
+        fleets = [x.historical_fleet for x in self.region_inputs]
+        c_list, d_list, h_list, nacl_list, tower_list, time_list = [sum([list(f[i]) for f in fleets], []) for i in range(6)]
+        region = np.concatenate([np.full(len(f[0]), r, dtype=int) for r, f in enumerate(fleets)])
+        self.fleet_c = np.asarray(c_list, dtype=float)
+        self.fleet_d = np.asarray(d_list, dtype=float)
+        self.fleet_h = np.asarray(h_list, dtype=float)
+        year = np.asarray(time_list, dtype=float).astype(int)
+        year_idx = year - self.axis.history_start
+        n_years = self.n_history // self.axis.steps_per_year
+        if len(year) > 0 and (year_idx.min() < 0 or year_idx.max() >= n_years):
+            raise ValueError('Historical fleet covers {}-{}, the capacity data {}-{}'.format(year.min(), year.max(), self.axis.history_start, self.axis.future_start - 1))
+        n_types, n_regions = len(self.types_onshore), len(fleets)
+        type_idx = [np.asarray([self.types_onshore.index(t) for t in nacl_list], dtype=int), np.asarray([self.types_onshore.index(t) for t in tower_list], dtype=int),
+                    np.full(len(year), self.types_onshore.index('/')), np.full(len(year), self.types_onshore.index('flat'))]
+        self.fleet_maps = []
+        for idx in type_idx:
+            self.fleet_maps.append(sparse.csr_matrix((np.ones(len(year)), ((region * n_years + year_idx) * n_types + idx, np.arange(len(year)))),
+                                                     shape=(n_regions * n_years * n_types, len(year))))
+        # Nd and Dy are given per unit capacity
+        self.fleet_capacity = np.stack([(m @ self.fleet_c).reshape(n_regions, n_years, n_types) for m in self.fleet_maps], axis=2) # [region, year, component, type]
+
+    def nominal(self, inputs=None):
+        """Point estimates of every parameter, from the inputs of the first region if not given"""
+        inputs = inputs if inputs is not None else self.inputs
+        params = collections.OrderedDict(NOMINAL_PARAMETERS)
+        params['historical_lifetime'] = float(inputs.historical_lifetime)
+        params['future_lifetime'] = float(inputs.future_lifetime)
+        for m in self.materials:
+            params['material_intensity.' + m] = 1.0
+        for site in ['onshore', 'offshore']:
+            for k in NACELLE_TYPES:
+                params['nacelle_share_{}.{}'.format(site, k)] = float(getattr(inputs, 'nacl_share_' + site)[k][self.tp])
+        for key in RECYCLING_KEYS:
+            for m in self.materials:
+                params['recycling_rate.{}.{}'.format(key, m)] = float(inputs.recy_table[key][m][0])
+        for k, column in IMPACT_FACTORS.items():
+            for m in sorted(set(m for m in self.impact_materials if m is not None)):
+                params['{}.{}'.format(k, m)] = float(inputs.env_impact[column][m])
+        return params
+
+    def get_parameters(self, params, n=None):
+        """Every parameter as a [R * S, 1] array, the S samples of each region in turn.
+        A given parameter takes the same samples in every region, the nominal value of the region is used for the missing ones"""
+        unknown = set(params) - set(self.nominal())
+        if unknown:
+            raise KeyError('Unknown parameters: {}'.format(', '.join(sorted(unknown))))
+        if n is None:
+            n = max([np.size(v) for v in params.values()] + [1])
+        fulls = []
+        for inputs in self.region_inputs:
+            full = self.nominal(inputs)
+            full.update(params)
+            fulls.append(full)
+        return {k: np.concatenate([np.broadcast_to(np.asarray(full[k], dtype=float).reshape(-1), (n,)) for full in fulls]).reshape(-1, 1)
+                for k in fulls[0]}
+
+    def get_cohort_bands(self, inflow, kernel_history, kernel_future, n_history, edges):
+        '''
+        Outflow ratio and stock-years of each cohort as in CapacityFlow, the ratio stored as a [R * S, cohort, age] band
+
+        :param inflow: [R * S, n] capacity inflow
+        :param kernel_history, kernel_future: [R * S, n] failure rate by age of the historical and the future cohorts
+        :param edges: limits of the periods of the stock-years, e.g. [0, n_history, n]
+        :return: [R * S, cohort, age] outflow ratio inside the band, [R * S, cohort, period] stock contribution summed over the years of each period
+        '''
+        n = inflow.shape[1]
+        width = get_band_width(list(kernel_history) + list(kernel_future), n, self.truncation_tol)
+        # [R * S, cohort, age] failure rates, built in place so that only two bands are held at once
+        outflow_contrib = np.empty((len(inflow), n, width))
+        outflow_contrib[:, :n_history] = kernel_history[:, None, :width]
+        outflow_contrib[:, n_history:] = kernel_future[:, None, :width]
+        # no outflow in the year of installation nor beyond the horizon
+        outflow_contrib[:, :, 0] = 0
+        outflow_contrib[:, np.arange(n)[:, None] + np.arange(width)[None, :] >= n] = 0
+        outflow_contrib *= inflow[:, :, None]
+        # the stock contribution is the inflow before the installation and the last band value after the band
+        stock_contrib = np.cumsum(outflow_contrib, axis=2)
+        np.subtract(inflow[:, :, None], stock_contrib, out=stock_contrib)
+        stock_years = np.stack([sum_band_years(stock_contrib, inflow, stock_contrib[:, :, -1], start, stop)
+                                for start, stop in zip(edges[:-1], edges[1:])], axis=2)
+        del stock_contrib
+        # outflow ratio
+        outflow_contrib /= inflow[:, :, None] + 1e-100
+        return outflow_contrib, stock_years
+
+    def get_nacelle_share(self, p, site, S):
+        """[R * S, nacelle type] sampled future nacelle market share, rescaled to the total of the nominal share of the region"""
+        share = np.concatenate([p['nacelle_share_{}.{}'.format(site, k)] for k in NACELLE_TYPES], axis=1)
+        nominal = self.per_row(getattr(self, 'nacl_share_' + site), S)
+        total = share.sum(axis=1, keepdims=True)
+        return np.where(total > 0, share * (nominal.sum(axis=1, keepdims=True) / np.where(total > 0, total, 1)), 0.0)
+
+    def get_share_tensor(self, share, nacl_share, types, S):
+        """[R * S, component, type] share tensor with the sampled nacelle market share"""
+        share = self.per_row(share, S)
+        share[:, 0, [types.index(k) for k in NACELLE_TYPES]] = nacl_share
+        return share
+
+    def get_recycling(self, p, site, S):
+        """[R * S, strategy, material, process] EoL treatment shares with the sampled closed-loop recycling rate,
+        the other treatments are rescaled so that each material still sums to the nominal total"""
+        base = self.per_row(self.recy_onshore if site == 'onshore' else self.recy_offshore, S)
+        rate = np.stack([np.concatenate([p['recycling_rate.{}_{}.{}'.format(s, site, m)] for m in self.materials], axis=1)
+                         for s in STRATEGIES], axis=1) # [R * S, strategy, material]
+        total = base.sum(axis=-1)
+        rest = total - base[..., 0]
+        # treatments other than closed-loop recycling, split evenly if they were all 0
+        others = np.where(rest[..., None] > 0, base[..., 1:] / np.where(rest > 0, rest, 1)[..., None], 1 / (base.shape[-1] - 1))
+        return np.concatenate([rate[..., None], np.clip(total - rate, 0, None)[..., None] * others], axis=-1)
+
+    def run_capacity(self, p, S):
+        cf = self.capacity_flow
+        shape = p['weibull_shape'][:, 0]
+        n_onshore, n_offshore = len(self.years_onshore), len(self.years_offshore)
+        kernel_history = cf.get_batch_lifetime_kernel(p['historical_lifetime'][:, 0], shape, self.n_history, n_onshore)
+        kernel_future_onshore = cf.get_batch_lifetime_kernel(p['future_lifetime'][:, 0], shape, self.n_future, n_onshore)
+        kernel_future_offshore = cf.get_batch_lifetime_kernel(p['future_lifetime'][:, 0], shape, n_offshore, n_offshore)
+        flows = {}
+        flows['inflow_onshore'], flows['outflow_onshore'], flows['stock_onshore'] = cf.solve_batch(
+            self.per_row(self.stock_future_onshore, S), self.per_row(self.inflow_history, S), kernel_history, kernel_future_onshore)
+        flows['inflow_offshore'], flows['outflow_offshore'], flows['stock_offshore'] = cf.solve_batch(
+            self.per_row(self.stock_future_offshore, S), np.zeros(0), np.zeros([len(shape), n_offshore]), kernel_future_offshore)
+        cohorts = {
+            'onshore': self.get_cohort_bands(flows['inflow_onshore'], kernel_history, kernel_future_onshore, self.n_history, [0, self.n_history, n_onshore]),
+            'offshore': self.get_cohort_bands(flows['inflow_offshore'], kernel_future_offshore, kernel_future_offshore, 0, [0, n_offshore]),
+        }
+        return flows, cohorts
+
+    def run_replacement(self, stock_sums, composition, types, avg_turb, avg_nacl, avg_rotor, nacl_share, eps=1e-100):
+        """Nacelle and rotor replacement mass [R * S, year, period, material] as in capacity_onshore/capacity_offshore, the averages are [R * S, year]"""
+        stock_sums = stock_sums / (avg_turb[:, :, None] + 1e-100)
+        nacl = stock_sums * avg_nacl[:, :, None]
+        rotor = stock_sums * avg_rotor[:, :, None]
+        nacl_mass = np.einsum('sjp,sjk,skm->sjpm', nacl, nacl_share, composition[:, [types.index(k) for k in NACELLE_TYPES]])
+        rotor_mass = rotor[..., None] * composition[:, None, None, types.index('/')]
+        # Nd and Dy are per unit capacity
+        ree = np.zeros(len(self.materials), dtype=bool)
+        ree[-2:] = True
+        nacl_mass[..., ree] *= (avg_turb / (avg_nacl + eps) / 1000)[:, :, None, None]
+        rotor_mass[..., ree] *= (avg_turb / (avg_rotor + eps) / 1000)[:, :, None, None]
+        return nacl_mass, rotor_mass
+
+    def run_historical_mass(self, p, composition, S):
+        """Material mass of the historical onshore fleet [R * S, period, material], each year split evenly over its periods"""
+        d, h = self.fleet_d[None, :], self.fleet_h[None, :]
+        # the mass power laws take the same samples in every region, the wind turbines of every region are evaluated with those of the first one
+        comp_mass = get_batch_component_masses({k: p[k][:S] for k in NOMINAL_PARAMETERS}, d, h, 3.5) # [S, turbine, component]
+        n_regions, n_years, n_types = self.fleet_capacity.shape[0], self.fleet_capacity.shape[1], self.fleet_capacity.shape[3]
+        mass = 0
+        for k in range(len(COMPONENTS)):
+            by_type = (self.fleet_maps[k] @ comp_mass[:, :, k].T).T.reshape(S, n_regions, n_years, n_types)
+            by_type = by_type.transpose(1, 0, 2, 3).reshape(-1, n_years, n_types) # [R * S, year, type]
+            mass = mass + np.einsum('syt,stm->sym', by_type, composition * ~self.is_ree) \
+                + np.einsum('syt,stm->sym', self.per_row(self.fleet_capacity[:, :, k], S), composition * self.is_ree)
+        if self.axis.steps_per_year > 1:
+            mass = np.repeat(mass, self.axis.steps_per_year, axis=1) / self.axis.steps_per_year
+        return mass
+
+    def run_future_mass(self, inflow, cap, d, h, foundation_scale, share, composition, p):
+        """Material mass of the wind turbines installed from 2020 [R * S, period, material], the capacity per turbine is [R * S, period]"""
+        n = inflow * 1000 / cap
+        comp_mass = get_batch_component_masses(p, d, h, foundation_scale) # [R * S, year, component]
+        return np.einsum('sy,syk,skt,stm->sym', n, comp_mass, share, composition * ~self.is_ree, optimize=True) \
+            + np.einsum('sy,sy,skt,stm->sym', n, cap, share, composition * self.is_ree, optimize=True)
+
+    def run_impact(self, mass, recy, p, carry):
+        """[R * S, strategy, year, impact] energy and CO2 of the material production and the closed-loop recycling savings,
+        [R * S, strategy, year, material] unused recycled mass in the scrap bank (zero without carry)"""
+        coef = {}
+        for k in IMPACT_FACTORS:
+            coef[k] = np.stack([p['{}.{}'.format(k, m)][:, 0] if m is not None else np.zeros(len(mass)) for m in self.impact_materials], axis=1) # [S, m]
+        if carry:
+            recy, bank = carry_forward(np.moveaxis(recy, 2, -1), np.moveaxis(mass, 1, -1)[:, None])
+            recy, bank = np.moveaxis(recy, -1, 2), np.moveaxis(bank, -1, 2)
+        else:
+            recy, bank = np.minimum(recy, mass[:, None]), np.zeros_like(recy)
+        impact = np.stack([
+            np.einsum('sym,sm->sy', mass, coef['energy_consumption'])[:, None].repeat(len(STRATEGIES), 1),
+            np.einsum('skym,sm->sky', recy, coef['energy_saved']),
+            np.einsum('sym,sm->sy', mass, coef['co2_emission'])[:, None].repeat(len(STRATEGIES), 1),
+            np.einsum('skym,sm->sky', recy, coef['co2_reduction']),
+        ], axis=-1)
+        return impact / 1e6, bank
+
+    def __call__(self, params=None, n=None):
+        '''
+        :param params: {name: value or [S] samples}, see nominal() for the names
+        :param n: number of samples, the largest parameter size if not given
+        :return: dict of LabelledArray with a leading 'sample' dim, ('region', 'sample') with a regional input package
+        '''
+        p = self.get_parameters(params or {}, n)
+        R = len(self.region_inputs)
+        S = len(p['weibull_shape']) // R
+        flows, cohorts = self.run_capacity(p, S)
+        intensity = np.stack([p['material_intensity.' + m][:, 0] for m in self.materials], axis=1)
+        composition_onshore = self.per_row(self.composition_onshore, S) * intensity[:, None, :]
+        composition_offshore = self.per_row(self.composition_offshore, S) * intensity[:, None, :]
+        nacl_share_onshore, nacl_share_offshore = self.get_nacelle_share(p, 'onshore', S), self.get_nacelle_share(p, 'offshore', S)
+        # replaced nacelles follow the historical and then the future onshore market share
+        nacl_share_series = np.concatenate([self.per_row(self.nacl_share_series[:, :self.n_history], S),
+                                            np.repeat(nacl_share_onshore[:, None], self.nacl_share_series.shape[1] - self.n_history, axis=1)], axis=1)
+        recy_onshore, recy_offshore = self.get_recycling(p, 'onshore', S), self.get_recycling(p, 'offshore', S) # [R * S, strategy, m, process]
+        avg_turb_ons, avg_nacl_ons, avg_rotor_ons, avg_turb_offs, avg_nacl_offs, avg_rotor_offs = [self.per_row(x, S) for x in self.avg_data]
+        future_nacl_rep, future_rotor_rep, his_nacl_rep, his_rotor_rep = self.per_row(self.replacement, S).T
+        H = self.n_history
+
+        # onshore: replacement of damaged components, historical and future installations
+        ratio_onshore, stock_years = cohorts['onshore']
+        # stock-years of each cohort over the historical and the future periods
+        stock_sums = stock_years / self.axis.steps_per_year
+        nacl_mass, rotor_mass = self.run_replacement(stock_sums, composition_onshore, self.types_onshore, avg_turb_ons, avg_nacl_ons, avg_rotor_ons, nacl_share_series)
+        rates = np.stack([his_nacl_rep, future_nacl_rep], axis=1)[:, None, :, None], np.stack([his_rotor_rep, future_rotor_rep], axis=1)[:, None, :, None]
+        rep_onshore = (nacl_mass * rates[0]).sum(axis=2) + (rotor_mass * rates[1]).sum(axis=2)
+        cap = self.per_row(self.capacity_per_turbine_onshore, S)
+        d = p['onshore_diameter_coef'] * cap ** p['onshore_diameter_exp']
+        h = p['onshore_height_coef'] * cap ** p['onshore_height_exp']
+        mass_onshore = np.concatenate([self.run_historical_mass(p, composition_onshore, S),
+                                       self.run_future_mass(flows['inflow_onshore'][:, H:], cap, d, h, 3.5,
+                                                             self.get_share_tensor(self.share_onshore, nacl_share_onshore, self.types_onshore, S), composition_onshore, p)], axis=1)
+
+        # offshore
+        ratio_offshore, stock_years = cohorts['offshore']
+        n_offshore = len(self.years_offshore)
+        offset = avg_turb_offs.shape[1] - n_offshore
+        nacl_mass, rotor_mass = self.run_replacement(stock_years / self.axis.steps_per_year, composition_offshore, self.types_offshore, avg_turb_offs[:, offset:],
+                                                     avg_nacl_offs[:, offset:], avg_rotor_offs[:, offset:], nacl_share_series[:, offset:], eps=0)
+        rep_offshore = nacl_mass[:, :, 0] + rotor_mass[:, :, 0] * future_rotor_rep[:, None, None]
+        cap = self.per_row(self.capacity_per_turbine_offshore, S)
+        d = p['offshore_diameter_coef'] * cap ** p['offshore_diameter_exp']
+        h = p['offshore_height_coef'] * cap ** p['offshore_height_exp']
+        mass_offshore = self.run_future_mass(flows['inflow_offshore'], cap, d, h, self.foundation_scale_offshore,
+                                              self.get_share_tensor(self.share_offshore, nacl_share_offshore, self.types_offshore, S), composition_offshore, p)
+
+        # EoL flows (c_ scripts): outflows of the installed mass plus the replaced components
+        out_onshore = dot_band_cohorts(ratio_onshore, mass_onshore) + rep_onshore
+        # the historical outflows follow the current EoL treatment
+        recy_by_year = np.repeat(recy_onshore[:, :, None], len(self.years_onshore), axis=2) # [R * S, strategy, year, m, process]
+        recy_by_year[:, :, :H] = recy_onshore[:, :1, None]
+        eol_onshore = np.einsum('sym,skymp->skyp', out_onshore, recy_by_year) / 1e6
+        out_offshore = dot_band_cohorts(ratio_offshore, mass_offshore) + rep_offshore
+        eol_offshore = np.einsum('sym,skmp->skyp', out_offshore, recy_offshore) / 1e6
+        material_onshore, material_offshore = mass_onshore + rep_onshore, mass_offshore + rep_offshore
+        virgin_onshore = (material_onshore[:, None, H:] - out_onshore[:, None, H:] * recy_onshore[:, :, None, :, 0]) / 1e6
+        virgin_offshore = (material_offshore[:, None] - out_offshore[:, None] * recy_offshore[:, :, None, :, 0]) / 1e6
+
+        # environmental impact (d_ scripts): outflows of the installed and replaced mass
+        out_onshore = dot_band_cohorts(ratio_onshore, material_onshore) + rep_onshore
+        out_offshore = dot_band_cohorts(ratio_offshore, material_offshore) + rep_offshore
+        impact_onshore, bank_onshore = self.run_impact(material_onshore, out_onshore[:, None] * recy_onshore[:, :, None, :, 0], p, carry=True)
+        impact_offshore, _ = self.run_impact(material_offshore, out_offshore[:, None] * recy_offshore[:, :, None, :, 0], p, carry=False)
+        impact_total = impact_onshore.copy()
+        impact_total[:, :, -n_offshore:] += impact_offshore
+
+        samples = list(range(S))
+        years_on, years_off = self.years_onshore.tolist(), self.years_offshore.tolist()
+        def labelled(values, dims, **coords):
+            coords['sample'] = samples
+            if self.regions is None:
+                return LabelledArray(values, ('sample',) + dims, coords)
+            coords['region'] = self.regions
+            return LabelledArray(values.reshape((R, S) + values.shape[1:]), ('region', 'sample') + dims, coords)
+        results = collections.OrderedDict()
+        for site, years in [('onshore', years_on), ('offshore', years_off)]:
+            for k in ['inflow', 'stock', 'outflow']:
+                results['{}_{}'.format(k, site)] = labelled(flows['{}_{}'.format(k, site)], ('year',), year=years)
+        results['material_onshore'] = labelled(material_onshore / 1e6, ('year', 'material'), year=years_on, material=self.materials)
+        results['material_offshore'] = labelled(material_offshore / 1e6, ('year', 'material'), year=years_off, material=self.materials)
+        results['eol_onshore'] = labelled(eol_onshore, ('strategy', 'year', 'process'), strategy=STRATEGIES, year=years_on, process=self.processes)
+        results['eol_offshore'] = labelled(eol_offshore, ('strategy', 'year', 'process'), strategy=STRATEGIES, year=years_off, process=self.processes)
+        results['virgin_onshore'] = labelled(virgin_onshore, ('strategy', 'year', 'material'), strategy=STRATEGIES, year=years_on[H:], material=self.materials)
+        results['virgin_offshore'] = labelled(virgin_offshore, ('strategy', 'year', 'material'), strategy=STRATEGIES, year=years_off, material=self.materials)
+        results['scrap_bank_onshore'] = labelled(bank_onshore / 1e6, ('strategy', 'year', 'material'), strategy=STRATEGIES, year=years_on, material=self.materials)
+        for site, values, years in [('onshore', impact_onshore, years_on), ('offshore', impact_offshore, years_off), ('total', impact_total, years_on)]:
+            results['impact_' + site] = labelled(values, ('strategy', 'year', 'impact'), strategy=STRATEGIES, year=years, impact=IMPACTS)
+        return results
+
+    def run(self, params=None, n=None, chunk_size=256):
+        """Same as calling the model, in chunks of samples (of every region) to bound the memory, the chunks are concatenated on 'sample'"""
+        params = params or {}
+        S = n if n is not None else max([np.size(v) for v in params.values()] + [1])
+        samples = {k: np.broadcast_to(np.asarray(v, dtype=float).reshape(-1), (S,)) for k, v in params.items()}
+        chunks = [self({k: v[i: i + chunk_size] for k, v in samples.items()}, n=min(chunk_size, S - i)) for i in range(0, S, chunk_size)]
+        results = collections.OrderedDict()
+        for k, first in chunks[0].items():
+            coords = dict(first.coords)
+            coords['sample'] = list(range(S))
+            results[k] = LabelledArray(np.concatenate([c[k].values for c in chunks], axis=first.axis('sample')), first.dims, coords)
+        return results
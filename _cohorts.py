@@ -0,0 +1,209 @@
+"""
+This script is used to track the onshore wind turbines of each cohort by technology
+
+It contains:
+- TechCohorts: the capacity and component masses installed in each period by (nacelle type, tower type, capacity class),
+  with their material mass, EoL outflows and replaced components by technology
+- get_onshore_cohorts: the cohorts of the historical fleet (one bin per installation year and technology)
+  followed by the future installations of a tech scenario (split by the future nacelle and tower market shares)
+
+The cohorts of a period share the lifetime distribution, so the outflows of every technology come from the same
+survival operator (the [cohort, year] outflow ratio of the capacity flow) applied to the component masses and capacity
+of all installed technologies at once, the material composition being applied to the outflows.
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+import numpy as np
+
+from _inputs import NACELLE_TYPES
+from _labelled import LabelledArray
+from _utils import COMPONENTS, calculate_component_masses, get_composition_matrix
+
+# upper bounds of the capacity classes (kW), the last class holds every larger wind turbine
+CAPACITY_CLASS_EDGES = [1000, 2000, 3000, 4000, 5000, 6000]
+
+"""
+==============
+Define classes
+==============
+"""
+class TechCohorts:
+    """
+    This class is used to hold the wind turbines installed in each period by technology
+
+    Arguments:
+    ----------
+    capacity: np.ndarray
+        [cohort, nacelle type, tower type, capacity class] installed capacity (MW)
+    component_mass: np.ndarray
+        [cohort, nacelle type, tower type, capacity class, component] installed mass (t) of the nacelles, towers, rotors and foundations
+    periods: list
+        Label of the period of each cohort
+    tower_types: list
+        Tower types, the nacelle types are NACELLE_TYPES
+    foundation_type: str
+        Component type of the foundations, 'flat' onshore
+    """
+    def __init__(self, capacity, component_mass, periods, tower_types, foundation_type='flat'):
+        self.capacity = np.asarray(capacity, dtype=float)
+        self.component_mass = np.asarray(component_mass, dtype=float)
+        self.periods = list(periods)
+        self.nacelle_types = list(NACELLE_TYPES)
+        self.tower_types = list(tower_types)
+        self.capacity_classes = get_capacity_classes()
+        self.foundation_type = foundation_type
+
+    def __len__(self):
+        return len(self.periods)
+
+    def __repr__(self):
+        return 'TechCohorts({} cohorts, {} technologies)'.format(len(self), int(np.prod(self.capacity.shape[1:])))
+
+    def technologies(self):
+        """Label of each (nacelle type, tower type, capacity class), in the order of the flattened technology axes"""
+        return ['{}|{}|{}'.format(n, t, c) for n in self.nacelle_types for t in self.tower_types for c in self.capacity_classes]
+
+    def get_unit_composition(self, oh_dict, materials):
+        """[component, nacelle type, tower type, material] material share of each component of each technology"""
+        comp = get_composition_matrix(oh_dict, self.nacelle_types + self.tower_types + ['/', self.foundation_type], materials)
+        n_nacl, n_tower = len(self.nacelle_types), len(self.tower_types)
+        nacl, tower, rotor, found = comp[:n_nacl], comp[n_nacl:n_nacl + n_tower], comp[-2], comp[-1]
+        shape = (n_nacl, n_tower, len(materials))
+        return np.stack([np.broadcast_to(nacl[:, None], shape), np.broadcast_to(tower[None], shape),
+                         np.broadcast_to(rotor, shape), np.broadcast_to(found, shape)])
+
+    def material_mass(self, oh_dict, materials=None, component_mass=None, capacity=None):
+        '''
+        :param oh_dict: material composition {component type: {material: share}}
+        :param component_mass, capacity: [period, nacelle type, tower type, capacity class, (component)] masses and capacity
+            of the same technologies, e.g. their outflows, the installed ones if not given
+        :return: [cohort, nacelle type, tower type, capacity class, material] installed material mass (t), Nd and Dy per unit capacity
+        '''
+        materials = list(oh_dict['DFIG/SCIG']) if materials is None else materials
+        component_mass = self.component_mass if component_mass is None else component_mass
+        capacity = self.capacity if capacity is None else capacity
+        unit = self.get_unit_composition(oh_dict, materials) # [component, nacelle, tower, material]
+        is_ree = np.isin(materials, ['Nd', 'Dy'])
+        mass = np.einsum('yntck,kntm->yntcm', component_mass, unit * ~is_ree)
+        # Nd and Dy: capacity (kW) times the share of every component
+        return mass + np.einsum('yntc,kntm->yntcm', capacity * 1000, unit * is_ree)
+
+    def survival(self, ratio):
+        '''
+        :param ratio: BandedCohortMatrix [cohort, year] share of each cohort leaving in each year (ratio_on['ratio'] of capacity_onshore)
+        :return: BandedCohortMatrix [cohort, year] share of each cohort in the stock, as the stock contributions of the capacity flow
+        '''
+        return ratio.survivors(np.ones(len(ratio)))
+
+    def outflow(self, ratio, oh_dict, materials=None):
+        '''
+        :param ratio: BandedCohortMatrix [cohort, year] share of each cohort leaving in each year
+        :param oh_dict: material composition {component type: {material: share}}
+        :return: [year, nacelle type, tower type, capacity class, material] material mass leaving the stock in each year (t)
+        '''
+        # the survival operator runs on the component masses and the capacity of the technologies installed at least once,
+        # the material composition is linear in them and is applied to the outflows
+        flows = np.concatenate([self.component_mass, self.capacity[..., None]], axis=-1)
+        cells = flows.reshape(len(self), -1, flows.shape[-1])
+        used = np.flatnonzero(np.any(cells, axis=(0, 2)))
+        out = np.zeros(cells.shape)
+        out[:, used] = ratio.dot_cohorts(cells[:, used].reshape(len(self), -1)).reshape(len(self), len(used), -1)
+        out = out.reshape(flows.shape)
+        return self.material_mass(oh_dict, materials, component_mass=out[..., :-1], capacity=out[..., -1])
+
+    def replacement(self, ratio, axis, rates, oh_dict, materials=None):
+        '''
+        Mass of the nacelles and rotors replaced over the service life of each cohort, by technology,
+        with the stock-years and units of capacity_onshore (stock in MW over the capacity per wind turbine in kW),
+        but with the nacelle type and masses of the cohort instead of the fleet averages and market shares
+
+        :param ratio: BandedCohortMatrix [cohort, year] share of each cohort leaving in each year
+        :param axis: TimeAxis of the cohorts
+        :param rates: (future nacelle, future rotor, historical nacelle, historical rotor) replacement rates
+        :return: [cohort, nacelle type, tower type, capacity class, material] replaced mass (t)
+        '''
+        materials = list(oh_dict['DFIG/SCIG']) if materials is None else materials
+        survival = self.survival(ratio)
+        # share-years of each cohort in the stock over the historical and the future periods
+        years = np.stack([survival.sum_years(0, axis.n_history), survival.sum_years(axis.n_history)], axis=1) / axis.steps_per_year
+        future_nacl_rep, future_rotor_rep, his_nacl_rep, his_rotor_rep = rates
+        nacl_years = years @ np.asarray([his_nacl_rep, future_nacl_rep])
+        rotor_years = years @ np.asarray([his_rotor_rep, future_rotor_rep])
+        unit = self.get_unit_composition(oh_dict, materials)
+        is_ree = np.isin(materials, ['Nd', 'Dy'])
+        mass = 0
+        for k, share_years in [(COMPONENTS.index('Nacelle'), nacl_years), (COMPONENTS.index('Rotor'), rotor_years)]:
+            # component mass (capacity for Nd and Dy) times the share-years in the stock, over 1000 as the stock (MW) over the capacity per turbine (kW)
+            mass = mass + share_years[:, None, None, None, None] / 1000 * (
+                self.component_mass[..., k, None] * unit[k][:, :, None] * ~is_ree + self.capacity[..., None] * unit[k][:, :, None] * is_ree)
+        return mass
+
+    def to_labelled(self, values, materials, first_dim='year'):
+        """[period, nacelle type, tower type, capacity class, material] array as a LabelledArray"""
+        dims = (first_dim, 'nacelle', 'tower', 'capacity_class', 'material')
+        coords = {first_dim: self.periods, 'nacelle': self.nacelle_types, 'tower': self.tower_types,
+                  'capacity_class': self.capacity_classes, 'material': list(materials)}
+        return LabelledArray(values, dims, coords)
+
+"""
+================
+Define functions
+================
+"""
+# labels of the capacity classes, e.g. '<1 MW', '1-2 MW', ..., '>=6 MW'
+def get_capacity_classes(edges=CAPACITY_CLASS_EDGES):
+    mw = ['{:g}'.format(e / 1000) for e in edges]
+    return ['<{} MW'.format(mw[0])] + ['{}-{} MW'.format(a, b) for a, b in zip(mw[:-1], mw[1:])] + ['>={} MW'.format(mw[-1])]
+
+# capacity class of each wind turbine given its capacity (kW)
+def get_capacity_class(capacity, edges=CAPACITY_CLASS_EDGES):
+    return np.searchsorted(edges, np.asarray(capacity, dtype=float), side='right')
+
+# cohorts of the historical onshore fleet and the future installations of the tech scenario tp
+def get_onshore_cohorts(inputs, tp, inflow, axis):
+    '''
+    :param inputs: ModelInputs
+    :param tp: tech scenario
+    :param inflow: onshore capacity inflow (MW) of each period of the time axis, historical then future
+    :param axis: TimeAxis
+    :return: TechCohorts
+    '''
+    from b_onshore_material import get_diameter, get_height
+    tower_types = list(inputs.tower_share)
+    n_nacl, n_tower, n_class = len(NACELLE_TYPES), len(tower_types), len(CAPACITY_CLASS_EDGES) + 1
+    n_cells = n_nacl * n_tower * n_class
+
+    # historical fleet: sum the wind turbines of each installation year and technology
+    c_list, d_list, h_list, nacl_list, tower_list, time_list = inputs.historical_fleet
+    c = np.asarray(c_list, dtype=float)
+    year_idx = np.asarray(time_list, dtype=float).astype(int) - axis.history_start
+    n_years = axis.n_history // axis.steps_per_year
+    cell = (np.asarray([NACELLE_TYPES.index(k) for k in nacl_list], dtype=int) * n_tower
+            + np.asarray([tower_types.index(k) for k in tower_list], dtype=int)) * n_class + get_capacity_class(c)
+    bins = year_idx * n_cells + cell
+    comp_mass = np.stack(calculate_component_masses(np.asarray(d_list, dtype=float), np.asarray(h_list, dtype=float)), axis=1) # [turbine, component]
+    hist_capacity = np.bincount(bins, weights=c / 1000, minlength=n_years * n_cells)
+    hist_mass = np.stack([np.bincount(bins, weights=comp_mass[:, k], minlength=n_years * n_cells) for k in range(len(COMPONENTS))], axis=1)
+    # each historical year split evenly over its periods
+    hist_capacity = np.repeat(hist_capacity.reshape(n_years, n_cells), axis.steps_per_year, axis=0) / axis.steps_per_year
+    hist_mass = np.repeat(hist_mass.reshape(n_years, n_cells, len(COMPONENTS)), axis.steps_per_year, axis=0) / axis.steps_per_year
+
+    # future installations: one capacity class per period, split by the nacelle and tower market shares
+    inflow = np.asarray(inflow, dtype=float)[axis.n_history:]
+    cap = axis.expand_decades(inputs.per_cap_onshore[:3])
+    n = inflow * 1000 / cap
+    unit_mass = np.stack(calculate_component_masses(get_diameter(cap), get_height(cap)), axis=1) # [period, component]
+    share = np.outer([inputs.nacl_share_onshore[k][tp] for k in NACELLE_TYPES], [inputs.tower_share[k] for k in tower_types]) # [nacelle, tower]
+    one_hot = np.eye(n_class)[get_capacity_class(cap)] # [period, class]
+    future_capacity = np.einsum('y,nt,yc->yntc', inflow, share, one_hot).reshape(len(n), n_cells)
+    future_mass = np.einsum('y,yk,nt,yc->yntck', n, unit_mass, share, one_hot).reshape(len(n), n_cells, len(COMPONENTS))
+
+    shape = (n_nacl, n_tower, n_class)
+    capacity = np.concatenate([hist_capacity, future_capacity]).reshape((-1,) + shape)
+    component_mass = np.concatenate([hist_mass, future_mass]).reshape((-1,) + shape + (len(COMPONENTS),))
+    return TechCohorts(capacity, component_mass, axis.periods.tolist(), tower_types)
@@ -1,31 +1,44 @@
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-import matplotlib.gridspec as gridspec
-
-# set basic parameters
-mpl.rcParams['pdf.fonttype'] = 42
+# matplotlib is imported and configured by get_pyplot, on the first figure
 
 is_black_background = False
-if is_black_background:
-    plt.style.use('dark_background')
-    mpl.rcParams.update({"ytick.color" : "w",
-                     "xtick.color" : "w",
-                     "axes.labelcolor" : "w",
-                     "axes.edgecolor" : "w"})
 
 LARGE_SIZE = 16
 MEDIUM_SIZE = 14
 SMALLER_SIZE = 12
-plt.rc('font', size=MEDIUM_SIZE)
-plt.rc('axes', labelsize=MEDIUM_SIZE)
-plt.rc('axes', titlesize=MEDIUM_SIZE)	 # fontsize of the axes title
-plt.rc('xtick', labelsize=SMALLER_SIZE)	 # fontsize of the tick labels
-plt.rc('ytick', labelsize=SMALLER_SIZE)	 # fontsize of the tick labels
-plt.rc('figure', titlesize=MEDIUM_SIZE)
-plt.rc('legend', fontsize=SMALLER_SIZE)
-mpl.rcParams.update({
-    "pdf.use14corefonts": True
-})
+
+_SETTINGS_APPLIED = False
+
+# pyplot with the figure settings applied (once per process)
+def get_pyplot():
+    global _SETTINGS_APPLIED
+    import matplotlib as mpl
+    import matplotlib.pyplot as plt
+    if _SETTINGS_APPLIED:
+        return plt
+
+    # set basic parameters
+    mpl.rcParams['pdf.fonttype'] = 42
+
+    if is_black_background:
+        plt.style.use('dark_background')
+        mpl.rcParams.update({"ytick.color" : "w",
+                         "xtick.color" : "w",
+                         "axes.labelcolor" : "w",
+                         "axes.edgecolor" : "w"})
+
+    plt.rc('font', size=MEDIUM_SIZE)
+    plt.rc('axes', labelsize=MEDIUM_SIZE)
+    plt.rc('axes', titlesize=MEDIUM_SIZE)	 # fontsize of the axes title
+    plt.rc('xtick', labelsize=SMALLER_SIZE)	 # fontsize of the tick labels
+    plt.rc('ytick', labelsize=SMALLER_SIZE)	 # fontsize of the tick labels
+    plt.rc('figure', titlesize=MEDIUM_SIZE)
+    plt.rc('legend', fontsize=SMALLER_SIZE)
+    mpl.rcParams.update({
+        "pdf.use14corefonts": True
+    })
+    _SETTINGS_APPLIED = True
+    return plt
+
  #, xtick.color='w', axes.labelcolor='w', axes.edge_color='w'
 FIG_HEIGHT = 4
 FIG_WIDTH = 4
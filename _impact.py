@@ -0,0 +1,131 @@
+"""
+This script is used to calculate the environmental impact of the material production and of the closed-loop recycling
+
+It contains:
+- get_category_matrix: [material, category] mapping of the materials to the material groups of the envir_impact sheet
+- get_factor_matrix: [category, indicator] energy and CO2 factors of the envir_impact sheet
+- carry_forward: the scrap bank, recycled mass exceeding the demand of a year kept for the next years, as prefix sums over the years
+- get_recycled_supply: the closed-loop recycled mass of each EoL strategy, capped by the material demand
+- get_env_impact: energy consumption/savings and CO2 emission/savings (and the net values) of every strategy,
+  year and material group as one LabelledArray, from two matrix products
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+import collections
+import numpy as np
+
+from _labelled import LabelledArray
+
+# impact factor parameters, e.g. 'co2_emission.Cu', and the columns of the envir_impact sheet
+IMPACT_FACTORS = collections.OrderedDict([
+    ('energy_consumption', 'Energy_consumption(MJ kg-1)'),
+    ('energy_saved', 'Energy_saved (MJ kg-1)'),
+    ('co2_emission', 'CO2_emission (kg)'),
+    ('co2_reduction', 'CO2_reduction(kg)'),
+])
+IMPACTS = ['Energy consumption', 'Energy saved', 'CO2 emission', 'CO2 saved']
+NET_IMPACTS = ['Energy net', 'CO2 net']
+# impacts of the material production (inflows), the other ones are the savings of the recycled mass
+CONSUMPTION_IMPACTS = ['Energy consumption', 'CO2 emission']
+
+"""
+================
+Define functions
+================
+"""
+# material group of the envir_impact sheet, None for the materials without impact factors
+def get_impact_material(m):
+    if m in ['Cast Iron', 'Steel']:
+        return 'Steel and iron'
+    if m in ['Nd', 'Dy']:
+        return 'REEs'
+    if 'Composites' in m:
+        return 'Composites'
+    if m == 'Others' or 'Other' in m:
+        return None
+    return m
+
+# carry the recycled mass exceeding the demand of a year forward to the next year, recy and demand are [..., year]
+def carry_forward(recy, demand):
+    '''
+    The scrap bank after year k is bank[k] = max(bank[k - 1] + recy[k] - demand[k], 0). With S the cumulative surplus
+    recy - demand, this is bank[k] = S[k] - min(0, S[0], ..., S[k]), so every leading axis (samples, strategies, materials)
+    is solved at once without a loop over the years
+
+    :param recy: [..., year] recycled mass
+    :param demand: [..., year] material demand, broadcast against recy
+    :return: [..., year] recycled mass used, [..., year] mass left in the scrap bank at the end of each year
+    '''
+    recy, demand = np.broadcast_arrays(np.asarray(recy, dtype=float), np.asarray(demand, dtype=float))
+    bank = np.cumsum(recy - demand, axis=-1)
+    low = np.minimum.accumulate(bank, axis=-1)
+    bank -= np.minimum(low, 0, out=low)
+    # the demand is covered whenever the bank grows, otherwise the recycled mass and the bank are used up
+    used = recy.copy()
+    used[..., 1:] += bank[..., :-1]
+    return np.minimum(used, demand, out=used), bank
+
+# 0/1 matrix of the material group of each material, the groups in the order of their first material
+def get_category_matrix(materials):
+    '''
+    :param materials: material names, e.g. the columns of the material flows
+    :return: [material, category] matrix, list of the categories
+    '''
+    groups = [get_impact_material(m) for m in materials]
+    categories = list(collections.OrderedDict.fromkeys(g for g in groups if g is not None))
+    matrix = np.zeros((len(materials), len(categories)))
+    for i, g in enumerate(groups):
+        if g is not None:
+            matrix[i, categories.index(g)] = 1
+    return matrix, categories
+
+# impact factors of each material group, in the order of IMPACTS
+def get_factor_matrix(env_impact, categories):
+    '''
+    :param env_impact: {column of the envir_impact sheet: {material group: factor}}
+    :param categories: material groups, see get_category_matrix
+    :return: [category, impact] factors (MJ kg-1 and kg kg-1)
+    '''
+    return np.asarray([[env_impact[column][c] for column in IMPACT_FACTORS.values()] for c in categories], dtype=float)
+
+# closed-loop recycled mass of each strategy, at most the material demand of the year
+def get_recycled_supply(outflow, rates, demand, carry_over=True):
+    '''
+    :param outflow: [year, material] EoL outflow
+    :param rates: [strategy, material] closed-loop recycling rate
+    :param demand: [year, material] material inflow
+    :param carry_over: the recycled mass exceeding the demand of a year is used the next year, otherwise it is lost
+    :return: [strategy, year, material] recycled mass replacing virgin material,
+             [strategy, year, material] unused recycled mass in the scrap bank at the end of each year (zero without carry_over)
+    '''
+    recy = np.asarray(rates, dtype=float)[:, None] * np.asarray(outflow, dtype=float)[None]
+    if not carry_over:
+        return np.minimum(recy, demand[None]), np.zeros_like(recy)
+    used, bank = carry_forward(np.swapaxes(recy, 1, 2), np.swapaxes(demand, 0, 1)[None])
+    return np.swapaxes(used, 1, 2), np.swapaxes(bank, 1, 2)
+
+# energy (PJ) and CO2 (Mt) of the material production and of the recycling savings, by material group
+def get_env_impact(inflow, recycled, materials, env_impact, strategies, year):
+    '''
+    :param inflow: [year, material] material inflow (t)
+    :param recycled: [strategy, year, material] closed-loop recycled mass (t), see get_recycled_supply
+    :param materials: material names, the materials without impact factors are left out
+    :param env_impact: {column of the envir_impact sheet: {material group: factor}}
+    :return: LabelledArray [strategy, year, category, impact], the impacts are IMPACTS then NET_IMPACTS
+    '''
+    category, categories = get_category_matrix(materials)
+    factors = get_factor_matrix(env_impact, categories) / 1e6 # t * MJ kg-1 -> PJ, t * kg kg-1 -> Mt
+    is_consumption = np.isin(IMPACTS, CONSUMPTION_IMPACTS)
+    # mass of each material group, the production impacts use the inflow and the savings the recycled mass
+    inflow_by_category = np.asarray(inflow, dtype=float) @ category # [year, category]
+    recycled_by_category = np.asarray(recycled, dtype=float) @ category # [strategy, year, category]
+    impact = np.where(is_consumption, inflow_by_category[None, :, :, None], recycled_by_category[..., None]) * factors
+    net = impact[..., is_consumption] - impact[..., ~is_consumption]
+    values = np.concatenate([impact, net], axis=-1)
+    coords = {'strategy': list(strategies), 'year': list(year), 'category': categories, 'impact': IMPACTS + NET_IMPACTS}
+    return LabelledArray(values, ('strategy', 'year', 'category', 'impact'), coords)
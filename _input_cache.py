@@ -0,0 +1,281 @@
+"""
+This script is used to serve the input workbook (input_data/Wind_data.xls) from a binary cache
+
+It contains:
+- a single xls parse of every sheet, stored as columnar arrays in one compressed .npz file
+- cache files keyed by the sha256 of the workbook content, so an edited workbook invalidates automatically
+- drop-in replacements for xlrd.open_workbook and pd.read_excel used by the model loaders
+- a content hash of every sheet, so the pipeline can tell which sheets of an edited workbook changed
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+import os
+import json
+import hashlib
+import numpy as np
+
+from _instrument import instrumented, span
+
+DEFAULT_PATH = "input_data/Wind_data.xls"
+CACHE_DIR_NAME = '.cache'
+CACHE_VERSION = 1
+
+# xlrd cell types (xlrd.XL_CELL_*)
+XL_CELL_EMPTY, XL_CELL_TEXT, XL_CELL_NUMBER, XL_CELL_DATE, XL_CELL_BOOLEAN, XL_CELL_ERROR, XL_CELL_BLANK = range(7)
+
+# in-process memo: (abspath, mtime, size) -> content hash, content hash -> workbook
+_HASHES = {}
+_WORKBOOKS = {}
+_FRAMES = {}
+_SHEET_HASHES = {}
+
+"""
+================
+Define classes
+================
+"""
+class CachedSheet:
+    """
+    Column-oriented copy of one worksheet with the same cell access API as xlrd.sheet.Sheet
+
+    Arguments:
+    ----------
+    name: str
+        Name of the worksheet
+    types: np.ndarray
+        [nrows, ncols] int8 array of xlrd cell types
+    numbers: np.ndarray
+        [nrows, ncols] float64 array holding number/date/boolean/error cells (NaN elsewhere)
+    texts: dict
+        {flat cell index: str} for the text cells
+    """
+    def __init__(self, name, types, numbers, texts):
+        self.name = name
+        self.types = types
+        self.numbers = numbers
+        self.texts = texts
+        self.nrows, self.ncols = types.shape
+
+    def cell_type(self, rowx, colx):
+        return int(self.types[rowx, colx])
+
+    def cell_value(self, rowx, colx):
+        typ = self.types[rowx, colx]
+        if typ == XL_CELL_TEXT:
+            return self.texts[rowx * self.ncols + colx]
+        if typ in (XL_CELL_NUMBER, XL_CELL_DATE):
+            return float(self.numbers[rowx, colx])
+        if typ in (XL_CELL_BOOLEAN, XL_CELL_ERROR):
+            return int(self.numbers[rowx, colx])
+        return ''
+
+    def row_values(self, rowx):
+        return [self.cell_value(rowx, j) for j in range(self.ncols)]
+
+    def row_types(self, rowx):
+        return [int(t) for t in self.types[rowx]]
+
+
+class CachedWorkbook:
+    """Read-only workbook built from the binary cache, mirroring xlrd.book.Book"""
+    def __init__(self, sheets, datemode, content_hash):
+        self._sheets = sheets
+        self.datemode = datemode
+        self.content_hash = content_hash
+
+    def sheet_names(self):
+        return list(self._sheets.keys())
+
+    def sheet_by_name(self, sheet_name):
+        try:
+            return self._sheets[sheet_name]
+        except KeyError:
+            raise ValueError('No sheet named <{!r}>'.format(sheet_name))
+
+    def sheets(self):
+        return list(self._sheets.values())
+
+"""
+================
+Define functions
+================
+"""
+# sha256 of the workbook content, memoised on (path, mtime, size) within a process
+def workbook_hash(path=DEFAULT_PATH):
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _HASHES:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        _HASHES[key] = h.hexdigest()
+    return _HASHES[key]
+
+def get_cache_path(path, content_hash):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(os.path.dirname(path), CACHE_DIR_NAME, '{}-{}.npz'.format(stem, content_hash[:16]))
+
+# parse every sheet of the xls file once and flatten it into arrays
+@instrumented('parse workbook')
+def _parse_workbook(path):
+    import xlrd
+    wb = xlrd.open_workbook(path)
+    arrays = {}
+    names = []
+    for si, sheet in enumerate(wb.sheets()):
+        names.append(sheet.name)
+        types = np.zeros([sheet.nrows, sheet.ncols], dtype=np.int8)
+        numbers = np.full([sheet.nrows, sheet.ncols], np.nan)
+        text_idx, text_val = [], []
+        for i in range(sheet.nrows):
+            for j, (v, t) in enumerate(zip(sheet.row_values(i), sheet.row_types(i))):
+                types[i, j] = t
+                if t == XL_CELL_TEXT:
+                    text_idx.append(i * sheet.ncols + j)
+                    text_val.append(v.encode('utf-8'))
+                elif t in (XL_CELL_NUMBER, XL_CELL_DATE, XL_CELL_BOOLEAN, XL_CELL_ERROR):
+                    numbers[i, j] = v
+        # strings are stored as one utf-8 blob plus offsets
+        offsets = np.cumsum([0] + [len(v) for v in text_val]).astype(np.int64)
+        arrays['{}__types'.format(si)] = types
+        arrays['{}__numbers'.format(si)] = numbers
+        arrays['{}__text_idx'.format(si)] = np.asarray(text_idx, dtype=np.int64)
+        arrays['{}__text_offsets'.format(si)] = offsets
+        arrays['{}__text_blob'.format(si)] = np.frombuffer(b''.join(text_val), dtype=np.uint8)
+    meta = {'version': CACHE_VERSION, 'sheets': names, 'datemode': wb.datemode}
+    arrays['meta'] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+    return arrays
+
+def _write_cache(cache_path, arrays):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # remove caches of previous versions of the same workbook
+    prefix = os.path.basename(cache_path).rsplit('-', 1)[0] + '-'
+    for f in os.listdir(os.path.dirname(cache_path)):
+        if f.startswith(prefix) and f.endswith('.npz') and f != os.path.basename(cache_path):
+            try:
+                os.remove(os.path.join(os.path.dirname(cache_path), f))
+            except OSError:
+                pass
+    # write to a temporary file first so concurrent readers never see a partial cache
+    tmp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp_path, cache_path)
+
+def _build_workbook(arrays, content_hash):
+    meta = json.loads(bytes(arrays['meta']).decode('utf-8'))
+    if meta.get('version') != CACHE_VERSION:
+        raise ValueError('Unsupported input cache version: {}'.format(meta.get('version')))
+    sheets = {}
+    for si, name in enumerate(meta['sheets']):
+        types = arrays['{}__types'.format(si)]
+        blob = bytes(arrays['{}__text_blob'.format(si)])
+        offsets = arrays['{}__text_offsets'.format(si)]
+        text_idx = arrays['{}__text_idx'.format(si)]
+        texts = {int(k): blob[offsets[n]: offsets[n + 1]].decode('utf-8') for n, k in enumerate(text_idx)}
+        sheets[name] = CachedSheet(name, types, arrays['{}__numbers'.format(si)], texts)
+    return CachedWorkbook(sheets, meta['datemode'], content_hash)
+
+# drop-in replacement of xlrd.open_workbook
+def open_workbook(path=DEFAULT_PATH):
+    '''
+    :param path: path to the excel file
+    :return: CachedWorkbook, parsed from the xls file only if no cache exists for its content
+    '''
+    content_hash = workbook_hash(path)
+    if content_hash in _WORKBOOKS:
+        return _WORKBOOKS[content_hash]
+    cache_path = get_cache_path(path, content_hash)
+    arrays = None
+    if os.path.exists(cache_path):
+        try:
+            with span('load input cache'):
+                with np.load(cache_path) as npz:
+                    arrays = {k: npz[k] for k in npz.files}
+                wb = _build_workbook(arrays, content_hash)
+        except (OSError, ValueError, KeyError):
+            arrays = None
+    if arrays is None:
+        arrays = _parse_workbook(path)
+        _write_cache(cache_path, arrays)
+        wb = _build_workbook(arrays, content_hash)
+    _WORKBOOKS[content_hash] = wb
+    return wb
+
+# sha256 of the cells of every sheet, memoised on the workbook content
+def sheet_hashes(path=DEFAULT_PATH):
+    '''
+    :param path: path to the excel file
+    :return: {sheet name: sha256 of its cell types, numbers and texts}
+    '''
+    wb = open_workbook(path)
+    if wb.content_hash not in _SHEET_HASHES:
+        hashes = {}
+        for sheet in wb.sheets():
+            h = hashlib.sha256()
+            h.update(np.asarray(sheet.types.shape, dtype=np.int64).tobytes())
+            h.update(sheet.types.tobytes())
+            h.update(sheet.numbers.tobytes())
+            h.update(json.dumps(sorted(sheet.texts.items())).encode('utf-8'))
+            hashes[sheet.name] = h.hexdigest()
+        _SHEET_HASHES[wb.content_hash] = hashes
+    return dict(_SHEET_HASHES[wb.content_hash])
+
+# convert the cells of a sheet into the python objects pandas' xlrd reader would produce
+def _sheet_rows(sheet, datemode):
+    rows = []
+    for i in range(sheet.nrows):
+        row = []
+        for j in range(sheet.ncols):
+            typ = sheet.types[i, j]
+            value = sheet.cell_value(i, j)
+            if typ == XL_CELL_DATE:
+                from xlrd import xldate
+                try:
+                    value = xldate.xldate_as_datetime(value, datemode)
+                    # dates on the epoch are times only
+                    if value.timetuple()[0:3] == ((1904, 1, 1) if datemode else (1899, 12, 31)):
+                        value = value.time()
+                except OverflowError:
+                    pass
+            elif typ == XL_CELL_ERROR:
+                value = np.nan
+            elif typ == XL_CELL_BOOLEAN:
+                value = bool(value)
+            elif typ == XL_CELL_NUMBER:
+                # excel numbers are always floats, integral values are read as int
+                if int(value) == value:
+                    value = int(value)
+            row.append(value)
+        rows.append(row)
+    return rows
+
+# drop-in replacement of pd.read_excel(path, sheet_name=..., header=...)
+def read_excel(path=DEFAULT_PATH, sheet_name=0, header=0):
+    '''
+    :param path: path to the excel file
+    :param sheet_name: name (or position) of the sheet
+    :param header: row to use for the column labels
+    :return: DataFrame identical to pd.read_excel with the xlrd engine
+    '''
+    import pandas as pd
+    from pandas.io.parsers import TextParser
+
+    wb = open_workbook(path)
+    if isinstance(sheet_name, int):
+        sheet_name = wb.sheet_names()[sheet_name]
+    key = (wb.content_hash, sheet_name, header)
+    if key not in _FRAMES:
+        sheet = wb.sheet_by_name(sheet_name)
+        rows = _sheet_rows(sheet, wb.datemode)
+        if len(rows) == 0:
+            _FRAMES[key] = pd.DataFrame()
+        else:
+            _FRAMES[key] = TextParser(rows, header=header, skip_blank_lines=False).read()
+    return _FRAMES[key].copy()
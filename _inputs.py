@@ -0,0 +1,491 @@
+"""
+This script is used to load the model inputs from the excel file (input_data/Wind_data.xls)
+
+It contains:
+- loaders for every sheet used by the model (served from the binary input cache)
+- ModelInputs: an immutable container of all inputs, loaded once per process and
+  passed through CapacityFlow, capacity_onshore/capacity_offshore and the env-impact functions
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+import dataclasses
+import numpy as np
+from _input_cache import DEFAULT_PATH, open_workbook, read_excel, workbook_hash, sheet_hashes
+from _instrument import instrumented
+from _time_axis import get_time_axis
+
+NACELLE_TYPES = ["DFIG/SCIG", "EESGDD", "PMSGDD", "PMSGGB", "PDD", "SDD"]
+
+"""
+=============
+prepare files
+=============
+"""
+# read the capacity demand scenarios and lifetimes
+def get_capacity_data_from_excel(excel_path):
+    df_onshore = read_excel(excel_path, sheet_name='on_capacity')
+    df_offshore = read_excel(excel_path, sheet_name='off_capacity')
+    # extract the historical onshore inflow data
+    inflow_history_onshore = df_onshore['on_historical_capacity_inflow'].dropna().values
+    # extract the future onshore/offshore stock capacity data
+    stock_future_onshore = {
+        'Gcam': df_onshore['on_future_capacity_stock'].dropna().to_list(),
+        'GNZ': df_onshore['on_future_capacity_stock_1'].dropna().to_list(),
+    }
+    stock_future_offshore = {
+        'Gcam': df_offshore['off_future_capacity'].dropna().to_list(),
+        'GNZ': df_offshore['off_future_capacity_1'].dropna().to_list(),
+    }
+    # extract the historical/future year data
+    def process_years(df_col):
+        years = df_col.dropna().to_list()
+        years = [int(year) for year in years]
+        return years
+    years_future_onshore, years_future_offshore, years_history_onshore = [
+        process_years(df_col) for df_col in [
+            df_onshore['on_future_year'], df_offshore['off_future_year'], df_onshore['on_historical_year']]
+    ]
+    # extract lifetimes
+    lifetimes = read_excel(excel_path, sheet_name='tech_dev', header=0)
+    historical_lifetime = list(lifetimes['his_lifetime'].dropna().values)[0]
+    future_lifetime = list(lifetimes['future_lifetime'].dropna().values)[0]
+
+    return stock_future_onshore, years_future_onshore, years_history_onshore, inflow_history_onshore, \
+        stock_future_offshore, years_future_offshore, historical_lifetime, future_lifetime
+
+# read the histortcal onshore wind turbine information (1993-2019)
+def load_original_data(path="input_data/Wind_data.xls"):
+    '''
+    :param path: path to the excel file
+    :return: list of d, h, nacelle, tower, time
+    '''
+    wb = open_workbook(path)
+    # load existing data
+    sheet = wb.sheet_by_name('historical_info')
+    n_rows = 6698
+    c_list = [sheet.cell_value(i, 6) for i in range(1, n_rows)] # c_list is the capacity of wind turbine
+    d_list = [sheet.cell_value(i, 7) for i in range(1, n_rows)] # d_list is the diameter of wind turbine
+    h_list = [sheet.cell_value(i, 8) for i in range(1, n_rows)] # h_list is the hub height of wind turbine
+    nacl_list = [sheet.cell_value(i, 14) for i in range(1, n_rows)] # nacl_list is the nacelle type of wind turbine
+    tower_list = [sheet.cell_value(i, 15) for i in range(1, n_rows)] # tower_list is the tower type of wind turbine
+    time_list = [sheet.cell_value(i, 5) for i in range(1, n_rows)] # time_list is the installation yearof wind turbine
+    
+    for i in range(len(nacl_list)):
+        if 'DFIG' in nacl_list[i] or 'SCIG' in nacl_list[i]:
+            nacl_list[i] = 'DFIG/SCIG'
+    # for i in range(len(c_list)):
+    #     if '/' in str(c_list[i]):
+    #         # get average
+    #         c_list[i] = np.mean([float(x) for x in c_list[i].split('/')])
+    #     if '-' in str(c_list[i]):
+    #         # get average
+    #         c_list[i] = np.mean([float(x) for x in c_list[i].split('-')])
+    
+    return c_list, d_list, h_list, nacl_list, tower_list, time_list
+
+#  read the onshore wind turbine material consumption data
+def load_onshore_dict(path="input_data/Wind_data.xls"):
+    '''
+    return a dictionary of onshore data
+    {Nacc: ..., Tower: ..., Blade: ..., Hub: ...}
+    '''
+    
+    wb = open_workbook(path)
+    sheet = wb.sheet_by_name('on_material')
+    import collections
+    onshore_dict = collections.OrderedDict()
+    for i in range(3, 14):
+        m = sheet.cell_value(i, 0)
+        if len(m) == 0:
+            continue
+        for j in range(1, 11):
+            t = sheet.cell_value(1, j)
+            if t not in onshore_dict:
+                onshore_dict[t] = collections.OrderedDict()
+            if m not in onshore_dict[t]:
+                onshore_dict[t][m] = collections.OrderedDict()
+            onshore_dict[t][m] = sheet.cell_value(i, j) if sheet.cell_value(i, j) != '' else 0
+            if i >= 12:
+                onshore_dict[t][m] = onshore_dict[t][m] / 10**6
+    return onshore_dict
+
+# read the offshore wind turbine material consumption data
+def load_offshore_dict(path="input_data/Wind_data.xls"):
+    '''
+    return a dictionary of onshore data
+    {Nacc: ..., Tower: ..., Blade: ..., Hub: ...}
+    '''
+    
+    wb = open_workbook(path)
+    sheet = wb.sheet_by_name('off_material')
+    import collections
+    onshore_dict = collections.OrderedDict()
+    for i in range(3, 14):
+        m = sheet.cell_value(i, 0)
+        if len(m) == 0:
+            continue
+        for j in range(1, 11):
+            t = sheet.cell_value(1, j)
+            if t not in onshore_dict:
+                onshore_dict[t] = collections.OrderedDict()
+            if m not in onshore_dict[t]:
+                onshore_dict[t][m] = collections.OrderedDict()
+            onshore_dict[t][m] = sheet.cell_value(i, j) if sheet.cell_value(i, j) != '' else 0
+            if i >= 12:
+                onshore_dict[t][m] = onshore_dict[t][m] / 10**6
+    return onshore_dict
+
+# read the avg_turb, avg_nacl and avg_rotor columns from the excel file: one value per historical year,
+# then one per decade from 2020 for onshore (2020-2029, 2030-2039, 2040-2050) and the same for offshore
+def read_avg_data(path):
+    df = read_excel(path, sheet_name='his_analysis', header=1)
+    avg_turb = df["Average of Turbine rated capacity (kW)"].dropna().tolist()
+    avg_nacl = df["Average of Nacelle mass (t)"].dropna().tolist()
+    avg_rotor = df["Average of Rotor mass (t)"].dropna().tolist()
+    return avg_turb, avg_nacl, avg_rotor
+
+# average turbine capacity, nacelle mass and rotor mass of each period of the time axis, onshore then offshore
+def get_avg_series(avg_data, axis):
+    '''
+    :param avg_data: avg_turb, avg_nacl and avg_rotor columns, see read_avg_data
+    :param axis: TimeAxis
+    :return: avg_turb, avg_nacl, avg_rotor onshore, then offshore, each [n_periods]
+    '''
+    n_history = axis.future_start - axis.history_start
+    series = []
+    for offset in [0, 3]:
+        for values in avg_data:
+            decades = values[n_history + offset: n_history + offset + 3]
+            series.append(np.concatenate((axis.repeat_history(values[:n_history]), axis.expand_decades(decades))))
+    return tuple(series)
+
+# read the avg_turb, avg_nacl and avg_rotor from the excel file, by period of the time axis (annual up to 2050 by default)
+def load_avg_data(path, axis=None):
+    axis = axis if axis is not None else get_time_axis(get_model_inputs(path))
+    return get_avg_series(read_avg_data(path), axis)
+
+# load the historical tech data from the excel file
+def load_history_market_share(excel_path = "input_data/Wind_data.xls", tp=1):
+    df = read_excel(excel_path, sheet_name='his_analysis', header=1)
+    nacl_type = {}
+    for k in ["DFIG/SCIG", "EESGDD", "PMSGDD", "PMSGGB", "PDD", "SDD"]:
+        nacl_type[k] = df[k].dropna().tolist()
+    return nacl_type
+
+# load the future nacelle market share of all tech scenarios, column 'Unnamed: 3' is onshore and 'Unnamed: 5' is offshore
+def load_nacelle_share(excel_path="input_data/Wind_data.xls", column='Unnamed: 3'):
+    df = read_excel(excel_path, sheet_name='tech_dev', header=1)
+    nacl_list = df['nacelle_onshore_summary'].dropna().tolist()
+    nacl_vals = df[column].dropna().tolist()
+    nacl_type = {}
+    for i in range(len(nacl_list)):
+        if nacl_list[i] not in nacl_type:
+            nacl_type[nacl_list[i]] = []
+        nacl_type[nacl_list[i]].append(nacl_vals[i])
+    return nacl_type
+
+# load the future tower market share from the excel file
+def load_tower_share(excel_path="input_data/Wind_data.xls"):
+    df = read_excel(excel_path, sheet_name='tech_dev', header=1)
+    tower_type = {
+        'Hybrid': df['Hybrid'].dropna().values[0],
+        'Steel': df['Steel'].dropna().values[0],
+    }
+    return tower_type
+
+# load the future onshore/offshore average capacity per wind turbine (2020-2029, 2030-2039, 2040-2050)
+def load_capacity_per_turbine(excel_path="input_data/Wind_data.xls"):
+    df_onshore = read_excel(excel_path, sheet_name='on_capacity')
+    df_offshore = read_excel(excel_path, sheet_name='off_capacity')
+    per_cap_onshore = df_onshore['on_future_capacity_per_turbine '].dropna().tolist()
+    per_cap_offshore = df_offshore['Off_Future_capacity_per_turbine'].dropna().tolist()
+    return per_cap_onshore, per_cap_offshore
+
+# load the replacement rates of nacelle and rotor from the excel file
+def load_replacement_data(excel_path = "input_data/Wind_data.xls"):
+    df = read_excel(excel_path, sheet_name='tech_dev', header=1)
+    future_nacl_rep = df['future_nacelle_replacement'].dropna().tolist()
+    future_rotor_rep = df['future_rotor_replacement'].dropna().tolist()
+    his_nacl_rep = df['his_nacelle_replacement'].dropna().tolist()
+    his_rotor_rep = df['his_rotor_replacement'].dropna().tolist()
+    return future_nacl_rep, future_rotor_rep, his_nacl_rep, his_rotor_rep
+
+# read different EoL teartment strategies data
+def get_data_from_recy_new(path="input_data/Wind_data.xls"):
+    wb = open_workbook(path)
+    # load existing data
+    sheet = wb.sheet_by_name('recy_rate_new')
+    
+    table = {}
+    
+    for i in range(sheet.nrows):
+        
+        if 'EoL' in str(sheet.cell_value(i, 0)):
+            start_row = i
+            t_type = sheet.cell_value(i, 0)
+            
+            # create t type table
+            table[t_type + '_onshore'] = {}
+            table[t_type + '_offshore'] = {}
+            
+            # material rows until the first empty material cell, any number of strategy blocks
+            b_i = i + 2
+            while b_i < sheet.nrows and sheet.cell_value(b_i, 1) != '':
+                material = sheet.cell_value(b_i, 1)
+                onshore_recy = [sheet.cell_value(b_i, j) for j in range(2, 7)]
+                offshore_recy = [sheet.cell_value(b_i, j) for j in range(9, 14)]
+                
+                # write to table
+                table[t_type + '_onshore'][material] = onshore_recy
+                table[t_type + '_offshore'][material] = offshore_recy
+                b_i += 1
+
+    proc_methods = [sheet.cell_value(2, j).replace('on_', '') for j in range(2, 7)]
+    
+    return table, proc_methods
+
+# read EoL treatment strategies from a csv file, one row per strategy, site and material
+def load_eol_strategies(path, proc_methods, materials=None):
+    '''
+    The csv file has the columns strategy, site (onshore or offshore), material and one column of shares per EoL treatment,
+    named as in the recy_rate_new sheet, e.g.
+    strategy,site,material,Closed-loop recycling,Open to high- and middle-end recycling,Open to low-end recycling,Incineration,Discard or landfill
+
+    :param proc_methods: names of the EoL treatments, the columns of the shares
+    :param materials: materials every strategy must cover, e.g. those of the recy_rate_new sheet
+    :return: {'<strategy>_<onshore/offshore>': {material: shares}}
+    '''
+    import csv
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    missing = [c for c in ['strategy', 'site', 'material'] + list(proc_methods) if rows and c not in rows[0]]
+    if not rows or missing:
+        raise ValueError('{}: missing columns {}'.format(path, missing or 'and rows'))
+
+    table = {}
+    for n, row in enumerate(rows, start=2):
+        site = row['site'].strip().lower()
+        if site not in ['onshore', 'offshore']:
+            raise ValueError('{}, line {}: site must be onshore or offshore, got {!r}'.format(path, n, row['site']))
+        shares = [float(row[p]) for p in proc_methods]
+        if abs(sum(shares) - 1) > 1e-6:
+            raise ValueError('{}, line {}: the shares of {} sum to {:g}, not 1'.format(path, n, row['material'], sum(shares)))
+        table.setdefault(row['strategy'].strip() + '_' + site, {})[row['material'].strip()] = shares
+
+    for name, strategy in table.items():
+        missing = [m for m in materials or [] if m not in strategy]
+        if missing:
+            raise ValueError('{}: strategy {} has no shares for {}'.format(path, name, missing))
+    return table
+
+# get environmental impact factor from excel
+def get_env_impact(path=''):
+    wb = open_workbook(path)
+    # load existing data
+    sheet = wb.sheet_by_name('envir_impact')
+    
+    env_impact = {}
+    
+    for i in range(0, 8):
+        for j in range(1, 5):
+            col_name = sheet.cell_value(0, j)
+            if col_name not in env_impact:
+                env_impact[col_name] = {}
+            row_name = sheet.cell_value(i, 0).strip()
+            env_impact[col_name][row_name] = sheet.cell_value(i, j)
+            if isinstance(sheet.cell_value(i, j), str) and 'N/A' in sheet.cell_value(i, j):
+                env_impact[col_name][row_name] = 0
+    return env_impact
+
+"""
+==============
+Define classes
+==============
+"""
+class FrozenDict(dict):
+    """Read-only dict used for the tables held by ModelInputs"""
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('ModelInputs are read-only')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+# recursively convert dicts, lists and arrays into read-only containers
+def _freeze(value):
+    if isinstance(value, dict):
+        return FrozenDict({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, np.ndarray):
+        value = value.copy()
+        value.setflags(write=False)
+        return value
+    return value
+
+@dataclasses.dataclass(frozen=True)
+class ModelInputs:
+    """
+    This class holds every model input read from the excel file
+
+    Arguments:
+    ----------
+    excel_path: str
+        Path to the excel file the inputs were read from
+    content_hash: str
+        sha256 of the excel file content
+    sheet_hashes: dict
+        sha256 of the content of each sheet {sheet name: hash}
+    stock_future_onshore, stock_future_offshore: dict
+        Future stock capacity (MW) of each energy demand scenario {'Gcam': ..., 'GNZ': ...}
+    years_future_onshore, years_history_onshore, years_future_offshore: tuple
+        Years of the capacity data
+    inflow_history_onshore: np.ndarray
+        1993-2019 onshore capacity inflow (MW)
+    historical_lifetime, future_lifetime: float
+        Mean lifetime of the wind turbines (years)
+    per_cap_onshore, per_cap_offshore: tuple
+        Future average capacity per wind turbine (kW) for 2020-2029, 2030-2039 and 2040-2050 (the last one holds until the end of the horizon)
+    history_nacl_share: dict
+        Historical nacelle market share {nacelle type: (share by year)}
+    nacl_share_onshore, nacl_share_offshore: dict
+        Future nacelle market share {nacelle type: (share by tech scenario)}
+    tower_share: dict
+        Future tower market share {tower type: share}
+    replacement: tuple
+        (future nacelle, future rotor, historical nacelle, historical rotor) replacement rates by tech scenario
+    avg_data: tuple
+        Average turbine capacity, nacelle mass and rotor mass by historical year, then by decade (onshore, then offshore),
+        see avg_series for the values of each period
+    onshore_dict, offshore_dict: dict
+        Material composition {component type: {material: share}}
+    historical_fleet: tuple
+        (capacity, diameter, height, nacelle type, tower type, year) of each historical wind turbine
+    recy_table: dict
+        EoL treatment shares {'<strategy>_<onshore/offshore>': {material: shares}}
+    proc_methods: tuple
+        Names of the EoL treatments
+    env_impact: dict
+        Environmental impact factors {indicator: {material: factor}}
+    """
+    excel_path: str
+    content_hash: str
+    sheet_hashes: dict
+    stock_future_onshore: dict
+    years_future_onshore: tuple
+    years_history_onshore: tuple
+    inflow_history_onshore: np.ndarray
+    stock_future_offshore: dict
+    years_future_offshore: tuple
+    historical_lifetime: float
+    future_lifetime: float
+    per_cap_onshore: tuple
+    per_cap_offshore: tuple
+    history_nacl_share: dict
+    nacl_share_onshore: dict
+    nacl_share_offshore: dict
+    tower_share: dict
+    replacement: tuple
+    avg_data: tuple
+    onshore_dict: dict
+    offshore_dict: dict
+    historical_fleet: tuple
+    recy_table: dict
+    proc_methods: tuple
+    env_impact: dict
+
+    def future_market_share(self, tp, site='onshore'):
+        """Future nacelle market share of the tech scenario tp"""
+        shares = self.nacl_share_onshore if site == 'onshore' else self.nacl_share_offshore
+        return {k: v[tp] for k, v in shares.items()}
+
+    def market_share_series(self, tp, axis=None):
+        """Historical nacelle market share followed by the future market share of the tech scenario tp, by period of the time axis"""
+        axis = axis if axis is not None else get_time_axis(self)
+        future = self.future_market_share(tp)
+        return {k: list(axis.repeat_history(self.history_nacl_share[k])) + [future[k]] * axis.n_future for k in self.history_nacl_share}
+
+    def avg_series(self, axis=None):
+        """Average turbine capacity, nacelle mass and rotor mass by period of the time axis (onshore, then offshore)"""
+        return get_avg_series(self.avg_data, axis if axis is not None else get_time_axis(self))
+
+    def replacement_rates(self, tp):
+        """Nacelle and rotor replacement rates (future nacelle, future rotor, historical nacelle, historical rotor)"""
+        return tuple(rates[tp] for rates in self.replacement)
+
+    def with_strategies(self, path):
+        '''
+        :param path: csv file of EoL strategies, see load_eol_strategies
+        :return: ModelInputs with the strategies of the file added to recy_table (replacing the sheet ones of the same name),
+                 the hash of the recy_rate_new sheet covers the file so the pipeline cache tells the strategies apart
+        '''
+        import hashlib
+        materials = list(self.recy_table['EoL_C_onshore'])
+        table = dict(self.recy_table)
+        table.update(load_eol_strategies(path, self.proc_methods, materials))
+        h = hashlib.sha256(self.sheet_hashes['recy_rate_new'].encode())
+        with open(path, 'rb') as f:
+            h.update(f.read())
+        hashes = dict(self.sheet_hashes, recy_rate_new=h.hexdigest())
+        return dataclasses.replace(self, recy_table=_freeze(table), sheet_hashes=_freeze(hashes))
+
+"""
+================
+Define functions
+================
+"""
+# read every input of the model from the excel file
+@instrumented()
+def load_model_inputs(excel_path=DEFAULT_PATH):
+    (stock_future_onshore, years_future_onshore, years_history_onshore, inflow_history_onshore,
+     stock_future_offshore, years_future_offshore, historical_lifetime, future_lifetime) = get_capacity_data_from_excel(excel_path)
+    per_cap_onshore, per_cap_offshore = load_capacity_per_turbine(excel_path)
+    recy_table, proc_methods = get_data_from_recy_new(path=excel_path)
+    fields = dict(
+        excel_path=excel_path,
+        content_hash=workbook_hash(excel_path),
+        sheet_hashes=sheet_hashes(excel_path),
+        stock_future_onshore={k: np.asarray(v, dtype=float) for k, v in stock_future_onshore.items()},
+        years_future_onshore=years_future_onshore,
+        years_history_onshore=years_history_onshore,
+        inflow_history_onshore=inflow_history_onshore,
+        stock_future_offshore={k: np.asarray(v, dtype=float) for k, v in stock_future_offshore.items()},
+        years_future_offshore=years_future_offshore,
+        historical_lifetime=historical_lifetime,
+        future_lifetime=future_lifetime,
+        per_cap_onshore=per_cap_onshore,
+        per_cap_offshore=per_cap_offshore,
+        history_nacl_share=load_history_market_share(excel_path),
+        nacl_share_onshore=load_nacelle_share(excel_path, column='Unnamed: 3'),
+        nacl_share_offshore=load_nacelle_share(excel_path, column='Unnamed: 5'),
+        tower_share=load_tower_share(excel_path),
+        replacement=load_replacement_data(excel_path),
+        avg_data=read_avg_data(excel_path),
+        onshore_dict=load_onshore_dict(path=excel_path),
+        offshore_dict=load_offshore_dict(path=excel_path),
+        historical_fleet=load_original_data(path=excel_path),
+        recy_table=recy_table,
+        proc_methods=proc_methods,
+        env_impact=get_env_impact(path=excel_path),
+    )
+    return ModelInputs(**{k: _freeze(v) for k, v in fields.items()})
+
+# the inputs are loaded once per process and per workbook content
+_MODEL_INPUTS = {}
+
+def get_model_inputs(excel_path=DEFAULT_PATH, strategies=None):
+    '''
+    :param strategies: optional csv file of EoL strategies added to those of the recy_rate_new sheet, see load_eol_strategies
+    '''
+    content_hash = workbook_hash(excel_path)
+    if content_hash not in _MODEL_INPUTS:
+        _MODEL_INPUTS[content_hash] = load_model_inputs(excel_path)
+    if strategies is not None:
+        return _MODEL_INPUTS[content_hash].with_strategies(strategies)
+    return _MODEL_INPUTS[content_hash]
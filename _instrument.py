@@ -0,0 +1,243 @@
+"""
+This script is used to measure where the time and the memory of a run go
+
+It contains:
+- span: a context manager timing a block (wall time, CPU time, peak RSS, optionally the peak of the allocations)
+- instrumented: the same for a whole function, with the size of the arrays it returns
+- a json run report summarised by span name, and a Chrome trace (chrome://tracing, https://ui.perfetto.dev)
+
+Nothing is recorded unless enable is called (e.g. by --profile or --trace on the command line),
+span and instrumented then only cost one global check.
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import functools
+import contextlib
+import collections
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# recorder of this process, None when the instrumentation is off
+_RECORDER = None
+
+# shared by every span while the instrumentation is off
+_NULL_SPAN = contextlib.nullcontext()
+
+"""
+==============
+Define classes
+==============
+"""
+class Recorder:
+    """
+    This class is used to collect the spans of a process
+
+    Arguments:
+    ----------
+    alloc: bool
+        Also trace the python/numpy allocations with tracemalloc (slows down the run)
+    """
+    def __init__(self, alloc=False):
+        self.alloc = alloc
+        self.events = []
+        self.stack = []
+        self.start = time.time()
+        if alloc:
+            import tracemalloc
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def span(self, name, args):
+        parent = self.stack[-1] if len(self.stack) > 0 else None
+        event = {'name': name, 'pid': os.getpid(), 'tid': threading.get_ident(), 'ts': time.time(),
+                 'parent': parent['name'] if parent is not None else None, 'depth': len(self.stack), 'args': dict(args)}
+        rss_start = get_peak_rss()
+        if self.alloc:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                parent['_alloc_max'] = max(parent['_alloc_max'], peak)
+            tracemalloc.reset_peak()
+            event['_alloc_start'], event['_alloc_max'] = current, current
+        self.stack.append(event)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield event
+        finally:
+            event['wall'] = time.perf_counter() - wall
+            event['cpu'] = time.process_time() - cpu
+            self.stack.pop()
+            event['rss_peak'] = get_peak_rss()
+            event['rss_growth'] = event['rss_peak'] - rss_start if rss_start is not None else None
+            if self.alloc:
+                import tracemalloc
+                peak = max(event.pop('_alloc_max'), tracemalloc.get_traced_memory()[1])
+                event['alloc_peak'] = peak - event.pop('_alloc_start')
+                if parent is not None:
+                    parent['_alloc_max'] = max(parent['_alloc_max'], peak)
+            self.events.append(event)
+
+"""
+================
+Define functions
+================
+"""
+# peak resident set size of this process in bytes, None if it cannot be read
+def get_peak_rss():
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kB on linux, bytes on macOS
+        return rss if sys.platform == 'darwin' else rss * 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return getattr(info, 'peak_wset', info.rss)
+
+# total size of the numpy arrays held by an object (arrays, labelled arrays, cohort matrices, dicts, lists and tuples)
+def get_array_bytes(obj, depth=0):
+    if depth > 4:
+        return 0
+    if hasattr(obj, 'nbytes') and hasattr(obj, 'dtype'):
+        return int(obj.nbytes)
+    if isinstance(obj, dict):
+        return sum(get_array_bytes(v, depth + 1) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(get_array_bytes(v, depth + 1) for v in obj)
+    if hasattr(obj, '__dict__') and not isinstance(obj, type):
+        return sum(get_array_bytes(v, depth + 1) for v in vars(obj).values())
+    return 0
+
+def enable(alloc=False):
+    '''
+    Start recording the spans of this process
+
+    :param alloc: also trace the allocations with tracemalloc
+    '''
+    global _RECORDER
+    if _RECORDER is None:
+        _RECORDER = Recorder(alloc)
+    return _RECORDER
+
+def disable():
+    global _RECORDER
+    if _RECORDER is not None and _RECORDER.alloc:
+        import tracemalloc
+        tracemalloc.stop()
+    _RECORDER = None
+
+def is_enabled():
+    return _RECORDER is not None
+
+def alloc_enabled():
+    return _RECORDER is not None and _RECORDER.alloc
+
+# time a block of code, e.g. with span('EoL allocation', tp=tp):
+def span(name, **args):
+    if _RECORDER is None:
+        return _NULL_SPAN
+    return _RECORDER.span(name, args)
+
+# time every call of a function and record the size of the arrays it returns
+def instrumented(name=None):
+    def decorator(func):
+        label = name or func.__name__
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _RECORDER is None:
+                return func(*args, **kwargs)
+            with _RECORDER.span(label, {}) as event:
+                result = func(*args, **kwargs)
+                event['output_bytes'] = get_array_bytes(result)
+            return result
+        return wrapper
+    return decorator
+
+# spans recorded so far, removed from the recorder (used to send the spans of a worker process back)
+def pop_events():
+    if _RECORDER is None:
+        return []
+    events, _RECORDER.events = _RECORDER.events, []
+    return events
+
+# spans recorded by another process
+def add_events(events):
+    if _RECORDER is not None:
+        _RECORDER.events.extend(events)
+
+# json report: every span and a summary by span name
+def get_report():
+    '''
+    :return: {'command', 'wall', 'peak_rss', 'summary': {name: totals}, 'spans': [...]}
+    '''
+    events = sorted(_RECORDER.events, key=lambda e: e['ts']) if _RECORDER is not None else []
+    summary = collections.OrderedDict()
+    for e in events:
+        s = summary.setdefault(e['name'], {'count': 0, 'wall': 0.0, 'cpu': 0.0, 'rss_peak': 0, 'alloc_peak': None, 'output_bytes': None})
+        s['count'] += 1
+        s['wall'] += e['wall']
+        s['cpu'] += e['cpu']
+        s['rss_peak'] = max(s['rss_peak'], e['rss_peak'] or 0)
+        for k in ['alloc_peak', 'output_bytes']:
+            if e.get(k) is not None:
+                s[k] = max(s[k] or 0, e[k])
+    start = _RECORDER.start if _RECORDER is not None else time.time()
+    return {'command': sys.argv, 'wall': time.time() - start, 'peak_rss': get_peak_rss(),
+            'summary': summary, 'spans': [dict(e, ts=e['ts'] - start) for e in events]}
+
+def write_report(path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(get_report(), f, indent=2)
+
+# Chrome trace event format, one complete event per span
+def write_trace(path):
+    events = _RECORDER.events if _RECORDER is not None else []
+    start = _RECORDER.start if _RECORDER is not None else 0
+    trace = []
+    for e in events:
+        args = dict(e['args'], cpu_ms=e['cpu'] * 1e3)
+        for k in ['rss_peak', 'rss_growth', 'alloc_peak', 'output_bytes']:
+            if e.get(k) is not None:
+                args[k] = e[k]
+        trace.append({'name': e['name'], 'ph': 'X', 'ts': (e['ts'] - start) * 1e6, 'dur': e['wall'] * 1e6,
+                      'pid': e['pid'], 'tid': e['tid'], 'args': args})
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+# turn the instrumentation on from the command line flags, the files are written when the process exits
+def setup(profile=None, trace=None, alloc=False):
+    '''
+    :param profile: path of the json run report
+    :param trace: path of the Chrome trace
+    :param alloc: also trace the allocations
+    '''
+    if profile is None and trace is None:
+        return
+    enable(alloc)
+    if profile is not None:
+        atexit.register(write_report, profile)
+    if trace is not None:
+        atexit.register(write_trace, trace)
+
+# the command line flags shared by the scripts
+def add_arguments(parser):
+    parser.add_argument('--profile', type=str, default=None, help='Write a json report of the time and memory of each step to this file')
+    parser.add_argument('--trace', type=str, default=None, help='Write a Chrome trace (chrome://tracing) of the run to this file')
+    parser.add_argument('--profile-alloc', action='store_true', help='Also record the peak allocations of each step (slower)')
@@ -0,0 +1,120 @@
+"""
+This script is used to label the dimensions of the model arrays
+
+It contains:
+- LabelledArray: a numpy array with named dimensions and coordinate labels
+  (e.g. tech scenario x year x material), with label-based selection and reductions
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+import numpy as np
+
+"""
+==============
+Define classes
+==============
+"""
+class LabelledArray:
+    """
+    This class is used to carry the labels of each axis of a numpy array
+
+    Arguments:
+    ----------
+    values: np.ndarray
+        The data
+    dims: tuple
+        Name of each axis, e.g. ('tp', 'year', 'material')
+    coords: dict
+        Labels of each axis {dim: list of labels}
+    """
+    def __init__(self, values, dims, coords):
+        self.values = np.asarray(values)
+        self.dims = tuple(dims)
+        self.coords = {d: list(coords[d]) for d in self.dims}
+        if self.values.ndim != len(self.dims):
+            raise ValueError('values have {} axes but {} dims were given'.format(self.values.ndim, len(self.dims)))
+        for d, n in zip(self.dims, self.values.shape):
+            if len(self.coords[d]) != n:
+                raise ValueError('dim {} has {} labels for {} values'.format(d, len(self.coords[d]), n))
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def __repr__(self):
+        dims = ', '.join('{}: {}'.format(d, n) for d, n in zip(self.dims, self.shape))
+        return 'LabelledArray({})'.format(dims)
+
+    def axis(self, dim):
+        return self.dims.index(dim)
+
+    def index(self, dim, label):
+        """Position of a label along a dim"""
+        try:
+            return self.coords[dim].index(label)
+        except ValueError:
+            raise KeyError('{!r} not in dim {}'.format(label, dim))
+
+    def isel(self, **indexers):
+        """Select by position, an integer drops the dim and a list/slice keeps it"""
+        key, dims, coords = [], [], {}
+        for d in self.dims:
+            idx = indexers.get(d, slice(None))
+            key.append(idx)
+            if isinstance(idx, (int, np.integer)):
+                continue
+            dims.append(d)
+            coords[d] = np.asarray(self.coords[d], dtype=object)[idx].tolist()
+        # index one axis at a time so lists on several axes behave like orthogonal indexing
+        values = self.values
+        axis = 0
+        for idx in key:
+            values = values[(slice(None),) * axis + (idx,)]
+            if not isinstance(idx, (int, np.integer)):
+                axis += 1
+        return LabelledArray(values, dims, coords)
+
+    def sel(self, **indexers):
+        """Select by label, a single label drops the dim and a list of labels keeps it"""
+        positions = {}
+        for d, label in indexers.items():
+            if d not in self.dims:
+                raise KeyError('Unknown dim: {}'.format(d))
+            if isinstance(label, (list, tuple, np.ndarray)):
+                positions[d] = [self.index(d, l) for l in label]
+            else:
+                positions[d] = self.index(d, label)
+        return self.isel(**positions)
+
+    def sum(self, dim):
+        """Sum over one dim"""
+        ax = self.axis(dim)
+        dims = self.dims[:ax] + self.dims[ax + 1:]
+        return LabelledArray(self.values.sum(axis=ax), dims, {d: self.coords[d] for d in dims})
+
+    def transpose(self, *dims):
+        return LabelledArray(self.values.transpose([self.axis(d) for d in dims]), dims, self.coords)
+
+    def apply(self, func):
+        """Apply an elementwise function to the values, keeping the labels"""
+        return LabelledArray(func(self.values), self.dims, self.coords)
+
+    def to_frame(self):
+        """2-D array as a DataFrame (first dim as index, second dim as columns)"""
+        import pandas as pd
+        if len(self.dims) != 2:
+            raise ValueError('to_frame needs a 2-D array, got dims {}'.format(self.dims))
+        return pd.DataFrame(self.values, index=self.coords[self.dims[0]], columns=self.coords[self.dims[1]])
+
+    def to_dict(self):
+        """Nested dict {label of dim 0: {label of dim 1: ...}}"""
+        def nest(values, depth):
+            if depth == len(self.dims):
+                return values.item()
+            return {l: nest(values[i], depth + 1) for i, l in enumerate(self.coords[self.dims[depth]])}
+        return nest(self.values, 0)
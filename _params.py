@@ -1,9 +1,19 @@
 import argparse
 
+from _instrument import add_arguments, setup
+
 
 def get_parser():
+    # imported here so that importing _params does not import numpy
+    import _time_axis
     parser = argparse.ArgumentParser()
     parser.add_argument('--tp', type=int, default=0, help='The time period tp')
     parser.add_argument('--scen', type=str, default='Gcam', choices=['Gcam', 'GNZ'])
-    
-    return parser.parse_args()
\ No newline at end of file
+    parser.add_argument('--no-plots', action='store_true', help='Only compute and save the results, matplotlib is not imported')
+    parser.add_argument('--strategies', type=str, default=None, help='csv file of EoL strategies added to those of the recy_rate_new sheet, see _inputs.load_eol_strategies')
+    _time_axis.add_arguments(parser)
+    add_arguments(parser)
+
+    args = parser.parse_args()
+    setup(args.profile, args.trace, args.profile_alloc)
+    return args
\ No newline at end of file
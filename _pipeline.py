@@ -0,0 +1,360 @@
+"""
+This script is used to run the model stages a -> b -> c -> d as a dependency graph in one process
+
+It contains:
+- Stage: one step of the model and the stages it depends on
+- STAGES: the stages of the model (capacity flow, material inflows, EoL outflows, environmental impact)
+- Pipeline: computes each (stage, tp, scen) node exactly once and shares the results in memory,
+  either in this process or fanned out over a process pool by scenario, with or without the figures,
+  writing the result tables as csv files or into one ResultsStore
+- an on-disk cache of the node results keyed on the input sheets each stage reads, so after editing
+  one sheet only the stages downstream of it are computed again
+- every stage runs on the same time axis (horizon end year and time step, see _time_axis)
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+import os
+import json
+import pickle
+import hashlib
+import collections
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from _inputs import get_model_inputs
+from _results_store import ResultsStore, use_store
+from _time_axis import get_time_axis
+import _instrument
+from _instrument import span
+
+TECH_SCENARIOS = [0, 1, 2]
+CAPACITY_SCENARIOS = ['Gcam', 'GNZ']
+
+DEFAULT_CACHE_DIR = 'results/.cache'
+CACHE_VERSION = 2
+
+# folder of the model sources, editing any .py file of it invalidates every cached node
+SOURCES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# inputs, time axis, plot, store and cache settings of a worker process, set once by the pool initializer
+_WORKER_INPUTS = None
+_WORKER_AXIS = None
+_WORKER_PLOT = True
+_WORKER_STORE = False
+_WORKER_CACHE_DIR = None
+
+"""
+==============
+Define classes
+==============
+"""
+class Stage:
+    """
+    This class is used to describe one step of the model
+
+    Arguments:
+    ----------
+    name: str
+        Name of the stage
+    func: callable
+        func(inputs, tp, scen, *results of deps, plot=..., axis=...) -> result
+    deps: list
+        Names of the stages whose results (for the same tp and scen) are passed to func
+    per_scenario: bool
+        False if the stage only depends on tp, it is then run once per tp with scen=None
+    plots_only: bool
+        True if the stage only makes figures, it is skipped when the pipeline runs without plots
+    opt_in: bool
+        True if the stage is left out of the default run and only runs when selected (by name or prefix) or needed by a selected stage
+    sheets: list
+        Sheets of the input workbook read by func (not by its dependencies), used to tell when its cached result is stale
+    """
+    def __init__(self, name, func, deps=(), per_scenario=True, plots_only=False, opt_in=False, sheets=()):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.per_scenario = per_scenario
+        self.plots_only = plots_only
+        self.opt_in = opt_in
+        self.sheets = list(sheets)
+
+    def __repr__(self):
+        return 'Stage({}, deps={})'.format(self.name, self.deps)
+
+
+# the model modules are imported when a stage runs, so selecting a few stages does not import the others
+def _capacity_flow(inputs, tp, scen, plot=True, axis=None):
+    from a_capacity_flow import CapacityFlow
+    return CapacityFlow(inputs=inputs, banded=True, axis=axis)(tp, scen)
+
+def _capacity_plot(inputs, tp, scen, plot=True, axis=None):
+    from a_capacity_flow import CapacityFlow
+    # the capacity csv files are written by a_capacity_flow, one writer per file
+    CapacityFlow(inputs=inputs, axis=axis).plot(tech_scenario=tp, save=False)
+
+def _onshore_material(inputs, tp, scen, flow, plot=True, axis=None):
+    from b_onshore_material import capacity_onshore
+    return capacity_onshore(tp=tp, scen=scen, inputs=inputs, flow=flow, plot=plot, axis=axis)
+
+def _offshore_material(inputs, tp, scen, flow, plot=True, axis=None):
+    from b_offshore_material import capacity_offshore
+    return capacity_offshore(tp=tp, scen=scen, inputs=inputs, flow=flow, plot=plot, axis=axis)
+
+def _onshore_eol(inputs, tp, scen, material, plot=True, axis=None):
+    from c_onshore_EoL import get_onshore_eol
+    return get_onshore_eol(tp, scen, inputs=inputs, material=material, plot=plot, axis=axis)
+
+def _onshore_tech_eol(inputs, tp, scen, material, plot=True, axis=None):
+    from c_onshore_tech_EoL import get_onshore_tech_eol
+    return get_onshore_tech_eol(tp, scen, inputs=inputs, material=material, plot=plot, axis=axis)
+
+def _offshore_eol(inputs, tp, scen, material, plot=True, axis=None):
+    from c_offshore_EoL import get_offshore_eol
+    return get_offshore_eol(tp, scen, inputs=inputs, material=material, plot=plot, axis=axis)
+
+def _onshore_env_impact(inputs, tp, scen, material, plot=True, axis=None):
+    from d_onshore_env_impact import get_onshore_env_impact
+    return get_onshore_env_impact(tp, scen, inputs=inputs, material=material, plot=plot, axis=axis)
+
+def _offshore_env_impact(inputs, tp, scen, material, plot=True, axis=None):
+    from d_offshore_env_impact import get_offshore_env_impact
+    return get_offshore_env_impact(tp, scen, inputs=inputs, material=material, plot=plot, axis=axis)
+
+def _total_env_impact(inputs, tp, scen, onshore_env, offshore_env, plot=True, axis=None):
+    from d_total_env_impact import get_total_env_impact
+    return get_total_env_impact(tp, scen, inputs=inputs, onshore_env=onshore_env, offshore_env=offshore_env, plot=plot, axis=axis)
+
+
+STAGES = collections.OrderedDict((s.name, s) for s in [
+    Stage('a_capacity_flow', _capacity_flow, sheets=['on_capacity', 'off_capacity', 'tech_dev']),
+    Stage('a_capacity_plot', _capacity_plot, per_scenario=False, plots_only=True),
+    Stage('b_onshore_material', _onshore_material, deps=['a_capacity_flow'],
+          sheets=['on_capacity', 'tech_dev', 'his_analysis', 'on_material', 'historical_info']),
+    Stage('b_offshore_material', _offshore_material, deps=['a_capacity_flow'],
+          sheets=['off_capacity', 'tech_dev', 'his_analysis', 'off_material']),
+    Stage('c_onshore_EoL', _onshore_eol, deps=['b_onshore_material'], sheets=['recy_rate_new']),
+    # the outflows by technology are a detailed view of c_onshore_EoL, too costly at fine time steps for the default run
+    Stage('c_onshore_tech_EoL', _onshore_tech_eol, deps=['b_onshore_material'], opt_in=True),
+    Stage('c_offshore_EoL', _offshore_eol, deps=['b_offshore_material'], sheets=['recy_rate_new']),
+    Stage('d_onshore_env_impact', _onshore_env_impact, deps=['b_onshore_material'], sheets=['recy_rate_new', 'envir_impact']),
+    Stage('d_offshore_env_impact', _offshore_env_impact, deps=['b_offshore_material'], sheets=['recy_rate_new', 'envir_impact']),
+    Stage('d_total_env_impact', _total_env_impact, deps=['d_onshore_env_impact', 'd_offshore_env_impact']),
+])
+
+
+class Pipeline:
+    """
+    This class is used to run the stages of the model for a grid of scenarios
+
+    Arguments:
+    ----------
+    inputs: ModelInputs
+        Inputs shared by every stage, loaded from the default excel file if not given
+    stages: OrderedDict
+        {name: Stage}, in an order where every stage comes after its dependencies
+    plot: bool
+        Save the figures, False computes and saves the results only and never imports matplotlib
+    store: ResultsStore
+        Store the result tables are added to instead of writing the csv files, None writes the csv files
+    cache_dir: str
+        Folder of the on-disk cache of the node results, None computes every node.
+        The figures of a node loaded from the cache are not drawn again, and a node cached by a run without
+        figures is computed again (and cached with its figures) by a run with figures
+    axis: TimeAxis
+        Horizon and time step of every stage, annual up to the last year of the capacity scenarios if not given
+    """
+    def __init__(self, inputs=None, stages=STAGES, plot=True, store=None, cache_dir=None, axis=None):
+        self.inputs = inputs if inputs is not None else get_model_inputs()
+        self.axis = axis if axis is not None else get_time_axis(self.inputs)
+        self.stages = stages
+        self.plot = plot
+        self.store = store
+        self.cache_dir = cache_dir
+        self.results = {}
+        self.keys = {}
+        self.cached = []
+
+    def select_stages(self, names=None):
+        """Requested stages (a name or a prefix such as 'c' or 'd_total') and their dependencies, in stage order,
+        every stage but the opt-in ones if not given"""
+        if names is None:
+            return [s for s in self.stages if (self.plot or not self.stages[s].plots_only) and not self.stages[s].opt_in]
+        selected = set()
+        def visit(name):
+            if name not in selected:
+                selected.add(name)
+                for dep in self.stages[name].deps:
+                    visit(dep)
+        for name in names:
+            matches = [s for s in self.stages if s == name or s.startswith(name)]
+            if len(matches) == 0:
+                raise ValueError('Unknown stage: {} (available: {})'.format(name, ', '.join(self.stages)))
+            for s in matches:
+                visit(s)
+        return [s for s in self.stages if s in selected and (self.plot or not self.stages[s].plots_only)]
+
+    def nodes(self, stages=None, tps=TECH_SCENARIOS, scens=CAPACITY_SCENARIOS):
+        """(stage, tp, scen) nodes in execution order: scenario by scenario, each stage after its dependencies"""
+        nodes = []
+        for tp in tps:
+            for name in self.select_stages(stages):
+                if not self.stages[name].per_scenario:
+                    nodes.append((name, tp, None))
+            for scen in scens:
+                for name in self.select_stages(stages):
+                    if self.stages[name].per_scenario:
+                        nodes.append((name, tp, scen))
+        return nodes
+
+    def node_key(self, node):
+        """Fingerprint of a node: its stage, parameters, time axis, model sources, the sheets it reads and the keys of its dependencies"""
+        if node not in self.keys:
+            name, tp, scen = node
+            stage = self.stages[name]
+            content = {'version': CACHE_VERSION, 'stage': name, 'tp': tp, 'scen': scen, 'axis': self.axis.key(), 'sources': get_sources_hash(),
+                       'sheets': {s: self.inputs.sheet_hashes[s] for s in stage.sheets},
+                       'deps': [self.node_key((dep, tp, scen)) for dep in stage.deps]}
+            self.keys[node] = hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+        return self.keys[node]
+
+    def get_cache_path(self, node):
+        return os.path.join(self.cache_dir, node[0], '{}.pkl'.format(self.node_key(node)))
+
+    def run_node(self, node):
+        """Compute one node, reusing the results already in memory or in the cache"""
+        if node not in self.results:
+            name, tp, scen = node
+            stage = self.stages[name]
+            use_cache = self.cache_dir is not None and not stage.plots_only
+            path = self.get_cache_path(node) if use_cache else None
+            entry = None
+            if use_cache and os.path.exists(path):
+                with span('load cached ' + name, tp=tp, scen=scen):
+                    with open(path, 'rb') as f:
+                        entry = pickle.load(f)
+                # an entry written without its figures does not do for a run with figures
+                if self.plot and not entry[2]:
+                    entry = None
+            if entry is not None:
+                # the dependencies of a cached node are neither loaded nor computed
+                self.results[node], tables, _ = entry
+                with use_store(self.store):
+                    tables.replay()
+                self.cached.append(node)
+            else:
+                deps = [self.run_node((dep, tp, scen)) for dep in stage.deps]
+                # the tables saved by the node are kept with its result, they are saved again when it is loaded
+                tables = ResultsStore() if use_cache else None
+                with span(name, tp=tp, scen=scen), use_store(tables if use_cache else self.store):
+                    self.results[node] = stage.func(self.inputs, tp, scen, *deps, plot=self.plot, axis=self.axis)
+                if use_cache:
+                    with use_store(self.store):
+                        tables.replay()
+                    _write_cache(path, (self.results[node], tables, self.plot))
+        return self.results[node]
+
+    def run(self, stages=None, tps=TECH_SCENARIOS, scens=CAPACITY_SCENARIOS, verbose=False):
+        '''
+        :param stages: names (or prefixes) of the stages to run, all stages if None
+        :param tps: tech scenarios
+        :param scens: capacity scenarios
+        :return: {(stage, tp, scen): result}
+        '''
+        for node in self.nodes(stages, tps, scens):
+            if verbose:
+                print('Running {} for TP {} and scenario {}'.format(*node))
+            self.run_node(node)
+        if verbose and self.cache_dir is not None:
+            print('{} nodes loaded from the cache'.format(len(self.cached)))
+        return self.results
+
+    def run_parallel(self, stages=None, tps=TECH_SCENARIOS, scens=CAPACITY_SCENARIOS, max_workers=None, verbose=False):
+        '''
+        Run the scenario grid over a process pool, one task per (tp, scen) with all of its stages
+
+        :param max_workers: number of processes, every core if None
+        :return: list of the (stage, tp, scen) nodes computed, the results stay in the workers
+                 (the result tables are sent back to self.store if there is one)
+        '''
+        # group the nodes by scenario, each output file is then written by a single task
+        tasks = collections.OrderedDict()
+        for node in self.nodes(stages, tps, scens):
+            tasks.setdefault(node[1:], []).append(node)
+        max_workers = min(max_workers or os.cpu_count() or 1, len(tasks)) or 1
+        done, tables = [], {}
+        # the parsed inputs are pickled once per worker instead of re-reading the workbook
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(self.inputs, self.axis, self.plot, self.store is not None, self.cache_dir,
+                                           _instrument.is_enabled(), _instrument.alloc_enabled())) as executor:
+            futures = [executor.submit(_run_task, self.stages, nodes) for nodes in tasks.values()]
+            for future in as_completed(futures):
+                nodes, tables[future], cached, events = future.result()
+                _instrument.add_events(events)
+                if verbose:
+                    for node in nodes:
+                        print('Finished {} for TP {} and scenario {}'.format(*node))
+                done += nodes
+                self.cached += cached
+        # tables added in task order, whichever worker finished first
+        if self.store is not None:
+            for future in futures:
+                self.store.update(tables[future])
+        if verbose and self.cache_dir is not None:
+            print('{} nodes loaded from the cache'.format(len(self.cached)))
+        return done
+
+"""
+================
+Define functions
+================
+"""
+# every .py file of the model folder, so a new module is covered without listing it
+def get_model_sources(root=SOURCES_DIR):
+    return sorted(name for name in os.listdir(root) if name.endswith('.py'))
+
+# sha256 of the model sources, computed once per process
+_SOURCES_HASH = []
+
+def get_sources_hash():
+    if len(_SOURCES_HASH) == 0:
+        h = hashlib.sha256()
+        for name in get_model_sources():
+            h.update(name.encode('utf-8'))
+            with open(os.path.join(SOURCES_DIR, name), 'rb') as f:
+                h.update(f.read())
+        _SOURCES_HASH.append(h.hexdigest())
+    return _SOURCES_HASH[0]
+
+# write a cache entry through a temporary file, so concurrent readers never see a partial one
+def _write_cache(path, value):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def _init_worker(inputs, axis=None, plot=True, store=False, cache_dir=None, instrument=False, alloc=False):
+    global _WORKER_INPUTS, _WORKER_AXIS, _WORKER_PLOT, _WORKER_STORE, _WORKER_CACHE_DIR
+    _WORKER_INPUTS = inputs
+    _WORKER_AXIS = axis
+    _WORKER_PLOT = plot
+    _WORKER_STORE = store
+    _WORKER_CACHE_DIR = cache_dir
+    # the spans of the worker are sent back with each task, a forked worker drops the copy of the spans of its parent
+    _instrument.disable()
+    if instrument:
+        _instrument.enable(alloc)
+    if plot:
+        import matplotlib
+        matplotlib.use('Agg')
+
+def _run_task(stages, nodes):
+    pipeline = Pipeline(inputs=_WORKER_INPUTS, stages=stages, plot=_WORKER_PLOT, store=ResultsStore() if _WORKER_STORE else None,
+                        cache_dir=_WORKER_CACHE_DIR, axis=_WORKER_AXIS)
+    for node in nodes:
+        pipeline.run_node(node)
+    return nodes, pipeline.store.tables if _WORKER_STORE else None, pipeline.cached, _instrument.pop_events()
@@ -0,0 +1,111 @@
+"""
+This script is used to load the inputs of several regions (provinces, countries) and to sum the regional results
+
+It contains:
+- load_regional_inputs: the ModelInputs of every region of a regional input package
+- check_regional_inputs: the regions of a package must share their years, materials, component types and EoL treatments
+- get_group_totals: national (or any group) totals of the results of a regional batch, as sums over the 'region' dim
+
+A regional input package is a folder with one workbook per region, in the layout of input_data/Wind_data.xls,
+e.g. input_data/regions/ON.xls, input_data/regions/QC.xls, ... and optionally a regions.json file:
+
+    {"regions": {"ON": "ON.xls", "QC": "QC.xls", "DK": "denmark.xls"},
+     "groups": {"Canada": ["ON", "QC"], "Denmark": ["DK"]}}
+
+Without regions.json every .xls/.xlsx file of the folder is a region named after the file, and the groups hold one total of every region.
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+import os
+import json
+import collections
+
+from _inputs import get_model_inputs
+
+MANIFEST = 'regions.json'
+DEFAULT_GROUP = 'total'
+
+"""
+================
+Define functions
+================
+"""
+# {region: workbook path} and {group: [regions]} of a regional input package
+def read_manifest(path):
+    '''
+    :param path: folder of the regional input package
+    :return: OrderedDict {region: path to its workbook}, OrderedDict {group: [regions]}
+    '''
+    manifest_path = os.path.join(path, MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f, object_pairs_hook=collections.OrderedDict)
+        workbooks = collections.OrderedDict((r, os.path.join(path, f)) for r, f in manifest['regions'].items())
+        groups = manifest.get('groups', collections.OrderedDict([(DEFAULT_GROUP, list(workbooks))]))
+    else:
+        files = sorted(f for f in os.listdir(path) if os.path.splitext(f)[1] in ['.xls', '.xlsx'] and not f.startswith('~$'))
+        workbooks = collections.OrderedDict((os.path.splitext(f)[0], os.path.join(path, f)) for f in files)
+        groups = collections.OrderedDict([(DEFAULT_GROUP, list(workbooks))])
+    if len(workbooks) == 0:
+        raise ValueError('No region found in {}'.format(path))
+    for group, regions in groups.items():
+        unknown = [r for r in regions if r not in workbooks]
+        if unknown:
+            raise KeyError('Group {} has unknown regions: {}'.format(group, ', '.join(unknown)))
+    return workbooks, groups
+
+# every region must describe the same years, materials and treatments to be stacked on a 'region' dim
+def check_regional_inputs(regional_inputs):
+    '''
+    :param regional_inputs: {region: ModelInputs}
+    '''
+    def layout(inputs):
+        return collections.OrderedDict([
+            ('historical years', tuple(inputs.years_history_onshore)),
+            ('onshore scenario years', tuple(inputs.years_future_onshore)),
+            ('offshore scenario years', tuple(inputs.years_future_offshore)),
+            ('materials', tuple(inputs.onshore_dict['DFIG/SCIG'])),
+            ('onshore component types', tuple(inputs.onshore_dict)),
+            ('offshore component types', tuple(inputs.offshore_dict)),
+            ('EoL treatments', tuple(inputs.proc_methods)),
+            ('impact materials', tuple(sorted(next(iter(inputs.env_impact.values()))))),
+        ])
+    regions = list(regional_inputs)
+    first = layout(regional_inputs[regions[0]])
+    for region in regions[1:]:
+        for k, v in layout(regional_inputs[region]).items():
+            if v != first[k]:
+                raise ValueError('Region {} has other {} than region {}: {} != {}'.format(region, k, regions[0], v, first[k]))
+
+# inputs of every region of a regional input package, each workbook goes through the binary input cache
+def load_regional_inputs(path):
+    '''
+    :param path: folder of the regional input package
+    :return: OrderedDict {region: ModelInputs}
+    '''
+    workbooks, _ = read_manifest(path)
+    regional_inputs = collections.OrderedDict((r, get_model_inputs(p)) for r, p in workbooks.items())
+    check_regional_inputs(regional_inputs)
+    return regional_inputs
+
+# sum the regions of each group, e.g. the provinces of a country
+def get_group_totals(results, groups):
+    '''
+    :param results: {name: LabelledArray with a 'region' dim}, e.g. the results of a regional BatchModel
+    :param groups: {group: [regions]}, see read_manifest
+    :return: {name: LabelledArray with the groups as the labels of the 'region' dim}
+    '''
+    import numpy as np
+    from _labelled import LabelledArray
+    totals = collections.OrderedDict()
+    for name, array in results.items():
+        ax = array.axis('region')
+        values = np.stack([array.sel(region=list(regions)).values.sum(axis=ax) for regions in groups.values()], axis=ax)
+        coords = dict(array.coords, region=list(groups))
+        totals[name] = LabelledArray(values, array.dims, coords)
+    return totals
@@ -0,0 +1,237 @@
+"""
+This script is used to keep the result tables of a sweep in one consolidated store instead of hundreds of csv files
+
+It contains:
+- DATASETS: the result tables written by the model, their legacy csv path and their dimensions
+- ResultsStore: collects the tables of a run in memory and writes them in bulk to one compressed .npz file,
+  one array per dataset (e.g. scen x tp x strategy x material x year x treatment for the EoL outflows)
+- save_table: used by the model scripts, writes the legacy csv file or adds the table to the active store
+- export of a store to the legacy csv layout on demand
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+import os
+import json
+import collections
+import contextlib
+import numpy as np
+
+from _labelled import LabelledArray
+from _instrument import instrumented, span
+
+STORE_VERSION = 1
+
+# {dataset: (legacy csv path relative to the results folder, key dims, row dim, column dim)}
+DATASETS = collections.OrderedDict([
+    ('capacity_onshore', ('capacity/onshore_{scen}_{tp}.csv', ('scen', 'tp'), 'year', 'flow')),
+    ('capacity_offshore', ('capacity/offshore_{scen}_{tp}.csv', ('scen', 'tp'), 'year', 'flow')),
+    ('material_onshore', ('material_onshore_mass_by_year_{tp}_{scen}.csv', ('scen', 'tp'), 'year', 'material')),
+    ('material_offshore', ('material_offshore_mass_by_year_{tp}_{scen}.csv', ('scen', 'tp'), 'year', 'material')),
+    ('virgin_onshore', ('onshore_virgin/onshore_{strategy}_{tp}_{scen}.csv', ('scen', 'tp', 'strategy'), 'year', 'material')),
+    ('virgin_offshore', ('offshore_virgin/offshore_{strategy}_{tp}_{scen}.csv', ('scen', 'tp', 'strategy'), 'year', 'material')),
+    ('eol_onshore', ('onshore_EoL/onshore_{strategy}_{material}_{tp}_{scen}.csv', ('scen', 'tp', 'strategy', 'material'), 'year', 'treatment')),
+    ('eol_offshore', ('offshore_EoL/offshore_{strategy}_{material}_{tp}_{scen}.csv', ('scen', 'tp', 'strategy', 'material'), 'year', 'treatment')),
+    ('eol_onshore_tech', ('onshore_EoL_tech/onshore_{material}_{tp}_{scen}.csv', ('scen', 'tp', 'material'), 'year', 'technology')),
+    ('env_impact_onshore', ('onshore_env_impact_{strategy}_{tp}_{scen}.csv', ('scen', 'tp', 'strategy'), 'year', 'impact')),
+    ('env_impact_offshore', ('offshore_env_impact_{strategy}_{tp}_{scen}.csv', ('scen', 'tp', 'strategy'), 'year', 'impact')),
+    ('scrap_bank_onshore', ('onshore_scrap_bank/onshore_{strategy}_{tp}_{scen}.csv', ('scen', 'tp', 'strategy'), 'year', 'material')),
+])
+
+# store the tables are added to instead of writing csv files, set by use_store
+_ACTIVE_STORE = None
+
+"""
+==============
+Define classes
+==============
+"""
+class ResultsStore:
+    """
+    This class is used to collect the result tables of a run and save or load them as one file
+
+    Arguments:
+    ----------
+    tables: OrderedDict
+        {(dataset, key): (row labels, column labels, [n_rows, n_columns] values, name of the row labels)},
+        key being the labels of the key dims of the dataset, e.g. ('GNZ', 0, 'EoL_C', 'Nd')
+    """
+    def __init__(self, tables=None):
+        self.tables = tables if tables is not None else collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.tables)
+
+    def __repr__(self):
+        return 'ResultsStore({} tables)'.format(len(self.tables))
+
+    def add(self, name, df, **key):
+        """Add one table (a DataFrame) of a dataset, key gives the label of each key dim"""
+        if name not in DATASETS:
+            raise KeyError('Unknown dataset: {} (available: {})'.format(name, ', '.join(DATASETS)))
+        key_dims = DATASETS[name][1]
+        if set(key) != set(key_dims):
+            raise ValueError('Dataset {} is keyed by {}, got {}'.format(name, ', '.join(key_dims), ', '.join(key)))
+        self.tables[(name, tuple(_to_label(key[d]) for d in key_dims))] = (
+            [_to_label(v) for v in df.index], [_to_label(v) for v in df.columns],
+            np.asarray(df.values, dtype=np.float64).copy(), df.index.name)
+
+    def update(self, other):
+        """Add every table of another store, e.g. the tables computed by a worker process"""
+        self.tables.update(other.tables if isinstance(other, ResultsStore) else other)
+
+    def to_arrays(self):
+        '''
+        :return: {dataset: (LabelledArray of the values, NaN for the missing tables, [key dims] bool mask of the tables present,
+                 name of the row labels)}
+        '''
+        grouped = collections.OrderedDict()
+        for (name, key), table in self.tables.items():
+            grouped.setdefault(name, []).append((key, table))
+        arrays = collections.OrderedDict()
+        for name, entries in grouped.items():
+            _, key_dims, row_dim, column_dim = DATASETS[name]
+            rows, columns, _, index_name = entries[0][1]
+            coords = {d: [] for d in key_dims}
+            for key, (r, c, _, _) in entries:
+                if r != rows or c != columns:
+                    raise ValueError('Tables of dataset {} have different rows or columns: {}'.format(name, key))
+                for d, label in zip(key_dims, key):
+                    if label not in coords[d]:
+                        coords[d].append(label)
+            shape = [len(coords[d]) for d in key_dims]
+            values = np.full(shape + [len(rows), len(columns)], np.nan)
+            present = np.zeros(shape, dtype=bool)
+            for key, (_, _, v, _) in entries:
+                idx = tuple(coords[d].index(label) for d, label in zip(key_dims, key))
+                values[idx] = v
+                present[idx] = True
+            coords[row_dim], coords[column_dim] = rows, columns
+            arrays[name] = (LabelledArray(values, key_dims + (row_dim, column_dim), coords), present, index_name)
+        return arrays
+
+    def get(self, name):
+        """Values of one dataset as a LabelledArray (NaN for the tables that were not computed)"""
+        arrays = self.to_arrays()
+        if name not in arrays:
+            raise KeyError('No table of dataset {} in the store'.format(name))
+        return arrays[name][0]
+
+    @instrumented('ResultsStore.save')
+    def save(self, path):
+        '''
+        Write every table in one compressed file
+
+        :param path: path to the .npz file
+        '''
+        arrays, meta = {}, {'version': STORE_VERSION, 'datasets': collections.OrderedDict()}
+        for name, (array, present, index_name) in self.to_arrays().items():
+            arrays['{}__values'.format(name)] = array.values
+            arrays['{}__present'.format(name)] = present
+            meta['datasets'][name] = {'dims': array.dims, 'coords': array.coords, 'index_name': index_name}
+        arrays['meta'] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # write to a temporary file first so readers never see a partial store
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    @instrumented('ResultsStore.load')
+    def load(cls, path):
+        '''
+        :param path: path to a .npz file written by save
+        :return: ResultsStore with every table of the file
+        '''
+        with np.load(path) as npz:
+            arrays = {k: npz[k] for k in npz.files}
+        meta = json.loads(bytes(arrays['meta']).decode('utf-8'))
+        if meta.get('version') != STORE_VERSION:
+            raise ValueError('Unsupported results store version: {}'.format(meta.get('version')))
+        store = cls()
+        for name, info in meta['datasets'].items():
+            key_dims = info['dims'][:-2]
+            rows, columns = info['coords'][info['dims'][-2]], info['coords'][info['dims'][-1]]
+            values = arrays['{}__values'.format(name)]
+            for idx in zip(*np.nonzero(arrays['{}__present'.format(name)])):
+                key = tuple(info['coords'][d][i] for d, i in zip(key_dims, idx))
+                store.tables[(name, key)] = (rows, columns, values[idx], info['index_name'])
+        return store
+
+    @instrumented('ResultsStore.export_csv')
+    def export_csv(self, root='results', datasets=None):
+        '''
+        Write the tables in the legacy csv layout
+
+        :param root: results folder
+        :param datasets: names of the datasets to export, all if None
+        :return: list of the csv files written
+        '''
+        paths = []
+        for (name, key), table in self.tables.items():
+            if datasets is not None and name not in datasets:
+                continue
+            path = get_csv_path(name, root, **dict(zip(DATASETS[name][1], key)))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _to_frame(table).to_csv(path)
+            paths.append(path)
+        return paths
+
+    def replay(self, root='results'):
+        """Save every table again with save_table, to the active store or to the legacy csv files"""
+        for (name, key), table in self.tables.items():
+            save_table(name, _to_frame(table), root=root, **dict(zip(DATASETS[name][1], key)))
+
+"""
+================
+Define functions
+================
+"""
+# plain python label (json serializable) of a numpy scalar
+def _to_label(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+# DataFrame of one table of the store
+def _to_frame(table):
+    import pandas as pd
+    rows, columns, values, index_name = table
+    return pd.DataFrame(values, index=pd.Index(rows, name=index_name), columns=columns)
+
+# legacy csv path of one table
+def get_csv_path(name, root='results', **key):
+    return os.path.join(root, DATASETS[name][0].format(**key))
+
+# write one result table, to the active store if there is one, to its legacy csv file otherwise
+def save_table(name, df, root='results', **key):
+    '''
+    :param name: dataset of the table, one of DATASETS
+    :param df: DataFrame [year, labels of the column dim]
+    :param root: results folder of the csv file
+    :param key: label of each key dim of the dataset, e.g. scen='GNZ', tp=0, strategy='EoL_C'
+    '''
+    if _ACTIVE_STORE is not None:
+        with span('store table', dataset=name):
+            _ACTIVE_STORE.add(name, df, **key)
+    else:
+        with span('write csv', dataset=name):
+            path = get_csv_path(name, root, **key)
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            df.to_csv(path)
+
+# add the tables saved within the block to a store instead of writing csv files, None keeps the current setting
+@contextlib.contextmanager
+def use_store(store):
+    global _ACTIVE_STORE
+    if store is None:
+        yield _ACTIVE_STORE
+        return
+    previous, _ACTIVE_STORE = _ACTIVE_STORE, store
+    try:
+        yield store
+    finally:
+        _ACTIVE_STORE = previous
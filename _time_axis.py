@@ -0,0 +1,190 @@
+"""
+This script is used to describe the time axis of the model: the historical years, the horizon and the time step
+
+It contains:
+- TimeAxis: the periods of the model (annual, quarterly or monthly) from the first historical year to the end of the horizon,
+  and the conversions of the yearly inputs to these periods
+- get_bucket_bins: time buckets (decades, 5-year or custom reporting periods) of the periods
+- aggregate_periods: sums of the periods of each bucket along one axis of an array (or a dim of a LabelledArray), with np.add.reduceat
+- get_time_axis: the time axis of the model inputs, by default annual up to the last year of the capacity scenarios
+
+The historical data stay annual: at a finer step the historical inflows are split evenly over the periods of each year
+and the yearly averages (turbine capacity, masses, market shares) are repeated. Lifetimes stay in years.
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+import collections
+import numpy as np
+
+# number of periods per year of each time step
+STEPS = collections.OrderedDict([('annual', 1), ('quarterly', 4), ('monthly', 12)])
+
+"""
+==============
+Define classes
+==============
+"""
+class TimeAxis:
+    """
+    This class is used to hold the periods of the model
+
+    Arguments:
+    ----------
+    history_start: int
+        First historical year
+    future_start: int
+        First year of the capacity scenarios, the years before it are historical
+    end_year: int
+        Last year of the horizon (included)
+    step: str
+        Time step, one of 'annual', 'quarterly' or 'monthly'
+    """
+    def __init__(self, history_start=1993, future_start=2020, end_year=2050, step='annual'):
+        if step not in STEPS:
+            raise ValueError('Unknown time step: {} (available: {})'.format(step, ', '.join(STEPS)))
+        if not history_start <= future_start <= end_year:
+            raise ValueError('Invalid time axis: history from {}, scenarios from {} to {}'.format(history_start, future_start, end_year))
+        self.history_start, self.future_start, self.end_year = int(history_start), int(future_start), int(end_year)
+        self.step = step
+        self.steps_per_year = STEPS[step]
+        self.n_history = (self.future_start - self.history_start) * self.steps_per_year
+        self.n_future = (self.end_year - self.future_start + 1) * self.steps_per_year
+        # label of each period: the year at annual resolution, the decimal year of its start otherwise
+        self.history = self.get_periods(self.history_start, self.n_history)
+        self.future = self.get_periods(self.future_start)
+        self.periods = np.concatenate((self.history, self.future))
+
+    def __len__(self):
+        return len(self.periods)
+
+    def __repr__(self):
+        return 'TimeAxis({}-{}, {}, scenarios from {})'.format(self.history_start, self.end_year, self.step, self.future_start)
+
+    def __eq__(self, other):
+        return isinstance(other, TimeAxis) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(tuple(self.key().values()))
+
+    def key(self):
+        """Parameters of the time axis, e.g. to tell cached results apart"""
+        return {'history_start': self.history_start, 'future_start': self.future_start, 'end_year': self.end_year, 'step': self.step}
+
+    def get_periods(self, start=None, n=None):
+        """Labels of n periods from the first period of the year start, up to the end of the horizon if n is None"""
+        start = self.history_start if start is None else int(start)
+        n = (self.end_year - start + 1) * self.steps_per_year if n is None else n
+        if self.steps_per_year == 1:
+            return start + np.arange(n)
+        return start + np.arange(n) / self.steps_per_year
+
+    def get_ages(self, n):
+        """Age in years at the start of each of the first n periods of a cohort"""
+        return np.arange(n) / self.steps_per_year
+
+    def repeat_history(self, values):
+        """Yearly values (averages, shares) of the historical years repeated for each of their periods"""
+        return np.repeat(np.asarray(values, dtype=float), self.steps_per_year)
+
+    def split_history(self, values):
+        """Yearly flows of the historical years split evenly over their periods"""
+        if self.steps_per_year == 1:
+            return np.asarray(values, dtype=float)
+        return self.repeat_history(values) / self.steps_per_year
+
+    def split_by_year(self, by_year):
+        """{year: {material: flow}} split evenly over the periods of each year, {period: {material: flow}}"""
+        if self.steps_per_year == 1:
+            return by_year
+        years = sorted(by_year)
+        periods = self.get_periods(years[0], len(years) * self.steps_per_year)
+        return collections.OrderedDict((p, {k: v / self.steps_per_year for k, v in by_year[years[i // self.steps_per_year]].items()})
+                                       for i, p in enumerate(periods))
+
+    def expand_decades(self, values, periods=None):
+        """Value of each period given one value per decade from the first scenario year, the last decade holds until the end of the horizon"""
+        periods = self.future if periods is None else np.asarray(periods)
+        decade = np.clip((np.floor(periods).astype(int) - self.future_start) // 10, 0, len(values) - 1)
+        return np.asarray(values, dtype=float)[decade]
+
+"""
+================
+Define functions
+================
+"""
+# bucket of each period, the first one starts with the first period and the last one ends with the horizon
+def get_bucket_bins(time, edges=None):
+    '''
+    :param time: label of each period (year or decimal year), in increasing order
+    :param edges: years starting a new bucket (e.g. [2030, 2035, 2050]), or the width of the buckets in years
+                  (multiples of it start a new bucket), decades if None; the edges outside the periods are left out
+    :return: index of the bucket of each period, labels of the buckets (e.g. '1993-2000', ..., '2040-2050')
+    '''
+    years = np.floor(np.asarray(time, dtype=float)).astype(int)
+    first, last = int(years[0]), int(years[-1])
+    edges = 10 if edges is None else edges
+    if np.isscalar(edges):
+        edges = range((first // int(edges) + 1) * int(edges), last, int(edges))
+    edges = sorted(set(int(e) for e in edges if first < e < last))
+    bounds = [first] + edges + [last]
+    labels = ['{}-{}'.format(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+    return np.searchsorted(edges, years, side='right'), labels
+
+# decade of each period, the first one starts with the first period and the last one ends with the horizon
+def get_decade_bins(time):
+    '''
+    :param time: label of each period (year or decimal year), in increasing order
+    :return: index of the decade of each period, labels of the decades (e.g. '1993-2000', ..., '2040-2050')
+    '''
+    return get_bucket_bins(time, 10)
+
+# add the periods of each bucket together, along one axis of a whole array at once
+def aggregate_periods(values, time, edges=None, axis=0):
+    '''
+    :param values: array with one entry per period along axis
+    :param time: label of each period, in increasing order
+    :param edges: years starting a new bucket or width of the buckets, see get_bucket_bins
+    :return: array with one entry per bucket along axis, labels of the buckets
+    '''
+    bins, labels = get_bucket_bins(time, edges)
+    # first period of each bucket, every bucket holds at least one period
+    starts = np.searchsorted(bins, np.arange(len(labels)))
+    return np.add.reduceat(np.asarray(values, dtype=float), starts, axis=axis), labels
+
+# add the periods of each bucket together along a dim of a LabelledArray, e.g. the yearly results of a ResultsStore
+def aggregate_labelled(array, edges=None, dim='year'):
+    '''
+    :param array: LabelledArray with the period labels along dim
+    :param edges: years starting a new bucket or width of the buckets, see get_bucket_bins
+    :return: LabelledArray with the bucket labels along dim
+    '''
+    from _labelled import LabelledArray
+    values, labels = aggregate_periods(array.values, array.coords[dim], edges, axis=array.axis(dim))
+    coords = dict(array.coords)
+    coords[dim] = labels
+    return LabelledArray(values, array.dims, coords)
+
+# time axis of the model inputs, the horizon ends with the capacity scenarios unless end_year is given
+def get_time_axis(inputs=None, end_year=None, step='annual'):
+    '''
+    :param inputs: ModelInputs, loaded from the default excel file if not given
+    :param end_year: last year of the horizon, the stocks are held at their last value after the last year of the scenarios
+    :param step: 'annual', 'quarterly' or 'monthly'
+    :return: TimeAxis
+    '''
+    if inputs is None:
+        from _inputs import get_model_inputs
+        inputs = get_model_inputs()
+    history = inputs.years_history_onshore
+    end_year = inputs.years_future_onshore[-1] if end_year is None else end_year
+    return TimeAxis(history[0], history[-1] + 1, end_year, step)
+
+# the command line flags shared by the scripts
+def add_arguments(parser):
+    parser.add_argument('--end-year', type=int, default=None, help='Last year of the horizon (default: last year of the capacity scenarios)')
+    parser.add_argument('--step', type=str, default='annual', choices=list(STEPS), help='Time step of the model')
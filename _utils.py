@@ -1,231 +1,79 @@
-import xlrd
+import sys
+import importlib.util
 import numpy as np
-import pandas as pd
-import seaborn as sns
-from _fig_settings import *
 
-# read the histortcal onshore wind turbine information (1993-2019)
-def load_original_data(path="input_data/Wind_data.xls"):
-    '''
-    :param path: path to the excel file
-    :return: list of d, h, nacelle, tower, time
-    '''
-    wb = xlrd.open_workbook(path)
-    # load existing data
-    sheet = wb.sheet_by_name('historical_info')
-    n_rows = 6698
-    c_list = [sheet.cell_value(i, 6) for i in range(1, n_rows)] # c_list is the capacity of wind turbine
-    d_list = [sheet.cell_value(i, 7) for i in range(1, n_rows)] # d_list is the diameter of wind turbine
-    h_list = [sheet.cell_value(i, 8) for i in range(1, n_rows)] # h_list is the hub height of wind turbine
-    nacl_list = [sheet.cell_value(i, 14) for i in range(1, n_rows)] # nacl_list is the nacelle type of wind turbine
-    tower_list = [sheet.cell_value(i, 15) for i in range(1, n_rows)] # tower_list is the tower type of wind turbine
-    time_list = [sheet.cell_value(i, 5) for i in range(1, n_rows)] # time_list is the installation yearof wind turbine
-    
-    for i in range(len(nacl_list)):
-        if 'DFIG' in nacl_list[i] or 'SCIG' in nacl_list[i]:
-            nacl_list[i] = 'DFIG/SCIG'
-    # for i in range(len(c_list)):
-    #     if '/' in str(c_list[i]):
-    #         # get average
-    #         c_list[i] = np.mean([float(x) for x in c_list[i].split('/')])
-    #     if '-' in str(c_list[i]):
-    #         # get average
-    #         c_list[i] = np.mean([float(x) for x in c_list[i].split('-')])
-    
-    return c_list, d_list, h_list, nacl_list, tower_list, time_list
-
-#  read the onshore wind turbine material consumption data
-def load_onshore_dict(path="input_data/Wind_data.xls"):
-    '''
-    return a dictionary of onshore data
-    {Nacc: ..., Tower: ..., Blade: ..., Hub: ...}
-    '''
-    
-    wb = xlrd.open_workbook(path)
-    sheet = wb.sheet_by_name('on_material')
-    import collections
-    onshore_dict = collections.OrderedDict()
-    for i in range(3, 14):
-        m = sheet.cell_value(i, 0)
-        if len(m) == 0:
-            continue
-        for j in range(1, 11):
-            t = sheet.cell_value(1, j)
-            if t not in onshore_dict:
-                onshore_dict[t] = collections.OrderedDict()
-            if m not in onshore_dict[t]:
-                onshore_dict[t][m] = collections.OrderedDict()
-            onshore_dict[t][m] = sheet.cell_value(i, j) if sheet.cell_value(i, j) != '' else 0
-            if i >= 12:
-                onshore_dict[t][m] = onshore_dict[t][m] / 10**6
-    return onshore_dict
-
-# read the offshore wind turbine material consumption data
-def load_offshore_dict(path="input_data/Wind_data.xls"):
-    '''
-    return a dictionary of onshore data
-    {Nacc: ..., Tower: ..., Blade: ..., Hub: ...}
-    '''
-    
-    wb = xlrd.open_workbook(path)
-    sheet = wb.sheet_by_name('off_material')
-    import collections
-    onshore_dict = collections.OrderedDict()
-    for i in range(3, 14):
-        m = sheet.cell_value(i, 0)
-        if len(m) == 0:
-            continue
-        for j in range(1, 11):
-            t = sheet.cell_value(1, j)
-            if t not in onshore_dict:
-                onshore_dict[t] = collections.OrderedDict()
-            if m not in onshore_dict[t]:
-                onshore_dict[t][m] = collections.OrderedDict()
-            onshore_dict[t][m] = sheet.cell_value(i, j) if sheet.cell_value(i, j) != '' else 0
-            if i >= 12:
-                onshore_dict[t][m] = onshore_dict[t][m] / 10**6
-    return onshore_dict
-    
-# calculate the mass of each component of onshore wind turbine
-def calculate_total_mass(d, h, sec):
-    if sec == 'Nacelle':
-        mass = 0.0091 * d ** (2.0456)
-    elif sec == 'Tower':
-        mass = 0.0176*(d ** 2 * h) ** 0.6839
-    elif sec == 'Rotor':
-        mass = 0.0035 * d ** 2.1412
-    elif sec == 'Foundation':
-        mass = 3.5 * (0.0091 * d ** (2.0456) \
-                        + 0.0176*(d ** 2 * h) ** 0.6839 \
-                        + 0.0035 * d ** 2.1412) # 3.5 is the ratio of foundation mass to total mass
-    else:
-        raise ValueError('Unknown section: {}'.format(sec))
-    return mass
-
-# calculate the mass of each component of offshore wind turbine
-def calculate_offshore_mass(d, h, t, sec):
-    if sec == 'Nacelle':
-        mass = 0.0091 * d ** (2.0456)
-    elif sec == 'Tower':
-        mass = 0.0176*(d ** 2 * h) ** 0.6839
-    elif sec == 'Rotor':
-        mass = 0.0035 * d ** 2.1412
-    elif sec == 'Foundation':
-        scale = 2.2 if int(t) <= 2035 else 2.8
-        mass = scale * (0.0091 * d ** (2.0456) \
-                        + 0.0176*(d ** 2 * h) ** 0.6839 \
-                        + 0.0035 * d ** 2.1412) # 2.2 or 2.8 is the ratio of foundation mass to total mass
-    else:
-        raise ValueError('Unknown section: {}'.format(sec))
-    return mass
-
-# calculate the historical mass of each material for onshore wind turbine
-def calculate_material_mass(c, d, h, nacl, tower, oh_dict):
-    f_k = 'flat'
-    mass_dict = {m : 0 for m in oh_dict['DFIG/SCIG']}
-    for m in mass_dict:
-        if m not in ['Nd', 'Dy']:
-            nacl_m = calculate_total_mass(d, h, 'Nacelle') * oh_dict[nacl][m] 
-            tower_m = calculate_total_mass(d, h, 'Tower') * oh_dict[tower][m]
-            rotor_m = calculate_total_mass(d, h, 'Rotor') * oh_dict['/'][m] 
-            found_m = calculate_total_mass(d, h, 'Foundation') * oh_dict[f_k][m]
-            mass_dict[m] = nacl_m + tower_m + rotor_m + found_m
-        else:
-            mass_dict[m] = c * oh_dict[nacl][m] \
-                           + c * oh_dict[tower][m] \
-                           + c * oh_dict['/'][m] \
-                           + c * oh_dict[f_k][m]
-    return mass_dict
-
-# calculate the future mass of each material under different technology development scenarios for onshore wind turbine
-def calculate_future_material_onshore_mass(n, c, d, h, oh_dict, tp=1):
-    
-    excel_path = "input_data/Wind_data.xls"
-    df = pd.read_excel(excel_path, sheet_name='tech_dev', header=1)
-    nacl_list = df['nacelle_onshore_summary'].dropna().tolist()
-    nacl_vals = df['Unnamed: 3'].dropna().tolist()
-
-    nacl_type = {}
-    for i in range(len(nacl_list)):
-        if nacl_list[i] not in nacl_type:
-            nacl_type[nacl_list[i]] = []
-        nacl_type[nacl_list[i]].append(nacl_vals[i])
+# module imported on the first attribute access, so importing the model does not pay for heavy dependencies it may not use
+def lazy_import(name):
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
 
-    nacl_type = {k: v[tp] for k, v in nacl_type.items()}
+pd = lazy_import('pandas')
+from _inputs import load_original_data, load_onshore_dict, load_offshore_dict, get_data_from_recy_new, get_env_impact, get_model_inputs
+from _labelled import LabelledArray
+from _instrument import instrumented
 
-    tower_type = {
-        'Hybrid': df['Hybrid'].dropna().values[0],
-        'Steel': df['Steel'].dropna().values[0],
-    }
-    
-    mass_dict = {m : 0 for m in oh_dict['DFIG/SCIG']}
-    for m in mass_dict:
-        if m not in ['Nd', 'Dy']:
-            nacl_m, tower_m = 0, 0
-            for t in nacl_type:
-                nacl_m += calculate_total_mass(d, h, 'Nacelle') * oh_dict[t][m] * nacl_type[t] 
-            for t in tower_type:
-                tower_m += calculate_total_mass(d, h, 'Tower') * oh_dict[t][m] * tower_type[t]
-
-            rotor_m = calculate_total_mass(d, h, 'Rotor') * oh_dict['/'][m] 
-            found_m = calculate_total_mass(d, h, 'Foundation') * oh_dict['flat'][m]
-            mass_dict[m] = nacl_m + tower_m + rotor_m + found_m
-        else:
-            for t in nacl_type:
-                mass_dict[m] += c * oh_dict[t][m] * nacl_type[t] 
-            for t in tower_type:
-                mass_dict[m] += c * oh_dict[t][m] * tower_type[t]
-            mass_dict[m] += c * oh_dict['/'][m] \
-                           + c * oh_dict['flat'][m]
-            
-    return mass_dict
+COMPONENTS = ['Nacelle', 'Tower', 'Rotor', 'Foundation']
 
-# calculate the future mass of each material under different technology development scenarios for offshore wind turbine
-def calculate_future_material_offshore_mass(n, c, d, h, year, oh_dict,tp=1):
-    
-    excel_path = "input_data/Wind_data.xls"
-    df = pd.read_excel(excel_path, sheet_name='tech_dev', header=1)
-    nacl_list = df['nacelle_onshore_summary'].dropna().tolist()
-    nacl_vals = df['Unnamed: 5'].dropna().tolist()
+# component masses (nacelle, tower, rotor, foundation) of wind turbines, d and h can be arrays
+def calculate_component_masses(d, h, foundation_scale=3.5):
+    nacl = 0.0091 * d ** (2.0456)
+    tower = 0.0176*(d ** 2 * h) ** 0.6839
+    rotor = 0.0035 * d ** 2.1412
+    found = foundation_scale * (nacl + tower + rotor) # ratio of foundation mass to total mass
+    return nacl, tower, rotor, found
 
-    nacl_type = {}
-    for i in range(len(nacl_list)):
-        if nacl_list[i] not in nacl_type:
-            nacl_type[nacl_list[i]] = []
-        nacl_type[nacl_list[i]].append(nacl_vals[i])
+# ratio of foundation mass to total mass of offshore wind turbines installed in each year
+def get_offshore_foundation_scale(years):
+    return np.where(np.asarray(years, dtype=float).astype(int) <= 2035, 2.2, 2.8)
 
-    nacl_type = {k: v[tp] for k, v in nacl_type.items()}
+# dense [component type, material] matrix of the material composition
+def get_composition_matrix(oh_dict, types, materials=None):
+    materials = list(oh_dict['DFIG/SCIG']) if materials is None else materials
+    return np.asarray([[oh_dict[t][m] for m in materials] for t in types], dtype=float)
 
-    tower_type = {
-        'Hybrid': df['Hybrid'].dropna().values[0],
-        'Steel': df['Steel'].dropna().values[0],
-    }
-    
-    f_k = 'flat' if 'flat' in oh_dict else 'Monopile'
-    
-    mass_dict = {m : 0 for m in oh_dict['DFIG/SCIG']}
-    for m in mass_dict:
-        if m not in ['Nd', 'Dy']:
-            nacl_m, tower_m = 0, 0
-            for t in nacl_type:
-                nacl_m += calculate_offshore_mass(d, h, year, 'Nacelle') * oh_dict[t][m] * nacl_type[t] 
-            for t in tower_type:
-                tower_m += calculate_offshore_mass(d, h, year, 'Tower') * oh_dict[t][m] * tower_type[t]
-
-            rotor_m = calculate_offshore_mass(d, h, year, 'Rotor') * oh_dict['/'][m] 
-            found_m = calculate_offshore_mass(d, h, year, 'Foundation') * oh_dict[f_k][m]
-            mass_dict[m] = nacl_m + tower_m + rotor_m + found_m
-        else:
-            for t in nacl_type:
-                mass_dict[m] += c * oh_dict[t][m] * nacl_type[t]
-            for t in tower_type:
-                mass_dict[m] += c * oh_dict[t][m] * tower_type[t]
-            mass_dict[m] += c * oh_dict['/'][m] \
-                           + c * oh_dict[f_k][m]
-            
-    return mass_dict
+# material mass of a historical wind turbine fleet, aggregated by installation year
+def calculate_fleet_material_mass(c_list, d_list, h_list, nacl_list, tower_list, time_list, oh_dict):
+    '''
+    :param c_list: capacity of each wind turbine
+    :param d_list: diameter of each wind turbine
+    :param h_list: hub height of each wind turbine
+    :param nacl_list: nacelle type of each wind turbine
+    :param tower_list: tower type of each wind turbine
+    :param time_list: installation year of each wind turbine
+    :param oh_dict: dictionary of onshore data
+    :return: years [n_years], materials [n_materials], mass [n_years, n_materials]
+    '''
+    materials = list(oh_dict['DFIG/SCIG'])
+    c = np.asarray(c_list, dtype=float)
+    d = np.asarray(d_list, dtype=float)
+    h = np.asarray(h_list, dtype=float)
+    year = np.asarray(time_list, dtype=float).astype(int)
+    # integer-coded nacelle and tower types
+    nacl_types, nacl_idx = np.unique(np.asarray(nacl_list, dtype=str), return_inverse=True)
+    tower_types, tower_idx = np.unique(np.asarray(tower_list, dtype=str), return_inverse=True)
+    nacl_comp = get_composition_matrix(oh_dict, nacl_types, materials)[nacl_idx] # [n, m]
+    tower_comp = get_composition_matrix(oh_dict, tower_types, materials)[tower_idx] # [n, m]
+    rotor_comp, found_comp = get_composition_matrix(oh_dict, ['/', 'flat'], materials) # [m]
+    # component masses, Nd and Dy are given per unit capacity
+    is_ree = np.isin(materials, ['Nd', 'Dy'])
+    nacl_m, tower_m, rotor_m, found_m = [np.where(is_ree, c[:, None], x[:, None]) for x in calculate_component_masses(d, h)]
+    mass = nacl_m * nacl_comp + tower_m * tower_comp + rotor_m * rotor_comp + found_m * found_comp # [n, m]
+    # sum the turbines of each year, years without inflow are 0
+    years = np.arange(year.min(), year.max() + 1)
+    n_m = len(materials)
+    bins = ((year - years[0])[:, None] * n_m + np.arange(n_m)).ravel()
+    mass_by_year = np.bincount(bins, weights=mass.ravel(), minlength=len(years) * n_m).reshape(len(years), n_m)
+    return years, materials, mass_by_year
 
 # final calculation of historical onshore wind turbine material
+@instrumented()
 def calculate_material_mass_by_year(c_list, d_list, h_list, nacl_list, tower_list, time_list, oh_dict):
     '''
     :param d_list: list of diameters
@@ -234,76 +82,76 @@ def calculate_material_mass_by_year(c_list, d_list, h_list, nacl_list, tower_lis
     :param tower_list: list of tower types
     :param time_list: list of time
     :param oh_dict: dictionary of onshore data
-    :return: list of materials
+    :return: {year: {material: mass}}
     '''
-    mass_by_year = {}
+    years, materials, mass = calculate_fleet_material_mass(c_list, d_list, h_list, nacl_list, tower_list, time_list, oh_dict)
+    return {int(y): dict(zip(materials, mass[i].tolist())) for i, y in enumerate(years)}
 
-    excel_path = "input_data/Wind_data.xls"
-    df = pd.read_excel(excel_path, sheet_name='tech_dev', header=1)
-    
-    for i in range(len(time_list)):
-        year = int(time_list[i])
-        if year not in mass_by_year:
-            mass_by_year[year] = {}
-            for m in oh_dict['DFIG/SCIG']:
-                mass_by_year[year][m] = 0
-        c = c_list[i]
-        d = d_list[i]
-        h = h_list[i]
-        mass_dict = calculate_material_mass(c, d, h, nacl_list[i], tower_list[i], oh_dict)
-        debug = 0
-        for m in mass_dict:
-            mass_by_year[year][m] += mass_dict[m]
-    # 0 for years without inflow
-    for i in [1994, 1996]:
-        if i not in mass_by_year:
-            mass_by_year[i] = {}
-            for m in oh_dict['DFIG/SCIG']:
-                mass_by_year[i][m] = 0
-    return mass_by_year
+# technology share tensor [tech scenario, component, component type] of future wind turbines
+def get_future_share_tensor(nacl_share, tower_share, types, foundation_key):
+    n_tp = len(next(iter(nacl_share.values())))
+    share = np.zeros([n_tp, len(COMPONENTS), len(types)])
+    for t, v in nacl_share.items():
+        share[:, 0, types.index(t)] = v
+    for t, v in tower_share.items():
+        share[:, 1, types.index(t)] = v
+    share[:, 2, types.index('/')] = 1
+    share[:, 3, types.index(foundation_key)] = 1
+    return share
 
-# final caculation the mass of future onshore wind turbine material
-def calculate_future_material_mass_onshore_by_year(n_list, c_list, d_list, h_list, oh_dict, time_list, tp):
-    mass_by_year = {}
-    
-    for i in range(len(n_list)):
-        year = int(time_list[i])
-        n = n_list[i]
-        c = c_list[i]
-        d = d_list[i]
-        h = h_list[i]
-        mass_dict = calculate_future_material_onshore_mass(n, c, d, h, oh_dict, tp=tp)
-        
-        for k in mass_dict:
-            mass_dict[k] = mass_dict[k] * n
+# material mass of future wind turbines for all tech scenarios and years in one pass
+@instrumented()
+def calculate_future_material_tensor(n_list, c_list, d_list, h_list, time_list, oh_dict, nacl_share, tower_share, foundation_scale):
+    '''
+    :param n_list: number of wind turbines installed in each year
+    :param c_list: capacity per wind turbine in each year
+    :param d_list: diameter of the wind turbines in each year
+    :param h_list: hub height of the wind turbines in each year
+    :param time_list: installation years (or decimal years at a sub-annual time step)
+    :param oh_dict: dictionary of onshore/offshore data
+    :param nacl_share: future nacelle market share {nacelle type: [share by tech scenario]}
+    :param tower_share: future tower market share {tower type: share}
+    :param foundation_scale: ratio of foundation mass to total mass, scalar or one value per year
+    :return: LabelledArray of mass [tp, year, material]
+    '''
+    materials = list(oh_dict['DFIG/SCIG'])
+    types = list(oh_dict.keys())
+    foundation_key = 'flat' if 'flat' in oh_dict else 'Monopile'
+    n = np.asarray(n_list, dtype=float)
+    c = np.asarray(c_list, dtype=float)
+    d = np.asarray(d_list, dtype=float)
+    h = np.asarray(h_list, dtype=float)
+    # component mass per wind turbine [year, component], Nd and Dy are given per unit capacity
+    comp_mass = np.stack(np.broadcast_arrays(*calculate_component_masses(d, h, foundation_scale)), axis=1)
+    is_ree = np.isin(materials, ['Nd', 'Dy'])
+    unit_mass = np.where(is_ree[None, None, :], c[:, None, None], comp_mass[:, :, None]) # [year, component, material]
+    share = get_future_share_tensor(nacl_share, tower_share, types, foundation_key) # [tp, component, type]
+    composition = get_composition_matrix(oh_dict, types, materials) # [type, material]
+    mass = np.einsum('y,ykm,pkt,tm->pym', n, unit_mass, share, composition, optimize=True)
+    coords = {'tp': list(range(share.shape[0])), 'year': np.asarray(time_list).tolist(), 'material': materials}
+    return LabelledArray(mass, ('tp', 'year', 'material'), coords)
 
-        mass_by_year[year] = mass_dict
-    return mass_by_year
+# final caculation the mass of future onshore wind turbine material
+def calculate_future_material_mass_onshore_by_year(n_list, c_list, d_list, h_list, oh_dict, time_list, inputs=None):
+    inputs = inputs if inputs is not None else get_model_inputs()
+    return calculate_future_material_tensor(n_list, c_list, d_list, h_list, time_list, oh_dict,
+                                            inputs.nacl_share_onshore, inputs.tower_share, foundation_scale=3.5)
 
 # final calculation the mass of future offshore wind turbine material
-def calculate_future_material_mass_offshore_by_year(n_list, c_list, d_list, h_list, oh_dict, time_list, tp):
-    mass_by_year = {}
+def calculate_future_material_mass_offshore_by_year(n_list, c_list, d_list, h_list, oh_dict, time_list, inputs=None):
+    inputs = inputs if inputs is not None else get_model_inputs()
+    return calculate_future_material_tensor(n_list, c_list, d_list, h_list, time_list, oh_dict,
+                                            inputs.nacl_share_offshore, inputs.tower_share,
+                                            foundation_scale=get_offshore_foundation_scale(time_list))
     
-    for i in range(len(n_list)):
-        year = int(time_list[i])
-        n = n_list[i]
-        c = c_list[i]
-        d = d_list[i]
-        h = h_list[i]
-        mass_dict = calculate_future_material_offshore_mass(n, c, d, h, year, oh_dict, tp=tp)
-        
-        for k in mass_dict:
-            mass_dict[k] = mass_dict[k] * n
-
-        mass_by_year[year] = mass_dict
-    return mass_by_year
-    
-import matplotlib.pyplot as plt
-import numpy as np
-import matplotlib.ticker as mticker
+# the plotting functions import matplotlib and apply the figure settings when called, so the model runs without it
 
 # plot the mass of each material by year
+@instrumented()
 def plot_mass_by_year(mass_by_year, name, w_scale=1):
+    import matplotlib.ticker as mticker
+    from _fig_settings import get_pyplot, COLORS
+    plt = get_pyplot()
     materials = list(mass_by_year.columns)
     mass_by_year['Year'] = mass_by_year.index
     
@@ -345,37 +193,128 @@ def plot_mass_by_year(mass_by_year, name, w_scale=1):
     plt.savefig(name)
     plt.close()
 
+# EoL strategies of one site and their [strategy, material, treatment] shares
+def get_strategy_tensor(recy_table, site, materials):
+    '''
+    :param recy_table: EoL treatment shares {'<strategy>_<onshore/offshore>': {material: shares}}
+    :param site: 'onshore' or 'offshore'
+    :param materials: materials in the order of the outflows
+    :return: names of the strategies, [strategy, material, treatment] shares
+    '''
+    keys = [k for k in recy_table if k.endswith('_' + site)]
+    strategies = [k[:-len(site) - 1] for k in keys]
+    return strategies, np.asarray([[recy_table[k][m] for m in materials] for k in keys], dtype=float)
 
-# read different EoL teartment strategies data
-def get_data_from_recy_new(path="input_data/Wind_data.xls"):
-    wb = xlrd.open_workbook(path)
-    # load existing data
-    sheet = wb.sheet_by_name('recy_rate_new')
-    
-    table = {}
-    
-    for i in range(27):
-        
-        if 'EoL' in sheet.cell_value(i, 0):
-            start_row = i
-            t_type = sheet.cell_value(i, 0)
-            
-            # create t type table
-            table[t_type + '_onshore'] = {}
-            table[t_type + '_offshore'] = {}
-            
-            for b_i in range(i + 2, i + 12):
-                material = sheet.cell_value(b_i, 1)
-                onshore_recy = [sheet.cell_value(b_i, j) for j in range(2, 7)]
-                offshore_recy = [sheet.cell_value(b_i, j) for j in range(9, 14)]
-                
-                # write to table
-                table[t_type + '_onshore'][material] = onshore_recy
-                table[t_type + '_offshore'][material] = offshore_recy
+# EoL treatment flows of every strategy, material and year in one product
+def allocate_eol(outflow, shares, history=None, n_history=0):
+    '''
+    :param outflow: [year, material] EoL outflow
+    :param shares: [strategy, material, treatment] shares, see get_strategy_tensor
+    :param history: [material, treatment] shares of the first n_history periods, the same for every strategy
+    :return: [strategy, year, material, treatment] flows
+    '''
+    outflow = np.asarray(outflow, dtype=float)
+    flows = np.einsum('ym,kmp->kymp', outflow, shares)
+    if history is not None and n_history > 0:
+        flows[:, :n_history] = outflow[:n_history, :, None] * np.asarray(history, dtype=float)
+    return flows
 
-    proc_methods = [sheet.cell_value(2, j).replace('on_', '') for j in range(2, 7)]
-    
-    # #print table to verify
-    #print(table)
-    
-    return table, proc_methods
\ No newline at end of file
+# stacked EoL outflows of each treatment by year
+@instrumented()
+def plot_eol_by_process(year, result_sum, proc_methods, name, figsize=(6, 6)):
+    from _fig_settings import get_pyplot
+    plt = get_pyplot()
+    fig, ax = plt.subplots(figsize=figsize)
+    cum_recy = np.zeros(len(year))
+    colors = ['#fbb4ae', '#b3cde3', '#ccebc5', '#decbe4', '#fed9a6']
+    for j, p in enumerate(proc_methods):
+
+        ax.plot([], [], label=p, color=colors[j])
+
+        # Fill the area between cumulative recycling and the next layer in result_sum
+        ax.fill_between(year, cum_recy + result_sum[:, j], cum_recy, color=colors[j], edgecolor='none')
+
+        cum_recy = result_sum[:, j] + cum_recy
+
+    ax.legend(loc='upper left',fontsize=12)
+    ax.spines['right'].set_visible(False)
+    ax.spines['top'].set_visible(False)
+    ax.set_xlabel('Year', fontsize=14)
+    ax.set_ylabel('Mass [Mt]', fontsize=14)  # Update y-axis label to megatons (Mt)
+
+    # Set y-axis ticks to display with two decimal places
+    ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, _: f'{x:.2f}'))
+
+    # Remove border around the legend box
+    leg = ax.get_legend()
+    leg.get_frame().set_linewidth(0.0)
+
+    # Adjust layout for better fit
+    fig.tight_layout()
+
+    # Save the figure with custom filename
+    plt.savefig(name)
+    plt.close()
+
+# stacked outflows of each technology (e.g. nacelle type) by year
+@instrumented()
+def plot_outflow_by_technology(year, values, technologies, name, ylabel='Mass [Mt]', figsize=(6, 6)):
+    from _fig_settings import get_pyplot
+    plt = get_pyplot()
+    fig, ax = plt.subplots(figsize=figsize)
+    colors = plt.get_cmap('Pastel1').colors
+    ax.stackplot(year, np.asarray(values).T, labels=technologies, colors=colors[:len(technologies)], edgecolor='none')
+
+    ax.legend(loc='upper left', fontsize=12, frameon=False)
+    ax.spines['right'].set_visible(False)
+    ax.spines['top'].set_visible(False)
+    ax.set_xlabel('Year', fontsize=14)
+    ax.set_ylabel(ylabel, fontsize=14)
+
+    fig.tight_layout()
+    plt.savefig(name)
+    plt.close()
+
+# net energy and CO2 of each material by decade, one set of bars per EoL strategy
+@instrumented()
+def plot_env_impact(results, strategy_list, time_agg, colors, name_en, name_co2, scale_en=2.1, scale_co2=2, xtick_size=12, two_decimals=False):
+    '''
+    :param results: {strategy: {'en_consume_by_mat', 'en_net_by_mat', 'co2_consume_by_mat', 'co2_net_by_mat'}}
+    :param time_agg: labels of the decades
+    :param colors: color of each material
+    :param name_en: path of the energy figure
+    :param name_co2: path of the CO2 figure
+    :param scale_en, scale_co2: size of the figures relative to FIG_WIDTH and FIG_HEIGHT
+    :param two_decimals: format the y-axis tick labels with two decimals
+    '''
+    from _fig_settings import get_pyplot, FIG_WIDTH, FIG_HEIGHT
+    plt = get_pyplot()
+    en_fig, en_ax = plt.subplots(figsize=(scale_en*FIG_WIDTH, scale_en*FIG_HEIGHT))
+    co2_fig, co2_ax = plt.subplots(figsize=(scale_co2*FIG_WIDTH, scale_co2*FIG_HEIGHT))
+    bar_width = 1 / (len(strategy_list)) * 0.8
+    for si, sn in enumerate(strategy_list):
+        for ax, key, ylabel in [(en_ax, 'en', 'Energy (PJ)'), (co2_ax, 'co2', 'Mt CO₂e')]:
+            net_by_mat = results[sn][key + '_net_by_mat']
+            bottom = [0 for _ in range(len(time_agg))]
+            for m in results[sn][key + '_consume_by_mat']:
+                ax.bar(np.arange(len(time_agg)) - si * bar_width, bottom=bottom, height=net_by_mat[m], color=colors[m], label='{} ({})'.format(m, sn), width=bar_width, alpha=0.5 + 0.5 * si / max(len(strategy_list) - 1, 1))
+                bottom = [bottom[j] + net_by_mat[m][j] for j in range(len(time_agg))]
+
+            ax.set_xticks(np.arange(len(time_agg)) - bar_width/2)
+            ax.set_xticklabels(time_agg)
+            ax.set_ylabel(ylabel,fontsize=18)
+            ax.set_xlabel('Year', fontsize=18)
+            ax.legend(loc='upper left',fontsize=12)
+            ax.tick_params(axis='y', labelsize=16)
+            ax.tick_params(axis='x', labelsize=xtick_size)
+            if two_decimals:
+                ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, _: f'{x:.2f}'))
+            leg = ax.get_legend()
+            leg.get_frame().set_linewidth(0.0)
+
+    en_fig.tight_layout()
+    en_fig.savefig(name_en)
+    co2_fig.tight_layout()
+    co2_fig.savefig(name_co2)
+    plt.close(en_fig)
+    plt.close(co2_fig)
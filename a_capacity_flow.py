@@ -1,46 +1,10 @@
 import os
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mticker
-from scipy.stats import weibull_min
+from _inputs import get_model_inputs
+from _banded import BandedCohortMatrix, get_band_width
 from _params import get_parser
-
-"""
-=============
-prepare files
-=============
-"""
-def get_capacity_data_from_excel(excel_path):
-    df_onshore = pd.read_excel(excel_path, sheet_name='on_capacity')
-    df_offshore = pd.read_excel(excel_path, sheet_name='off_capacity')
-    # extract the historical onshore inflow data
-    inflow_history_onshore = df_onshore['on_historical_capacity_inflow'].dropna().values
-    # extract the future onshore/offshore stock capacity data
-    stock_future_onshore = {
-        'Gcam': df_onshore['on_future_capacity_stock'].dropna().to_list(),
-        'GNZ': df_onshore['on_future_capacity_stock_1'].dropna().to_list(),
-    }
-    stock_future_offshore = {
-        'Gcam': df_offshore['off_future_capacity'].dropna().to_list(),
-        'GNZ': df_offshore['off_future_capacity_1'].dropna().to_list(),
-    }
-    # extract the historical/future year data
-    def process_years(df_col):
-        years = df_col.dropna().to_list()
-        years = [int(year) for year in years]
-        return years
-    years_future_onshore, years_future_offshore, years_history_onshore = [
-        process_years(df_col) for df_col in [
-            df_onshore['on_future_year'], df_offshore['off_future_year'], df_onshore['on_historical_year']]
-    ]
-    # extract lifetimes
-    lifetimes = pd.read_excel(excel_path, sheet_name='tech_dev', header=0)
-    historical_lifetime = list(lifetimes['his_lifetime'].dropna().values)[0]
-    future_lifetime = list(lifetimes['future_lifetime'].dropna().values)[0]
-
-    return stock_future_onshore, years_future_onshore, years_history_onshore, inflow_history_onshore, \
-        stock_future_offshore, years_future_offshore, historical_lifetime, future_lifetime
+from _instrument import instrumented
+from _time_axis import get_time_axis
 
 """
 ================
@@ -58,34 +22,51 @@ class CapacityFlow:
         This excel should include the following information:
         - 1993-2019 inflow
         - 2020-2050 stock (GCam and GNZ)
+    inputs: ModelInputs
+        Inputs already loaded from the excel file, excel_path is ignored if given
+    banded: bool
+        Return the cohort matrices as BandedCohortMatrix (cohort x age) instead of dense (cohort x year)
+    truncation_tol: float
+        Tail mass of the lifetime pdf dropped from the band, 0 keeps every non-zero age
+    axis: TimeAxis
+        Horizon and time step of the flows, annual up to the last year of the capacity scenarios if not given
     """
-    def __init__(self, excel_path: str = "input_data/Wind_data.xls"):
-        self.excel_path = excel_path
-        # read the data from the excel file
+    def __init__(self, excel_path: str = "input_data/Wind_data.xls", inputs=None, banded=False, truncation_tol=0.0, axis=None):
+        self.inputs = inputs if inputs is not None else get_model_inputs(excel_path)
+        self.banded = banded
+        self.truncation_tol = truncation_tol
+        self.excel_path = self.inputs.excel_path
+        self.axis = axis if axis is not None else get_time_axis(self.inputs)
+        # read the data from the model inputs, the historical years and inflows by period of the time axis
         (self.stock_future_onshore, self.years_future_onshore, self.years_history_onshore,
          self.inflow_history_onshore, self.stock_future_offshore, self.years_future_offshore,
-         self.historical_lifetime, self.future_lifetime) = get_capacity_data_from_excel(excel_path)
+         self.historical_lifetime, self.future_lifetime) = (
+            self.inputs.stock_future_onshore, self.inputs.years_future_onshore, self.axis.history,
+            self.axis.split_history(self.inputs.inflow_history_onshore), self.inputs.stock_future_offshore, self.inputs.years_future_offshore,
+            self.inputs.historical_lifetime, self.inputs.future_lifetime)
 
     def interp_annual_for_future(self, 
                                  stock_future_onshore, years_future_onshore_annual, years_future_onshore,
                                  stock_future_offshore, years_future_offshore_annual, years_future_offshore,
                                  capacity_scenario: str = 'Gcam'):
-        """Interpolate the stock data for the future years"""
-        if capacity_scenario == 'GNZ':
-            stock_future_onshore = stock_future_onshore
-            stock_future_offshore = stock_future_offshore
-        elif capacity_scenario == 'Gcam':
-            stock_future_onshore = np.interp(years_future_onshore_annual, years_future_onshore, stock_future_onshore)
-            stock_future_offshore = np.interp(years_future_offshore_annual, years_future_offshore, stock_future_offshore)
-        else:
+        """Interpolate the stock data for the future periods, the stock is held at its last value after the last data year"""
+        if capacity_scenario not in ['Gcam', 'GNZ']:
             raise ValueError(f"Invalid capacity scenario: {capacity_scenario}")
+        stock_future_onshore = np.interp(years_future_onshore_annual, self.get_stock_years(stock_future_onshore, years_future_onshore), stock_future_onshore)
+        stock_future_offshore = np.interp(years_future_offshore_annual, self.get_stock_years(stock_future_offshore, years_future_offshore), stock_future_offshore)
         return stock_future_onshore, stock_future_offshore
 
+    def get_stock_years(self, stock, years):
+        """Years of the stock data: the data years (Gcam), or every year from the first one if there is one value per year (GNZ)"""
+        if len(stock) == len(years):
+            return np.asarray(years)
+        return years[0] + np.arange(len(stock))
+
     def update_capacity(self, capacity_scenario: str = 'Gcam'):
-        """Update the capacity data"""
+        """Update the capacity data, with the future periods of the time axis"""
 
-        years_future_onshore_annual = np.arange(2020, self.years_future_onshore[-1] + 1)
-        years_future_offshore_annual = np.arange(self.years_future_offshore[0], self.years_future_offshore[-1] + 1)
+        years_future_onshore_annual = self.axis.future
+        years_future_offshore_annual = self.axis.get_periods(self.years_future_offshore[0])
 
         return self.stock_future_onshore[capacity_scenario], self.years_future_onshore, self.years_history_onshore, \
             self.inflow_history_onshore, self.stock_future_offshore[capacity_scenario], self.years_future_offshore, \
@@ -97,8 +78,9 @@ class CapacityFlow:
         return scale
 
     def get_one_weibull_pdf(self, shape, scale, years):
-        '''Generate the Weibull PDF for the given shape and scale'''
-        weibull_pdf = weibull_min.pdf(np.arange(len(years)), shape, scale=scale)
+        '''Generate the Weibull PDF for the given shape and scale, per period of age (the lifetimes are in years)'''
+        from scipy.stats import weibull_min
+        weibull_pdf = weibull_min.pdf(self.axis.get_ages(len(years)), shape, scale=scale) / self.axis.steps_per_year
         return weibull_pdf
 
     def get_weibull_pdf(self, years_future_onshore_annual, years_future_offshore_annual):
@@ -117,21 +99,37 @@ class CapacityFlow:
         ]
         return weibull_pdf_history_onshore, weibull_pdf_future_onshore, weibull_pdf_future_offshore
 
+    def get_lifetime_kernel(self, weibull_pdf, n):
+        """Failure rate by age (0..n-1), zero at age 0 and beyond the length of the pdf"""
+        kernel = np.zeros(n)
+        k = min(n, len(weibull_pdf))
+        kernel[1:k] = weibull_pdf[1:k]
+        return kernel
+
+    def get_outflow_operator(self, kernel, n_cohorts, n_years, offset=0):
+        """Lower-triangular Toeplitz operator: [j, i] is the failure rate of cohort j in year i (age i - j + offset)"""
+        age = np.arange(n_years)[None, :] - np.arange(n_cohorts)[:, None] + offset
+        operator = np.zeros([n_cohorts, n_years])
+        valid = (age > 0) & (age < len(kernel))
+        operator[valid] = kernel[age[valid]]
+        return operator
+
+    def convolve_lifetime(self, inflow, kernel):
+        """Outflow of each year as the discrete convolution of the inflow with the failure rate by age"""
+        n = len(inflow)
+        if n > 512:
+            from scipy.signal import fftconvolve
+            return fftconvolve(inflow, kernel)[:n]
+        return np.convolve(inflow, kernel)[:n]
+
     def update_outflow_stock_from_inflow(self, inflow, weibull_pdf):
-        outflow, outflow_contrib = np.zeros(len(inflow)), np.zeros([len(inflow), len(inflow)])
-        stock = np.zeros(len(inflow))
-        for i in range(len(inflow)):
-            for j in range(i):
-                years_diff = i - j
-                if years_diff >= len(weibull_pdf): continue
-                # calculate the outflow from j to i
-                outflow_j_in_i = inflow[j] * weibull_pdf[years_diff]
-                outflow[i] += outflow_j_in_i
-                # calculate the contribution of j to i
-                outflow_contrib[j, i] = outflow_j_in_i
-            # add the previous stock to the current stock
-            stock[i] = inflow[i] - outflow[i]
-            stock[i] += stock[i - 1] if i > 0 else 0
+        """Inflow-driven mode: outflow is the convolution of the inflow with the Weibull pdf"""
+        inflow = np.asarray(inflow, dtype=float)
+        kernel = self.get_lifetime_kernel(weibull_pdf, len(inflow))
+        outflow = self.convolve_lifetime(inflow, kernel)
+        stock = np.cumsum(inflow - outflow)
+        # outflow_contrib[j, i] is the outflow from j to i
+        outflow_contrib = inflow[:, None] * self.get_outflow_operator(kernel, len(inflow), len(inflow))
         return outflow, stock, outflow_contrib
 
     def solver_for_inflow(self, stock_pre, stock_curr, outflow_pre):
@@ -139,47 +137,78 @@ class CapacityFlow:
         return inflow_curr
 
     def update_inflow_outflow_from_stock(self, stock, inflow_history=None, stock_history=None, weibull_pdf_history=None, weibull_pdf_future=None):
-        inflow_future, outflow_future, outflow_contrib = np.zeros(len(stock)), np.zeros(len(stock)), \
-            np.zeros([len(stock) + len(inflow_history), len(stock)]) if inflow_history is not None else np.zeros([len(stock), len(stock)])
+        """
+        Stock-driven mode: inflow[i] = stock[i] - stock[i-1] + outflow[i], where the outflow depends on
+        the earlier inflows, i.e. (I - L) inflow = b with L the lower-triangular Toeplitz lifetime operator
+        """
+        stock = np.asarray(stock, dtype=float)
+        n = len(stock)
         history_length = len(inflow_history) if inflow_history is not None else 0
-        for i in range(len(stock)):
-            outflow_pre = 0
-            # incorporating the historical inflow data
-            for j in range(history_length):
-                years_diff = i - j + history_length
-                if years_diff >= len(weibull_pdf_history): continue
-                failure_rate = weibull_pdf_history[years_diff]
-                outflow_j_in_i = inflow_history[j] * failure_rate
-                outflow_pre += outflow_j_in_i
-                outflow_contrib[j, i] = outflow_j_in_i
-            for j in range(i):
-                years_diff = i - j
-                if years_diff >= len(weibull_pdf_future): continue
-                failure_rate = weibull_pdf_future[years_diff]
-                outflow_j_in_i = inflow_future[j] * failure_rate
-                outflow_pre += outflow_j_in_i
-                outflow_contrib[j + history_length, i] = outflow_j_in_i
-            # calculate the inflow for the current year
-            inflow_future[i] = self.solver_for_inflow(stock[i - 1], stock[i], outflow_pre) if i > 0 \
-                else self.solver_for_inflow(stock_history[-1], stock[i], outflow_pre)
-            # update the outflow for the current year
-            outflow_future[i] = outflow_pre
+        # outflow of the historical cohorts in the future years
+        if history_length > 0:
+            inflow_history = np.asarray(inflow_history, dtype=float)
+            operator_history = self.get_outflow_operator(np.asarray(weibull_pdf_history, dtype=float), history_length, n, offset=history_length)
+            outflow_history = inflow_history @ operator_history
+        else:
+            outflow_history = np.zeros(n)
+        # solve the lower-triangular system for the future inflow
+        kernel = self.get_lifetime_kernel(weibull_pdf_future, max(n, len(weibull_pdf_future)))
+        operator_future = self.get_outflow_operator(kernel, n, n)
+        stock_pre = np.concatenate(([stock_history[-1]], stock[:-1]))
+        from scipy.linalg import solve_triangular
+        inflow_future = solve_triangular(np.eye(n) - operator_future.T, self.solver_for_inflow(stock_pre, stock, outflow_history),
+                                         lower=True, unit_diagonal=True)
+        outflow_future = outflow_history + inflow_future @ operator_future
+        # register each year's contribution on the current outflow
+        outflow_contrib = inflow_future[:, None] * operator_future
+        if history_length > 0:
+            outflow_contrib = np.concatenate([inflow_history[:, None] * operator_history, outflow_contrib], axis=0)
         return inflow_future, outflow_future, outflow_contrib
 
+    def update_flow_banded(self, stock, inflow_history=None, weibull_pdf_history=None, weibull_pdf_future=None):
+        """
+        Banded counterpart of update_outflow_stock_from_inflow and update_inflow_outflow_from_stock: the outflow of
+        each cohort is only kept for the ages inside the band, so memory grows linearly with the horizon
+        """
+        stock = np.asarray(stock, dtype=float)
+        inflow_history = np.zeros(0) if inflow_history is None else np.asarray(inflow_history, dtype=float)
+        history_length, n = len(inflow_history), len(stock)
+        n_total = history_length + n
+        kernel_history = self.get_lifetime_kernel(weibull_pdf_history, n_total) if history_length > 0 else np.zeros(n_total)
+        kernel_future = self.get_lifetime_kernel(weibull_pdf_future, n_total)
+        width = get_band_width([kernel_history, kernel_future], n_total, self.truncation_tol)
+        kernels = np.concatenate([np.repeat(kernel_history[None, :width], history_length, axis=0),
+                                  np.repeat(kernel_future[None, :width], n, axis=0)])
+        # outflow of the historical cohorts over the whole horizon
+        inflow = np.concatenate((inflow_history, np.zeros(n)))
+        outflow = BandedCohortMatrix(inflow[:, None] * kernels).dot_cohorts(np.ones(n_total))
+        stock_history = np.cumsum(inflow_history - outflow[:history_length])
+        # (I - L) inflow = b, with L stored by diagonals for the banded solver
+        stock_pre = np.concatenate(([stock_history[-1] if history_length > 0 else 0.0], stock[:-1]))
+        lower = min(width, n) - 1
+        ab = np.repeat(-kernel_future[:lower + 1, None], n, axis=1)
+        ab[0] = 1.0
+        from scipy.linalg import solve_banded
+        inflow[history_length:] = solve_banded((lower, 0), ab, self.solver_for_inflow(stock_pre, stock, outflow[history_length:]))
+        # register each year's contribution on the current outflow
+        outflow_contrib = BandedCohortMatrix(inflow[:, None] * kernels)
+        outflow = outflow_contrib.dot_cohorts(np.ones(n_total))
+        return inflow, outflow, stock_history, outflow_contrib
+
     def get_stock_contrib(self, outflow_contrib, inflow):
         """Get the contribution of stock given the outflow and inflow data"""
-        stock_contrib = outflow_contrib.copy()
-        stock_contrib = np.cumsum(stock_contrib, axis=1)
+        if isinstance(outflow_contrib, BandedCohortMatrix):
+            return outflow_contrib.survivors(inflow)
         # inflow minus cumsum of outflow
-        for i in range(len(inflow)):
-            stock_contrib[i, :] = inflow[i] - stock_contrib[i, :]
-        return stock_contrib
+        return np.asarray(inflow, dtype=float)[:, None] - np.cumsum(outflow_contrib, axis=1)
 
-    def plot(self, tech_scenario: int = 0):
+    @instrumented('CapacityFlow.plot')
+    def plot(self, tech_scenario: int = 0, save: bool = True):
         """Plot the inflow, stock, outflow for onshore and offshore with larger y-axis font size and consistent significant figures"""
+        import matplotlib.pyplot as plt
         color_dict = {'Gcam': '#ca0020', 'GNZ': '#0571b0', 'Historical': '#f4a582'}
-        years_future = np.arange(2020, 2051)
-        years_history = np.arange(1993, 2020)
+        years_future = self.axis.future
+        years_history = self.axis.history
 
         def format_ax(ax, title):
             ax.set_title(title)
@@ -191,19 +220,14 @@ class CapacityFlow:
 
         # plot onshore and offshore data
         _, axs = plt.subplots(2, 3, figsize=(13, 7), constrained_layout=True)
-        for line_type, line_width, capacity_scenario in zip(['-', '--'], [2, 1], ['Gcam', 'GNZ']):
-            inflow_onshore, inflow_future_onshore, stock_onshore, outflow_onshore, inflow_offshore, outflow_offshore, stock_offshore, \
-                outflow_onshore_contrib, outflow_offshore_contrib, stock_onshore_contrib, stock_offshore_contrib, \
-                years_onshore, years_offshore = self(tech_scenario=tech_scenario, capacity_scenario=capacity_scenario)
-            
-            # Convert to GW by dividing by 1000, keeping full precision for calculation
-            inflow_onshore = np.array(inflow_onshore) 
-            stock_onshore = np.array(stock_onshore) 
-            outflow_onshore = np.array(outflow_onshore) 
-            inflow_offshore = np.array(inflow_offshore)
-            stock_offshore = np.array(stock_offshore) 
-            outflow_offshore = np.array(outflow_offshore)
-
+        capacity_scenarios = ['Gcam', 'GNZ']
+        flows = self.batch(*self.get_future_stock(capacity_scenarios))
+        if save:
+            self.save_flows(tech_scenario, capacity_scenarios, flows)
+        for s, (line_type, line_width, capacity_scenario) in enumerate(zip(['-', '--'], [2, 1], capacity_scenarios)):
+            inflow_onshore, stock_onshore, outflow_onshore = flows['inflow_onshore'][s], flows['stock_onshore'][s], flows['outflow_onshore'][s]
+            inflow_offshore, stock_offshore, outflow_offshore = flows['inflow_offshore'][s], flows['stock_offshore'][s], flows['outflow_offshore'][s]
+            years_offshore = flows['years_offshore']
 
             # Plot onshore data
             axs[0, 0].plot(np.concatenate((years_history, years_future)), inflow_onshore, label=capacity_scenario, color=color_dict[capacity_scenario], linestyle=line_type, linewidth=line_width)
@@ -229,45 +253,38 @@ class CapacityFlow:
         plt.savefig('save_figs/capacity_flow_{}.png'.format(tech_scenario))
         plt.close()
 
+    def save_flows(self, tech_scenario: int = 0, capacity_scenarios=('Gcam', 'GNZ'), flows=None):
+        """Save the capacity flows of every capacity scenario without plotting them"""
+        flows = flows if flows is not None else self.batch(*self.get_future_stock(capacity_scenarios))
+        for s, capacity_scenario in enumerate(capacity_scenarios):
+            self.save_data(flows['years_onshore'], flows['inflow_onshore'][s], flows['stock_onshore'][s], flows['outflow_onshore'][s],
+                           flows['years_offshore'], flows['inflow_offshore'][s], flows['stock_offshore'][s], flows['outflow_offshore'][s],
+                           tech_scenario, capacity_scenario)
+
     def save_data(self, years_onshore, inflow_onshore, stock_onshore, outflow_onshore, 
                   years_offshore, inflow_offshore, stock_off, outflow_offshore,
-                  tech_scenario: int = 0, capacity_scenario: str = 'Gcam', save_root='results/capacity'):
-        """Save the data to a csv file"""
+                  tech_scenario: int = 0, capacity_scenario: str = 'Gcam', root='results'):
+        """Save the data to a csv file (or to the active results store)"""
+        import pandas as pd
+        from _results_store import save_table
         save_onshore = pd.DataFrame({
-            'Year': years_onshore, 
             'Inflow (MW)': np.array(inflow_onshore), 
             'Stock (MW)': np.array(stock_onshore), 
             'Outflow (MW)': np.array(outflow_onshore)
-        })
+        }, index=pd.Index(years_onshore, name='Year'))
         save_offshore = pd.DataFrame({
-            'Year': years_offshore, 
             'Inflow (MW)': np.array(inflow_offshore), 
             'Stock (MW)': np.array(stock_off), 
             'Outflow (MW)': np.array(outflow_offshore)
-    })
+        }, index=pd.Index(years_offshore, name='Year'))
 
-        save_dir = os.path.join(save_root)
-        os.makedirs(save_dir, exist_ok=True)
-        save_onshore.to_csv(os.path.join(save_dir, f'onshore_{capacity_scenario}_{tech_scenario}.csv'), index=False)
-        save_offshore.to_csv(os.path.join(save_dir, f'offshore_{capacity_scenario}_{tech_scenario}.csv'), index=False)
+        save_table('capacity_onshore', save_onshore, root=root, scen=capacity_scenario, tp=tech_scenario)
+        save_table('capacity_offshore', save_offshore, root=root, scen=capacity_scenario, tp=tech_scenario)
 
-    def __call__(self, tech_scenario: int = 0, capacity_scenario: str = 'Gcam'):
-        """Calculate the capacity flow given the dataset"""
-        # update the capacity data
-        (stock_future_onshore, years_future_onshore, years_history_onshore, inflow_history_onshore,
-         stock_future_offshore, years_future_offshore, 
-         years_future_onshore_annual, years_future_offshore_annual) = self.update_capacity(capacity_scenario)
-    
-        # do interpolation for the future years
-        stock_future_onshore, stock_future_offshore = self.interp_annual_for_future(
-            stock_future_onshore, years_future_onshore_annual, years_future_onshore,
-            stock_future_offshore, years_future_offshore_annual, years_future_offshore,
-            capacity_scenario)
-    
-        # make the Weibull PDF
-        weibull_pdf_history_onshore, weibull_pdf_future_onshore, weibull_pdf_future_offshore = self.get_weibull_pdf(
-            years_future_onshore_annual, years_future_offshore_annual)
-    
+    def update_flow_dense(self, stock_future_onshore, years_history_onshore, inflow_history_onshore, stock_future_offshore,
+                          years_future_onshore_annual, years_future_offshore_annual,
+                          weibull_pdf_history_onshore, weibull_pdf_future_onshore, weibull_pdf_future_offshore):
+        """Inflow, stock and outflow of onshore and offshore with dense [cohort, year] contribution matrices"""
         # calculate the total years
         years_total_onshore = len(years_history_onshore) + len(years_future_onshore_annual)
         years_total_offshore = len(years_future_offshore_annual)
@@ -294,6 +311,131 @@ class CapacityFlow:
         # update inflow and outflow of offshore given the stock
         inflow_offshore, outflow_offshore, outflow_offshore_contrib = self.update_inflow_outflow_from_stock(
             stock_future_offshore, stock_history=[0], weibull_pdf_future=weibull_pdf_future_offshore)
+        return inflow_onshore, inflow_future_onshore, stock_onshore, outflow_onshore, \
+            inflow_offshore, outflow_offshore, outflow_onshore_contrib, outflow_offshore_contrib
+
+    def get_future_stock(self, capacity_scenarios=('Gcam', 'GNZ')):
+        """Future stock of onshore and offshore by period for each capacity scenario, stacked on a leading scenario axis"""
+        stock_onshore, stock_offshore = [], []
+        for capacity_scenario in capacity_scenarios:
+            (stock_future_onshore, years_future_onshore, _, _, stock_future_offshore, years_future_offshore,
+             years_future_onshore_annual, years_future_offshore_annual) = self.update_capacity(capacity_scenario)
+            stock_future_onshore, stock_future_offshore = self.interp_annual_for_future(
+                stock_future_onshore, years_future_onshore_annual, years_future_onshore,
+                stock_future_offshore, years_future_offshore_annual, years_future_offshore,
+                capacity_scenario)
+            stock_onshore.append(stock_future_onshore)
+            stock_offshore.append(stock_future_offshore)
+        return np.stack(stock_onshore), np.stack(stock_offshore)
+
+    def get_batch_lifetime_kernel(self, mean_lifetime, shape, n_pdf, n):
+        """[n_scenarios, n] failure rate by age for a mean lifetime (and a shape, scalar or [n_scenarios]) per scenario, the pdf is cut after n_pdf ages as in get_one_weibull_pdf"""
+        mean_lifetime = np.asarray(mean_lifetime, dtype=float)
+        shape = np.broadcast_to(np.asarray(shape, dtype=float), mean_lifetime.shape)
+        scale = self.get_weibull_scale_from_mean(mean_lifetime, shape)
+        kernel = np.zeros([len(scale), n])
+        k = min(n, n_pdf)
+        from scipy.stats import weibull_min
+        kernel[:, 1:k] = weibull_min.pdf(self.axis.get_ages(k)[None, 1:], shape[:, None], scale=scale[:, None]) / self.axis.steps_per_year
+        return kernel
+
+    def solve_batch(self, stock, inflow_history, kernel_history, kernel_future):
+        """
+        Stock-driven flow of several scenarios at once
+
+        :param stock: [n_scenarios, n] future stock
+        :param inflow_history: [n_history] historical inflow shared by the scenarios (may be empty),
+                               or [n_scenarios, n_history] one per scenario (e.g. one per region)
+        :param kernel_history: [n_scenarios, n_history + n] failure rate by age of the historical cohorts
+        :param kernel_future: [n_scenarios, n_history + n] failure rate by age of the future cohorts
+        :return: inflow, outflow, stock over the whole horizon, each [n_scenarios, n_history + n]
+        """
+        n_scenarios, n = stock.shape
+        inflow_history = np.asarray(inflow_history, dtype=float)
+        history_length = inflow_history.shape[-1]
+        n_total = history_length + n
+        # outflow of the historical cohorts over the whole horizon
+        age = np.arange(n_total)[None, :] - np.arange(history_length)[:, None]
+        operator_history = np.where(age > 0, kernel_history[:, np.clip(age, 0, n_total - 1)], 0.0)
+        outflow = np.einsum('sj,sji->si' if inflow_history.ndim == 2 else 'j,sji->si', inflow_history, operator_history)
+        stock_history = np.cumsum(np.broadcast_to(inflow_history, (n_scenarios, history_length)) - outflow[:, :history_length], axis=1)
+        stock_pre = np.concatenate((stock_history[:, -1:] if history_length > 0 else np.zeros([n_scenarios, 1]), stock[:, :-1]), axis=1)
+        # forward substitution of (I - L) inflow = b, one year at a time for every scenario
+        width = get_band_width(list(kernel_future), n_total)
+        inflow_future = np.zeros([n_scenarios, n])
+        for i in range(n):
+            cohorts = np.arange(max(0, i - width + 1), i)
+            outflow[:, history_length + i] += np.sum(kernel_future[:, i - cohorts] * inflow_future[:, cohorts], axis=1)
+            inflow_future[:, i] = self.solver_for_inflow(stock_pre[:, i], stock[:, i], outflow[:, history_length + i])
+        inflow = np.concatenate((np.broadcast_to(inflow_history, (n_scenarios, history_length)), inflow_future), axis=1)
+        return inflow, outflow, np.concatenate((stock_history, stock), axis=1)
+
+    @instrumented('CapacityFlow.batch')
+    def batch(self, stock_future_onshore, stock_future_offshore, historical_lifetime=None, future_lifetime=None, shape=4.07):
+        """
+        Inflow, stock and outflow for a stack of demand-stock trajectories and lifetimes, computed together
+
+        :param stock_future_onshore: [n_scenarios, n] onshore stock of each future period of the time axis, see get_future_stock
+        :param stock_future_offshore: [n_scenarios, n_offshore] offshore stock of each period
+        :param historical_lifetime: mean lifetime of the historical onshore cohorts, scalar or [n_scenarios]
+        :param future_lifetime: mean lifetime of the future cohorts, scalar or [n_scenarios]
+        :param shape: Weibull shape, scalar or [n_scenarios]
+        :return: dict of inflow/stock/outflow arrays with a leading scenario axis, and their years
+        """
+        stock_future_onshore = np.atleast_2d(np.asarray(stock_future_onshore, dtype=float))
+        stock_future_offshore = np.atleast_2d(np.asarray(stock_future_offshore, dtype=float))
+        n_scenarios = len(stock_future_onshore)
+        historical_lifetime = np.broadcast_to(self.historical_lifetime if historical_lifetime is None else historical_lifetime, n_scenarios)
+        future_lifetime = np.broadcast_to(self.future_lifetime if future_lifetime is None else future_lifetime, n_scenarios)
+        inflow_history_onshore = np.asarray(self.inflow_history_onshore, dtype=float)
+        years_onshore = np.concatenate((self.years_history_onshore, self.axis.get_periods(self.axis.future_start, stock_future_onshore.shape[1])))
+        years_offshore = self.axis.get_periods(self.years_future_offshore[0], stock_future_offshore.shape[1])
+        n_onshore, n_offshore = len(years_onshore), len(years_offshore)
+
+        # make the Weibull PDF of every scenario
+        kernel_history_onshore = self.get_batch_lifetime_kernel(historical_lifetime, shape, len(inflow_history_onshore), n_onshore)
+        kernel_future_onshore = self.get_batch_lifetime_kernel(future_lifetime, shape, stock_future_onshore.shape[1], n_onshore)
+        kernel_future_offshore = self.get_batch_lifetime_kernel(future_lifetime, shape, n_offshore, n_offshore)
+
+        inflow_onshore, outflow_onshore, stock_onshore = self.solve_batch(
+            stock_future_onshore, inflow_history_onshore, kernel_history_onshore, kernel_future_onshore)
+        inflow_offshore, outflow_offshore, stock_offshore = self.solve_batch(
+            stock_future_offshore, np.zeros(0), np.zeros([n_scenarios, n_offshore]), kernel_future_offshore)
+        return {'years_onshore': years_onshore, 'inflow_onshore': inflow_onshore, 'stock_onshore': stock_onshore, 'outflow_onshore': outflow_onshore,
+                'years_offshore': years_offshore, 'inflow_offshore': inflow_offshore, 'stock_offshore': stock_offshore, 'outflow_offshore': outflow_offshore}
+
+    @instrumented('CapacityFlow')
+    def __call__(self, tech_scenario: int = 0, capacity_scenario: str = 'Gcam'):
+        """Calculate the capacity flow given the dataset"""
+        # update the capacity data
+        (stock_future_onshore, years_future_onshore, years_history_onshore, inflow_history_onshore,
+         stock_future_offshore, years_future_offshore, 
+         years_future_onshore_annual, years_future_offshore_annual) = self.update_capacity(capacity_scenario)
+    
+        # do interpolation for the future years
+        stock_future_onshore, stock_future_offshore = self.interp_annual_for_future(
+            stock_future_onshore, years_future_onshore_annual, years_future_onshore,
+            stock_future_offshore, years_future_offshore_annual, years_future_offshore,
+            capacity_scenario)
+    
+        # make the Weibull PDF
+        weibull_pdf_history_onshore, weibull_pdf_future_onshore, weibull_pdf_future_offshore = self.get_weibull_pdf(
+            years_future_onshore_annual, years_future_offshore_annual)
+    
+        if self.banded:
+            # onshore: historical inflow, then future inflow given the stock
+            inflow_onshore, outflow_onshore, stock_history_onshore, outflow_onshore_contrib = self.update_flow_banded(
+                stock_future_onshore, inflow_history_onshore, weibull_pdf_history_onshore, weibull_pdf_future_onshore)
+            inflow_future_onshore = inflow_onshore[len(years_history_onshore): ]
+            stock_onshore = np.concatenate((stock_history_onshore, stock_future_onshore))
+            # offshore: future inflow given the stock
+            inflow_offshore, outflow_offshore, _, outflow_offshore_contrib = self.update_flow_banded(
+                stock_future_offshore, weibull_pdf_future=weibull_pdf_future_offshore)
+        else:
+            (inflow_onshore, inflow_future_onshore, stock_onshore, outflow_onshore,
+             inflow_offshore, outflow_offshore, outflow_onshore_contrib, outflow_offshore_contrib) = self.update_flow_dense(
+                stock_future_onshore, years_history_onshore, inflow_history_onshore, stock_future_offshore, years_future_onshore_annual,
+                years_future_offshore_annual, weibull_pdf_history_onshore, weibull_pdf_future_onshore, weibull_pdf_future_offshore)
     
         # stock offshore
         stock_offshore = stock_future_offshore.copy()
@@ -320,5 +462,9 @@ Scenario analysis
 =================
 """
 if __name__ == '__main__':
-    capacity_flow = CapacityFlow()  
-    capacity_flow.plot(tech_scenario=0)
+    args = get_parser()
+    capacity_flow = CapacityFlow(axis=get_time_axis(end_year=args.end_year, step=args.step))
+    if args.no_plots:
+        capacity_flow.save_flows(tech_scenario=0)
+    else:
+        capacity_flow.plot(tech_scenario=0)
@@ -18,8 +18,10 @@ import math
 import collections
 from _utils import *
 from _params import get_parser
+from _results_store import save_table
+from _instrument import instrumented, span
+from _time_axis import get_time_axis
 from a_capacity_flow import CapacityFlow
-from b_onshore_material import load_avg_data, load_history_market_share, load_future_market_share, load_replacement_data
 
 """
 ================
@@ -35,84 +37,77 @@ def get_diameter(x):
     return 0.9466 * x ** 0.5872
 
 
-def capacity_offshore(tp=1, scen='GNZ'):
-    excel_path = "input_data/Wind_data.xls"
+@instrumented()
+def capacity_offshore(tp=1, scen='GNZ', inputs=None, truncation_tol=0.0, flow=None, plot=True, axis=None):
+    inputs = inputs if inputs is not None else get_model_inputs()
+    axis = axis if axis is not None else get_time_axis(inputs)
     # load nacl market share
-    history_nacl_market_share = load_history_market_share(excel_path, tp)
-    future_nacl_market_share = load_future_market_share(excel_path, tp)
-    nacl_market_share = {k: history_nacl_market_share[k] + [future_nacl_market_share[k]] * 31 \
-        for k in history_nacl_market_share.keys()}
+    nacl_market_share = inputs.market_share_series(tp, axis)
     
     # read avg_turb, avg_nacl and avg_rotor
     avg_turb_ons, avg_nacl_ons, avg_rotor_ons, \
-        avg_turb_offs, avg_nacl_offs, avg_rotor_offs = load_avg_data(excel_path)
+        avg_turb_offs, avg_nacl_offs, avg_rotor_offs = inputs.avg_series(axis)
     
     inflow_onshore, inflow_future_onshore, stock_onshore, outflow_onshore, inflow_offshore, outflow_offshore, stock_offshore, \
-                outflow_onshore_contrib, outflow_offshore_contrib, stock_onshore_contrib, stock_offshore_contrib, years_onshore, years_offshore = CapacityFlow()(tp, scen)
+                outflow_onshore_contrib, outflow_offshore_contrib, stock_onshore_contrib, stock_offshore_contrib, years_onshore, years_offshore = flow if flow is not None else CapacityFlow(
+                    inputs=inputs, banded=True, truncation_tol=truncation_tol, axis=axis)(tp, scen)
     avg_turb_offs = avg_turb_offs[len(stock_onshore_contrib) - len(stock_offshore_contrib): ]
     avg_nacl_offs = avg_nacl_offs[len(stock_onshore_contrib) - len(stock_offshore_contrib): ]
     avg_rotor_offs = avg_rotor_offs[len(stock_onshore_contrib) - len(stock_offshore_contrib): ]
     
-    stock_offshore_contrib = stock_offshore_contrib / (np.repeat(np.expand_dims(avg_turb_offs, axis=1), len(stock_offshore_contrib), axis=1) + 1e-100)
-    avg_nacl_mass = stock_offshore_contrib * np.repeat(np.expand_dims(avg_nacl_offs, axis=1), len(stock_offshore_contrib), axis=1)
-    avg_rotor_mass = stock_offshore_contrib * np.repeat(np.expand_dims(avg_rotor_offs, axis=1), len(stock_offshore_contrib), axis=1)
-    # process nacl
-    avg_nacl_mass_ = []
-    for k in ["DFIG/SCIG", "EESGDD", "PMSGDD", "PMSGGB", "PDD", "SDD"]:
-        temp = avg_nacl_mass * np.repeat(np.expand_dims(nacl_market_share[k][len(stock_onshore_contrib) - len(stock_offshore_contrib): ], axis=1), len(avg_nacl_mass), axis=1)
-        avg_nacl_mass_.append(temp)
-    avg_nacl_mass_tech = np.stack(avg_nacl_mass_, axis=-1)
-    oh_dict = load_offshore_dict(path=excel_path)
-    oh_dict_array = np.asarray(pd.DataFrame({k: oh_dict[k] for k in history_nacl_market_share.keys()}))
-    avg_nacl_mass_tech = np.dot(avg_nacl_mass_tech, oh_dict_array.T) 
-    for i in range(avg_nacl_mass_tech.shape[-1]-2, avg_nacl_mass_tech.shape[-1]):
-        avg_nacl_mass_tech[:, :, i] = avg_nacl_mass_tech[:, :, i] * np.repeat(np.expand_dims(avg_turb_offs, axis=1), len(stock_offshore_contrib), axis=1)/np.repeat(np.expand_dims(avg_nacl_offs, axis=1), len(stock_offshore_contrib), axis=1) / 1000
-    # load replacement for nacelle
-    future_nacl_rep, future_rotor_rep, his_nacl_rep, his_rotor_rep = load_replacement_data(excel_path)
-    future_nacl_rep = future_nacl_rep[tp]
-    future_rotor_rep = future_rotor_rep[tp]
-    avg_nacl_mass = avg_nacl_mass * future_nacl_rep
+    with span('offshore replacement', tp=tp, scen=scen):
+        # stock-years of each cohort [31, 1] (annual up to 2050)
+        stock_offshore_contrib = np.expand_dims(stock_offshore_contrib.sum_years(), axis=1) / axis.steps_per_year
+        stock_offshore_contrib = stock_offshore_contrib / (np.expand_dims(avg_turb_offs, axis=1) + 1e-100)
+        avg_nacl_mass = stock_offshore_contrib * np.expand_dims(avg_nacl_offs, axis=1)
+        avg_rotor_mass = stock_offshore_contrib * np.expand_dims(avg_rotor_offs, axis=1)
+        # process nacl
+        avg_nacl_mass_ = []
+        for k in ["DFIG/SCIG", "EESGDD", "PMSGDD", "PMSGGB", "PDD", "SDD"]:
+            temp = avg_nacl_mass * np.expand_dims(nacl_market_share[k][len(stock_onshore_contrib) - len(stock_offshore_contrib): ], axis=1)
+            avg_nacl_mass_.append(temp)
+        avg_nacl_mass_tech = np.stack(avg_nacl_mass_, axis=-1)
+        oh_dict = inputs.offshore_dict
+        oh_dict_array = np.asarray(pd.DataFrame({k: oh_dict[k] for k in nacl_market_share.keys()}))
+        avg_nacl_mass_tech = np.dot(avg_nacl_mass_tech, oh_dict_array.T) 
+        for i in range(avg_nacl_mass_tech.shape[-1]-2, avg_nacl_mass_tech.shape[-1]):
+            avg_nacl_mass_tech[:, :, i] = avg_nacl_mass_tech[:, :, i] * np.expand_dims(avg_turb_offs, axis=1)/np.expand_dims(avg_nacl_offs, axis=1) / 1000
+        # load replacement for nacelle
+        future_nacl_rep, future_rotor_rep, his_nacl_rep, his_rotor_rep = inputs.replacement_rates(tp)
+        avg_nacl_mass = avg_nacl_mass * future_nacl_rep
     
-    # process rotor
-    oh_dict = load_offshore_dict(path=excel_path)
-    material_list = list(oh_dict['/'].keys())
-    oh_dict_array = np.expand_dims(np.asarray([oh_dict['/'][k] for k in material_list]), axis=-1)
-    avg_rotor_mass_tech = np.dot(np.expand_dims(avg_rotor_mass, -1), oh_dict_array.T) 
-    for i in range(avg_rotor_mass_tech.shape[-1]-2, avg_rotor_mass_tech.shape[-1]):
-        avg_rotor_mass_tech[:, :, i] = avg_rotor_mass_tech[:, :, i] * np.repeat(np.expand_dims(avg_turb_offs, axis=1), len(stock_offshore_contrib), axis=1)/np.repeat(np.expand_dims(avg_rotor_offs, axis=1), len(stock_offshore_contrib), axis=1) / 1000
+        # process rotor
+        material_list = list(oh_dict['/'].keys())
+        oh_dict_array = np.expand_dims(np.asarray([oh_dict['/'][k] for k in material_list]), axis=-1)
+        avg_rotor_mass_tech = np.dot(np.expand_dims(avg_rotor_mass, -1), oh_dict_array.T) 
+        for i in range(avg_rotor_mass_tech.shape[-1]-2, avg_rotor_mass_tech.shape[-1]):
+            avg_rotor_mass_tech[:, :, i] = avg_rotor_mass_tech[:, :, i] * np.expand_dims(avg_turb_offs, axis=1)/np.expand_dims(avg_rotor_offs, axis=1) / 1000
     
-    avg_rotor_mass = np.sum(avg_rotor_mass_tech, axis=1)
-    avg_nacl_mass = np.sum(avg_nacl_mass_tech, axis=1)
+        avg_rotor_mass = np.sum(avg_rotor_mass_tech, axis=1)
+        avg_nacl_mass = np.sum(avg_nacl_mass_tech, axis=1)
 
-    # load replacement for rotor
-    avg_rotor_mass = avg_rotor_mass * future_rotor_rep
-    avg_nacl_rotor_rep_mass = avg_nacl_mass + avg_rotor_mass
+        # load replacement for rotor
+        avg_rotor_mass = avg_rotor_mass * future_rotor_rep
+        avg_nacl_rotor_rep_mass = avg_nacl_mass + avg_rotor_mass
     
     future_inflow_off = inflow_offshore.copy()
-    ratio_off = outflow_offshore_contrib.copy()
+    ratio_off = outflow_offshore_contrib
 
-    excel_path = "input_data/Wind_data.xls"
-    df = pd.read_excel(excel_path, sheet_name='off_capacity')
-    per_cap_list = df['Off_Future_capacity_per_turbine'].dropna().tolist()
+    per_cap_list = inputs.per_cap_offshore
 
     # perform the installation calculation
-    # assumptions for offshore average capacity per wind turbine
-    capacity_per_wind_20_29 = per_cap_list[0]
-    capacity_per_wind_30_39 = per_cap_list[1]
-    capacity_per_wind_40_50 = per_cap_list[2]
-    
-    oh_dict = load_offshore_dict(path="input_data/Wind_data.xls")
-    ##print(oh_dict)
-    capacity_per_wind_list = [capacity_per_wind_20_29] * 10 + [capacity_per_wind_30_39] * 10 + [capacity_per_wind_40_50] * 11   
+    # assumptions for offshore average capacity per wind turbine (2020-2029, 2030-2039, then 2040 to the end of the horizon)
+    capacity_per_wind_list = axis.expand_decades(per_cap_list[:3], years_offshore)
  
     future_c_list = future_inflow_off.copy() * 1000 # convert to kW
     future_n_list = [future_c_list[i] / capacity_per_wind_list[i] for i in range(len(future_c_list))] # number of wind turbines
     future_d_list = get_diameter(np.array(capacity_per_wind_list)) # diameter of wind turbines
     future_h_list = get_height(np.array(capacity_per_wind_list)) # height of wind turbines
     
-    time_list = [2020 + i for i in range(len(future_n_list))]
+    time_list = np.asarray(years_offshore).tolist()
     
-    future_mass_by_year = calculate_future_material_mass_offshore_by_year(future_n_list, np.array(capacity_per_wind_list), future_d_list, future_h_list, oh_dict, time_list, tp=tp)
+    future_mass = calculate_future_material_mass_offshore_by_year(future_n_list, np.array(capacity_per_wind_list), future_d_list, future_h_list, oh_dict, time_list, inputs=inputs)
+    future_mass_by_year = future_mass.sel(tp=tp).to_dict()
     import copy
 
     mass_by_year = collections.OrderedDict()
@@ -128,14 +123,15 @@ def capacity_offshore(tp=1, scen='GNZ'):
     # sort using the index
     df = df.sort_index()
     df = df / 1e6
-    df.to_csv('results/material_offshore_mass_by_year_{}_{}.csv'.format(tp, scen))
-    plot_mass_by_year(df, 'save_figs/offshore_material_{}_{}.png'.format(tp, scen), w_scale=6)
-    plt.close()
+    save_table('material_offshore', df, scen=scen, tp=tp)
+    if plot:
+        plot_mass_by_year(df, 'save_figs/offshore_material_{}_{}.png'.format(tp, scen), w_scale=6)
 
     
-    ratio_off = ratio_off / (np.expand_dims(inflow_offshore, axis=1) + 1e-100)
+    ratio_off = ratio_off.scale_rows(1 / (inflow_offshore + 1e-100))
     ratio_off = {"ratio": ratio_off,
-            "years": years_offshore}
+            "years": years_offshore,
+            "axis": axis}
     return mass_by_year, avg_nacl_rotor_rep_mass, ratio_off
 
 """
@@ -144,6 +140,7 @@ Scenario analysis
 =================
 """
 if __name__ == '__main__':
-    tp = get_parser().tp
-    scen = get_parser().scen
-    capacity_offshore(tp=tp, scen=scen)
\ No newline at end of file
+    args = get_parser()
+    tp = args.tp
+    scen = args.scen
+    capacity_offshore(tp=tp, scen=scen, plot=not args.no_plots, axis=get_time_axis(end_year=args.end_year, step=args.step))
\ No newline at end of file
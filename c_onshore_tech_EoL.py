@@ -0,0 +1,81 @@
+"""
+This script is used to calculate onshore wind turbine material outflows by technology
+
+It contains:
+- material outflows from wind turbines reaching the end of their service life, by nacelle type, tower type and
+  capacity class of their cohort (see _cohorts.TechCohorts)
+- material outflows from damaged components, replaced with the technology and masses of their own cohort
+- 2 energy demand scenarios: Gcam and GNZ
+- 3 tech development scenarios: CT, AT, NT
+
+The outflows (before the EoL treatments) are saved by material in results/onshore_EoL_tech/, one column per
+technology 'nacelle type|tower type|capacity class'. Summed over the technologies, the outflows of the wind turbines
+reaching their end of life are the ones of c_onshore_EoL; the replaced nacelles and rotors are the ones of each cohort
+instead of the fleet averages, e.g. the Nd and Dy of the permanent magnets leave with the PMSG cohorts only.
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+from _utils import *
+from _params import get_parser
+from _results_store import save_table
+from _instrument import instrumented, span
+from _time_axis import get_time_axis
+from _cohorts import get_onshore_cohorts
+from b_onshore_material import capacity_onshore
+
+"""
+================
+Define functions
+================
+"""
+# material outflows of onshore wind turbines by technology
+@instrumented()
+def get_onshore_tech_eol(tp, scen, inputs=None, material=None, plot=True, axis=None):
+    '''
+    :param material: output of capacity_onshore for (tp, scen), computed if not given
+    :param plot: save the figures, the csv files are saved in any case
+    :param axis: time axis used to compute the material if it is not given
+    :return: LabelledArray [year, nacelle, tower, capacity_class, material] outflow (t)
+    '''
+    inputs = inputs if inputs is not None else get_model_inputs()
+    _, _, ratio_on = material if material is not None else capacity_onshore(tp=tp, scen=scen, inputs=inputs, plot=plot, axis=axis)
+    # historical and future periods of the material flows
+    axis = ratio_on['axis']
+    materials = list(inputs.onshore_dict['DFIG/SCIG'])
+
+    with span('onshore cohorts by technology', tp=tp, scen=scen):
+        cohorts = get_onshore_cohorts(inputs, tp, ratio_on['inflow'], axis)
+        # material outflows from wind turbines reaching the end of their service life
+        out_flow = cohorts.outflow(ratio_on['ratio'], inputs.onshore_dict, materials)
+        # add material outflows from damaged components, in the period of their cohort as in c_onshore_EoL
+        out_flow = out_flow + cohorts.replacement(ratio_on['ratio'], axis, inputs.replacement_rates(tp), inputs.onshore_dict, materials)
+
+    year = cohorts.periods
+    technologies = cohorts.technologies()
+    for i, m in enumerate(materials):
+        df_material = pd.DataFrame(out_flow[..., i].reshape(len(year), -1) / 1e6, columns=technologies, index=year)  # Convert to megatons
+        save_table('eol_onshore_tech', df_material, scen=scen, tp=tp, material=m)
+
+    result = cohorts.to_labelled(out_flow, materials)
+    if plot:
+        # Nd and Dy outflows (t) by nacelle type
+        ree = result.sel(material=['Nd', 'Dy']).values.sum(axis=(2, 3, 4))
+        plot_outflow_by_technology(year, ree, cohorts.nacelle_types, 'save_figs/onshore_tech_REE_{}_{}.png'.format(tp, scen), ylabel='Nd and Dy [t]')
+
+    return result
+
+"""
+=================
+Scenario analysis
+=================
+"""
+if __name__ == '__main__':
+    args = get_parser()
+    tp=args.tp
+    scen=args.scen
+    get_onshore_tech_eol(tp, scen, plot=not args.no_plots, axis=get_time_axis(end_year=args.end_year, step=args.step))
@@ -0,0 +1,140 @@
+"""
+This script is used to check the import time of every module of the model against a budget
+
+It contains:
+- the cumulative import time of each module, measured with python -X importtime in a fresh interpreter
+- the heavy dependencies (pandas, scipy, matplotlib, ...) that must only be loaded when they are used
+- a table of the measurements, optionally saved as json to track them over time
+
+e.g. python check_import_time.py
+     python check_import_time.py --modules a_capacity_flow _pipeline --repeat 10 --json results/import_time.json
+
+Exits with status 1 if a module is over its budget or loads a heavy dependency at import.
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+import collections
+
+# import time budget of each module in ms, most of it is numpy
+BUDGETS = collections.OrderedDict([
+    ('_fig_settings', 50),
+    ('_instrument', 50),
+    ('_labelled', 300),
+    ('_banded', 300),
+    ('_params', 50),
+    ('_time_axis', 300),
+    ('_inputs', 300),
+    ('_input_cache', 300),
+    ('_utils', 300),
+    ('_results_store', 300),
+    ('_pipeline', 300),
+    ('_regions', 300),
+    ('_impact', 300),
+    ('_cohorts', 300),
+    ('_batch_model', 300),
+    ('a_capacity_flow', 300),
+    ('b_onshore_material', 300),
+    ('b_offshore_material', 300),
+    ('c_onshore_EoL', 300),
+    ('c_onshore_tech_EoL', 300),
+    ('c_offshore_EoL', 300),
+    ('d_onshore_env_impact', 300),
+    ('d_offshore_env_impact', 300),
+    ('d_total_env_impact', 300),
+    ('e_monte_carlo', 300),
+    ('f_sensitivity', 300),
+    ('g_regional', 300),
+    ('h_recycling_sweep', 300),
+    ('run_pipeline', 300),
+])
+
+# packages that must not be executed when a module is imported
+HEAVY_MODULES = ['pandas', 'scipy.stats', 'scipy.signal', 'scipy.linalg', 'scipy.sparse', 'matplotlib', 'seaborn', 'tqdm', 'xlrd']
+
+"""
+================
+Define functions
+================
+"""
+def get_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modules', type=str, nargs='+', default=list(BUDGETS), help='Modules to check')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of runs per module, the fastest is kept')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplier of the budgets, e.g. for a slower machine')
+    parser.add_argument('--json', type=str, default=None, help='Save the measurements to this json file')
+
+    return parser.parse_args()
+
+# parse the stderr of python -X importtime into {module: cumulative time in ms}
+def parse_importtime(stderr):
+    '''
+    :param stderr: output of python -X importtime
+    :return: {module: cumulative import time in ms}
+    '''
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+# import a module in a fresh interpreter, return its cumulative import time and the heavy packages it loaded
+def measure_module(module, repeat=5):
+    '''
+    :param module: name of the module
+    :param repeat: number of runs, the fastest is kept
+    :return: import time in ms, list of the heavy packages imported
+    '''
+    best, heavy = None, []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)],
+                              capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if proc.returncode != 0:
+            raise RuntimeError('Cannot import {}:\n{}'.format(module, proc.stderr))
+        times = parse_importtime(proc.stderr)
+        best = times[module] if best is None else min(best, times[module])
+        heavy = [m for m in HEAVY_MODULES if m in times]
+    return best, heavy
+
+# measure every module and compare with its budget
+def check_import_time(modules=BUDGETS, repeat=5, scale=1.0):
+    '''
+    :param modules: names of the modules
+    :return: {module: {'time_ms', 'budget_ms', 'heavy', 'ok'}}
+    '''
+    results = collections.OrderedDict()
+    for module in modules:
+        time_ms, heavy = measure_module(module, repeat)
+        budget = BUDGETS.get(module, max(BUDGETS.values())) * scale
+        results[module] = {'time_ms': time_ms, 'budget_ms': budget, 'heavy': heavy,
+                           'ok': time_ms <= budget and len(heavy) == 0}
+    return results
+
+"""
+=================
+Scenario analysis
+=================
+"""
+if __name__ == '__main__':
+    args = get_parser()
+    results = check_import_time(args.modules, args.repeat, args.scale)
+    print('{:<24}{:>10}{:>10}  {}'.format('module', 'ms', 'budget', 'heavy imports'))
+    for module, r in results.items():
+        print('{:<24}{:>10.1f}{:>10.0f}  {}{}'.format(module, r['time_ms'], r['budget_ms'], ', '.join(r['heavy']) or '-',
+                                                     '' if r['ok'] else '  FAIL'))
+    if args.json is not None:
+        os.makedirs(os.path.dirname(args.json) or '.', exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0 if all(r['ok'] for r in results.values()) else 1)
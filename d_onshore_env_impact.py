@@ -15,79 +15,30 @@ It contains:
 Import libraries
 ================
 """
-import math
 import collections
 
 from _utils import *
 from _params import get_parser
+from _results_store import save_table
+from _instrument import instrumented, span
+from _time_axis import aggregate_labelled, get_time_axis
+from _impact import IMPACTS, NET_IMPACTS, get_recycled_supply, get_env_impact
 from b_onshore_material import capacity_onshore
 
-"""
-=============
-prepare files
-=============
-"""
-# get environmental impact factor from excel
-def get_env_impact(path=''):
-    wb = xlrd.open_workbook(path)
-    # load existing data
-    sheet = wb.sheet_by_name('envir_impact')
-    
-    env_impact = {}
-    
-    for i in range(0, 8):
-        for j in range(1, 5):
-            col_name = sheet.cell_value(0, j)
-            if col_name not in env_impact:
-                env_impact[col_name] = {}
-            row_name = sheet.cell_value(i, 0).strip()
-            env_impact[col_name][row_name] = sheet.cell_value(i, j)
-            if isinstance(sheet.cell_value(i, j), str) and 'N/A' in sheet.cell_value(i, j):
-                env_impact[col_name][row_name] = 0
-    return env_impact
-
 """
 ================
 Define functions
 ================
 """
-# add 10 years impact together
-def aggregate_seq(seq, time):
-    seq_, time_ = [0, 0, 0, 0, 0, 0], ['1993-2000', '2000-2010', '2010-2020', '2020-2030', '2030-2040', '2040-2050']
-
-    for i in range(len(seq)):
-        if time[i] < 2000:
-            seq_[0] += seq[i]
-        elif time[i] < 2010:
-            seq_[1] += seq[i]
-        elif time[i] < 2020:
-            seq_[2] += seq[i]
-        elif time[i] < 2030:
-            seq_[3] += seq[i]
-        elif time[i] < 2040:
-            seq_[4] += seq[i]
-        else:
-            seq_[5] += seq[i]
-    return seq_, time_
-
 colors = {'Steel and iron': '#fbb4ae', 'Cu': '#b3cde3', 'Al': '#ccebc5', 'Concrete': '#decbe4', 'Composites': '#fed9a6', 'REEs': '#ffffcc'}
 
-en_consume_color = ['#deebf7', '#9ecae1', '#3182bd']
-en_consume_color_by_mat = {'Cast Iron': '#deebf7', 'Steel': '#deebf7', 'Nd': '#deebf7', 'Dy': '#deebf7', 'Composites': '#deebf7'}
-en_save_color = ['#e5f5e0', '#a1d99b', '#31a354']
-en_save_color_by_mat = {'Cast Iron': '#e5f5e0', 'Steel': '#e5f5e0', 'Nd': '#e5f5e0', 'Dy': '#e5f5e0', 'Composites': '#e5f5e0'}
-
-co2_consume_color = ['#fde0dd', '#fa9fb5', '#c51b8a']
-co2_consume_color_by_mat = {'Cast Iron': '#fde0dd', 'Steel': '#fde0dd', 'Nd': '#fde0dd', 'Dy': '#fde0dd', 'Composites': '#fde0dd'}
-co2_save_color = ['#fff7bc', '#fec44f', '#d95f0e']
-co2_save_color_by_mat = {'Cast Iron': '#fff7bc', 'Steel': '#fff7bc', 'Nd': '#fff7bc', 'Dy': '#fff7bc', 'Composites': '#fff7bc'}
-
 # calculate the onshore wind turbine material production environmental impact
-def get_onshore_env_impact(tp, scen):
-    excel_path = "input_data/Wind_data.xls"
-    env_impact = get_env_impact(path=excel_path)
+@instrumented()
+def get_onshore_env_impact(tp, scen, inputs=None, material=None, plot=True, axis=None, edges=None):
+    inputs = inputs if inputs is not None else get_model_inputs()
+    env_impact = inputs.env_impact
 
-    mass_by_year, avg_nacl_rotor_rep_mass, ratio_on = capacity_onshore(tp=tp, scen=scen)
+    mass_by_year, avg_nacl_rotor_rep_mass, ratio_on = material if material is not None else capacity_onshore(tp=tp, scen=scen, inputs=inputs, plot=plot, axis=axis)
     year = [k for k in mass_by_year]
     materials = [m for m in mass_by_year[year[0]]]
     mass_by_year_rep = {}
@@ -104,179 +55,79 @@ def get_onshore_env_impact(tp, scen):
     df = df.sort_index()
     
     ratio_on_arr = ratio_on['ratio'] # r[i, j] means the ratio from year i to year j
-    out_flow_on_material = np.dot(ratio_on_arr.transpose(), df.values) + avg_nacl_rotor_rep_mass
-    
-    for i in range(len(df.columns)):
-        mass = df.columns[i]
-        #print('Material for {} is {}'.format(mass, out_flow_on_material[i]))
-    
-    path = "input_data/Wind_data.xls"
-    table, proc_methods = get_data_from_recy_new(path=path)
-    
-    results = {}
-    for k in table.keys():
-        if 'off_shore' in k:
-            continue
-        
-        t_type = k.split('_onshore')[0]
-        
-        results[t_type] = {}
-        
-        for i, m in enumerate(df.columns):
-            recy = np.asarray(table[k][m])# [m]
-            out_flow_m = out_flow_on_material[:, i] # [n]
-            
-            out_flow_m = np.dot(out_flow_m.reshape(-1, 1), recy.reshape(1, -1)) # [n, m]
-            results[t_type][m] = out_flow_m
-            # #print outflow m
-            #print('Outflow for {} is {} on strategy {}'.format(m, out_flow_m, t_type))
+    out_flow_on_material = ratio_on_arr.dot_cohorts(df.values) + avg_nacl_rotor_rep_mass
     
-    en_fig, en_ax = plt.subplots(figsize=(2.1*FIG_WIDTH, 2.1*FIG_HEIGHT))
-    co2_fig, co2_ax = plt.subplots(figsize=(2*FIG_WIDTH, 2*FIG_HEIGHT))
-
-    strategy_list = results.keys()
-    strategy_list = [s for s in strategy_list if 'offshore' not in s]
+    table = inputs.recy_table
+    # EoL strategies of the onshore wind turbines and their closed-loop recycling rate of each material
+    strategy_list, shares = get_strategy_tensor(table, 'onshore', df.columns)
+    closed_loop = shares[..., 0] # [strategy, m]
 
     export_results = collections.OrderedDict()
-    
-    for si, sn in enumerate(strategy_list):
-
-        en_consume, en_save = 0, 0
-        co2_consume, co2_save = 0, 0
-        
-        en_consume_by_mat, en_save_by_mat = {}, {}
-        co2_consume_by_mat, co2_save_by_mat = {}, {}
-
-        for i, m in enumerate(mass_by_year_rep[1993]):
-            
-            mass = np.asarray([mass_by_year_rep[y][m] for y in mass_by_year_rep])
-            
-            recy_list = results[sn][m][:, 0]
-
-            for k in range(len(recy_list)):
-                if recy_list[k] > mass[k]:
-                    recy_list[k + 1] += recy_list[k] - mass[k]
-                    recy_list[k] = mass[k]
-            
-            inflow = mass 
-            
-            if m == 'Cast Iron':
-                m_conv = 'Steel and iron'
-            elif m == 'Steel':
-                m_conv = 'Steel and iron'
-            elif m == 'Nd' or m == 'Dy':
-                m_conv = 'REEs'
-            elif 'Composites' in m:
-                m_conv = 'Composites'
-            elif m == 'Others' or 'Other' in m:
-                continue
-            else:
-                m_conv = m
-                
-            coef = env_impact['Energy_consumption(MJ kg-1)'][m_conv]
-            en_consume += np.array(inflow) * coef / 1e6  # Convert to PJ
-            if m_conv != 'EE':
-                en_consume_by_mat[m_conv] = np.array(inflow) * coef / 1e6 if m_conv not in en_consume_by_mat else en_consume_by_mat[m_conv] + np.array(inflow) * coef / 1e6
-            
-            coef = env_impact['Energy_saved (MJ kg-1)'][m_conv]
-            en_save += np.array(recy_list) * coef / 1e6  # Convert to PJ
-            if m_conv != 'EE':
-                en_save_by_mat[m_conv] = np.array(recy_list) * coef / 1e6 if m_conv not in en_save_by_mat else en_save_by_mat[m_conv] + np.array(recy_list)* coef / 1e6
-            
-            coef = env_impact['CO2_emission (kg)'][m_conv]
-            co2_consume += np.array(inflow) * coef / 1e6  # Convert to Mt
-            if m_conv != 'EE':
-                co2_consume_by_mat[m_conv] = np.array(inflow) * coef / 1e6 if m_conv not in co2_consume_by_mat else co2_consume_by_mat[m_conv] + np.array(inflow) * coef / 1e6
-            
-            coef = env_impact['CO2_reduction(kg)'][m_conv]
-            co2_save += np.array(recy_list) * coef / 1e6  # Convert to Mt
-            if m_conv != 'EE':
-                co2_save_by_mat[m_conv] = np.array(recy_list) * coef / 1e6 if m_conv not in co2_save_by_mat else co2_save_by_mat[m_conv] + np.array(recy_list) * coef / 1e6
-        
-        # export env impact to csv
-        df = {'Energy consumption': en_consume, 'Energy saved': en_save, 'CO2 emission': co2_consume, 'CO2 saved': co2_save}
-        for m in en_consume_by_mat:
-            df[m + '_Energy consumption'] = en_consume_by_mat[m]
-            df[m + '_Energy saved'] = en_save_by_mat[m]
-            df[m + '_CO2 emission'] = co2_consume_by_mat[m]
-            df[m + '_CO2 saved'] = co2_save_by_mat[m]
-        df = pd.DataFrame(df, index=time_list)
-        df.to_csv('results/onshore_env_impact_{}_{}_{}.csv'.format(sn, tp, scen))
 
-        # energy consumption and saving/reduction
-        en_consume = aggregate_seq(en_consume, time_list)[0]
-        en_save = aggregate_seq(en_save, time_list)[0]
-        en_consume_by_mat = {k: aggregate_seq(v, time_list)[0] for k, v in en_consume_by_mat.items()}
-        en_save_by_mat = {k: aggregate_seq(v, time_list)[0] for k, v in en_save_by_mat.items()}
-        en_net = np.array(en_consume) - np.array(en_save)
-        en_net_by_mat = {k: np.array(en_consume_by_mat[k]) - np.array(en_save_by_mat[k]) for k in en_consume_by_mat.keys()}
-        
-        en_consume_mean_by_mat = {k: -np.mean(en_consume_by_mat[k]) for k in en_consume_by_mat.keys()}
-        # sort key by mean value
-        en_consume_by_mat = {k: v for k, v in sorted(en_consume_by_mat.items(), key=lambda item: en_consume_mean_by_mat[item[0]])}
+    with span('onshore env impact accumulation', tp=tp, scen=scen):
+        # recycled mass exceeding the demand of a year is used the next year
+        inflow = df.values
+        recycled, bank = get_recycled_supply(out_flow_on_material, closed_loop, inflow, carry_over=True)
+        # unused recycled mass left in the scrap bank at the end of each year, in Mt
+        scrap_bank = LabelledArray(bank / 1e6, ('strategy', 'year', 'material'), {'strategy': strategy_list, 'year': time_list, 'material': list(df.columns)})
+        impact = get_env_impact(inflow, recycled, df.columns, env_impact, strategy_list, time_list)
+        # the EE are only part of the totals
+        by_mat = [c for c in impact.coords['category'] if c != 'EE']
+        # sum of the periods of each decade, for every strategy, material group and impact at once
+        buckets = aggregate_labelled(impact, edges)
+        time_agg = buckets.coords['year']
+
+        for sn in strategy_list:
+            impact_sn = impact.sel(strategy=sn)
+            total = impact_sn.sum('category')
+            en_consume, en_save, co2_consume, co2_save = [total.sel(impact=k).values for k in IMPACTS]
+            en_consume_by_mat = {m: impact_sn.sel(category=m, impact='Energy consumption').values for m in by_mat}
+            en_save_by_mat = {m: impact_sn.sel(category=m, impact='Energy saved').values for m in by_mat}
+            co2_consume_by_mat = {m: impact_sn.sel(category=m, impact='CO2 emission').values for m in by_mat}
+            co2_save_by_mat = {m: impact_sn.sel(category=m, impact='CO2 saved').values for m in by_mat}
+
+            # export env impact to csv
+            df = {'Energy consumption': en_consume, 'Energy saved': en_save, 'CO2 emission': co2_consume, 'CO2 saved': co2_save}
+            for m in en_consume_by_mat:
+                df[m + '_Energy consumption'] = en_consume_by_mat[m]
+                df[m + '_Energy saved'] = en_save_by_mat[m]
+                df[m + '_CO2 emission'] = co2_consume_by_mat[m]
+                df[m + '_CO2 saved'] = co2_save_by_mat[m]
+            df = pd.DataFrame(df, index=time_list)
+            save_table('env_impact_onshore', df, scen=scen, tp=tp, strategy=sn)
+            save_table('scrap_bank_onshore', scrap_bank.sel(strategy=sn).to_frame(), scen=scen, tp=tp, strategy=sn)
+
+            # energy consumption and saving/reduction, by decade (or the buckets given by edges)
+            impact_sn = buckets.sel(strategy=sn)
+            total = impact_sn.sum('category')
+            en_consume, en_save, co2_consume, co2_save, en_net, co2_net = [total.sel(impact=k).values for k in IMPACTS + NET_IMPACTS]
+            agg_by_mat = {k: {m: impact_sn.sel(category=m, impact=k).values for m in by_mat} for k in IMPACTS + NET_IMPACTS}
+            en_consume_by_mat, en_save_by_mat, en_net_by_mat = agg_by_mat['Energy consumption'], agg_by_mat['Energy saved'], agg_by_mat['Energy net']
         
-        # climate change impact and saving/reduction
-        co2_consume = aggregate_seq(co2_consume, time_list)[0]
-        co2_save, time_agg = aggregate_seq(co2_save, time_list)
-        co2_save_by_mat = {k: aggregate_seq(v, time_list)[0] for k, v in co2_save_by_mat.items()}
-        co2_consume_by_mat = {k: aggregate_seq(v, time_list)[0] for k, v in co2_consume_by_mat.items()}
-        co2_net = np.array(co2_consume) - np.array(co2_save)
-        co2_net_by_mat = {k: np.array(co2_consume_by_mat[k]) - np.array(co2_save_by_mat[k]) for k in co2_consume_by_mat.keys()}
+            en_consume_mean_by_mat = {k: -np.mean(en_consume_by_mat[k]) for k in en_consume_by_mat.keys()}
+            # sort key by mean value
+            en_consume_by_mat = {k: v for k, v in sorted(en_consume_by_mat.items(), key=lambda item: en_consume_mean_by_mat[item[0]])}
         
-        co2_consume_mean_by_mat = {k: -np.mean(co2_consume_by_mat[k]) for k in co2_consume_by_mat.keys()}
-        # sort key by mean value
-        co2_consume_by_mat = {k: v for k, v in sorted(co2_consume_by_mat.items(), key=lambda item: co2_consume_mean_by_mat[item[0]])}
+            # climate change impact and saving/reduction
+            co2_consume_by_mat, co2_save_by_mat, co2_net_by_mat = agg_by_mat['CO2 emission'], agg_by_mat['CO2 saved'], agg_by_mat['CO2 net']
         
-        res_i = {'en_consume': en_consume, 'en_save': en_save, 'en_net': en_net, 'co2_consume': co2_consume, 'co2_save': co2_save, 'co2_net': co2_net}
-        res_i.update({'en_consume_by_mat': en_consume_by_mat, 'en_save_by_mat': en_save_by_mat, 'en_net_by_mat': en_net_by_mat})
-        res_i.update({'co2_consume_by_mat': co2_consume_by_mat, 'co2_save_by_mat': co2_save_by_mat, 'co2_net_by_mat': co2_net_by_mat})
-        export_results[sn] = res_i
+            co2_consume_mean_by_mat = {k: -np.mean(co2_consume_by_mat[k]) for k in co2_consume_by_mat.keys()}
+            # sort key by mean value
+            co2_consume_by_mat = {k: v for k, v in sorted(co2_consume_by_mat.items(), key=lambda item: co2_consume_mean_by_mat[item[0]])}
         
-        # plot energy
-        
-        bar_width = 1 / (len(strategy_list)) * 0.8
-        ax = en_ax
-        bottom = [0 for _ in range(len(time_agg))]
-        for m in en_consume_by_mat:
-            ax.bar(np.arange(len(time_agg)) - si * bar_width, bottom=bottom, height=en_net_by_mat[m], color=colors[m], label='{} ({})'.format(m, sn), width=bar_width, alpha=0.5 + 0.5 * si)
-            bottom = [bottom[j] + en_net_by_mat[m][j] for j in range(len(time_agg))]
-       
-        ax.set_xticks(np.arange(len(time_agg)) - bar_width/2)
-        ax.set_xticklabels(time_agg)
-        ax.set_ylabel('Energy (PJ)',fontsize=18)
-        ax.set_xlabel('Year', fontsize=18)
-        ax.legend(loc='upper left',fontsize=12)
-        ax.tick_params(axis='y', labelsize=16) 
-        ax.tick_params(axis='x', labelsize=12)
-        leg = ax.get_legend()
-        leg.get_frame().set_linewidth(0.0)
-
-        # plot CO2
-        ax = co2_ax
-        bottom = [0 for _ in range(len(time_agg))]
-        for m in co2_consume_by_mat:
-            ax.bar(np.arange(len(time_agg)) - si * bar_width, bottom=bottom, height=co2_net_by_mat[m], color=colors[m], label='{} ({})'.format(m, sn), width=bar_width, alpha=0.5 + 0.5 * si)
-            bottom = [bottom[j] + co2_net_by_mat[m][j] for j in range(len(time_agg))]
-        
-        ax.set_xticks(np.arange(len(time_agg)) - bar_width/2)
-        ax.set_xticklabels(time_agg)
-        ax.set_ylabel('Mt CO₂e',fontsize=18)
-        ax.set_xlabel('Year', fontsize=18)
-        ax.legend(loc='upper left',fontsize=12)
-        ax.tick_params(axis='y', labelsize=16) 
-        ax.tick_params(axis='x', labelsize=12) 
-        leg = ax.get_legend()
-        leg.get_frame().set_linewidth(0.0)
-        
-    # save en_axes to figure
-    en_fig.tight_layout()
-    en_fig.savefig('save_figs/onshore_energy_{}_{}.png'.format(tp, scen))
-    
-    co2_fig.tight_layout()
-    co2_fig.savefig('save_figs/onshore_co2_{}_{}.png'.format(tp, scen))
-    plt.close()
+            res_i = {'en_consume': en_consume, 'en_save': en_save, 'en_net': en_net, 'co2_consume': co2_consume, 'co2_save': co2_save, 'co2_net': co2_net}
+            res_i.update({'en_consume_by_mat': en_consume_by_mat, 'en_save_by_mat': en_save_by_mat, 'en_net_by_mat': en_net_by_mat})
+            res_i.update({'co2_consume_by_mat': co2_consume_by_mat, 'co2_save_by_mat': co2_save_by_mat, 'co2_net_by_mat': co2_net_by_mat})
+            export_results[sn] = res_i
+
+    if plot:
+        plot_env_impact(export_results, strategy_list, time_agg, colors, 'save_figs/onshore_energy_{}_{}.png'.format(tp, scen),
+                        'save_figs/onshore_co2_{}_{}.png'.format(tp, scen), scale_en=2.1, scale_co2=2)
     
     export_results['time_agg'] = time_agg
+    # every strategy, year, material group and impact
+    export_results['impact'] = impact
+    export_results['scrap_bank'] = scrap_bank
     
     return export_results
 
@@ -289,4 +140,4 @@ if __name__ == '__main__':
     args = get_parser()
     tp = args.tp
     scen = args.scen
-    get_onshore_env_impact(tp, scen)
+    get_onshore_env_impact(tp, scen, inputs=get_model_inputs(strategies=args.strategies), plot=not args.no_plots, axis=get_time_axis(end_year=args.end_year, step=args.step))
@@ -0,0 +1,142 @@
+"""
+This script is used to propagate the parameter uncertainty through the whole model by Monte Carlo
+
+It contains:
+- sampling of the model parameters (Weibull shape, lifetimes, dimension regressions, mass power laws,
+  material intensities, impact factors) from user-specified distributions
+- evaluation of every draw in one vectorized batch (see _batch_model.BatchModel)
+- mean and percentile bands of the capacity flows, material demand, EoL flows and energy/CO2 impact
+
+e.g. python e_monte_carlo.py --tp 0 --scen GNZ --n 5000 --spec my_distributions.json
+
+The spec is a json file {parameter: [distribution, *arguments]}, the parameters not listed keep their
+point estimate (python e_monte_carlo.py --list prints them with their nominal value):
+- ["fixed", value]
+- ["normal", mean, standard deviation]
+- ["lognormal", mean, sigma] of the underlying normal distribution
+- ["uniform", low, high]
+- ["triangular", low, mode, high]
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+import os
+import json
+import argparse
+import numpy as np
+
+from _utils import pd
+from _batch_model import BatchModel
+import _time_axis
+
+DISTRIBUTIONS = {
+    'fixed': lambda rng, n, value: np.full(n, float(value)),
+    'normal': lambda rng, n, mean, std: rng.normal(mean, std, n),
+    'lognormal': lambda rng, n, mean, sigma: rng.lognormal(mean, sigma, n),
+    'uniform': lambda rng, n, low, high: rng.uniform(low, high, n),
+    'triangular': lambda rng, n, low, mode, high: rng.triangular(low, mode, high, n),
+}
+
+# used when no spec is given: +-10% on the lifetimes and Weibull shape, 5% on the regressions and 10% on the intensities
+EXAMPLE_SPEC = {
+    'weibull_shape': ['uniform', 3.66, 4.48],
+    'historical_lifetime': ['triangular', 18, 20, 22],
+    'future_lifetime': ['triangular', 18, 20, 22],
+    'onshore_height_coef': ['normal', 4.1099, 0.2055],
+    'onshore_diameter_coef': ['normal', 2.1464, 0.1073],
+    'offshore_height_coef': ['normal', 5.0679, 0.2534],
+    'offshore_diameter_coef': ['normal', 0.9466, 0.0473],
+    'nacelle_mass_coef': ['lognormal', np.log(0.0091), 0.05],
+    'tower_mass_coef': ['lognormal', np.log(0.0176), 0.05],
+    'rotor_mass_coef': ['lognormal', np.log(0.0035), 0.05],
+    'material_intensity.Steel': ['lognormal', 0, 0.1],
+    'material_intensity.Concrete': ['lognormal', 0, 0.1],
+    'material_intensity.Composites': ['lognormal', 0, 0.1],
+    'material_intensity.Nd': ['lognormal', 0, 0.1],
+    'material_intensity.Dy': ['lognormal', 0, 0.1],
+}
+
+PERCENTILES = [5, 50, 95]
+
+"""
+================
+Define functions
+================
+"""
+def get_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tp', type=int, default=0, help='The time period tp')
+    parser.add_argument('--scen', type=str, default='Gcam', choices=['Gcam', 'GNZ'])
+    parser.add_argument('--n', type=int, default=1000, help='Number of Monte Carlo draws')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--spec', type=str, default=None, help='json file {parameter: [distribution, *arguments]}, an example spec is used if not given')
+    parser.add_argument('--chunk', type=int, default=256, help='Number of draws evaluated together')
+    parser.add_argument('--truncation-tol', type=float, default=0.0, help='Tail mass of the lifetime pdfs dropped from the cohort bands, 0 keeps every non-zero age')
+    parser.add_argument('--list', action='store_true', help='Print the parameters and their nominal value and exit')
+    _time_axis.add_arguments(parser)
+
+    return parser.parse_args()
+
+# draw n samples of every parameter of the spec
+def sample_parameters(spec, n, seed=0):
+    '''
+    :param spec: {parameter: [distribution, *arguments]}
+    :param n: number of draws
+    :param seed: seed of the random generator
+    :return: {parameter: [n] samples}
+    '''
+    rng = np.random.default_rng(seed)
+    samples = {}
+    for name, dist in spec.items():
+        if dist[0] not in DISTRIBUTIONS:
+            raise ValueError('Unknown distribution {} for {} (available: {})'.format(dist[0], name, ', '.join(DISTRIBUTIONS)))
+        samples[name] = DISTRIBUTIONS[dist[0]](rng, n, *dist[1:])
+    return samples
+
+# mean and percentiles over the samples, one row per label of the other dims
+def summarize(array, percentiles=PERCENTILES):
+    '''
+    :param array: LabelledArray with 'sample' as first dim
+    :return: DataFrame indexed by the labels of the other dims
+    '''
+    dims = array.dims[1:]
+    values = array.values.reshape(array.shape[0], -1)
+    stats = {'mean': values.mean(axis=0)}
+    for q, v in zip(percentiles, np.percentile(values, percentiles, axis=0)):
+        stats['p{}'.format(q)] = v
+    index = pd.MultiIndex.from_product([array.coords[d] for d in dims], names=dims)
+    return pd.DataFrame(stats, index=index)
+
+# sample the parameters, run the model and save the summary of each output
+def run_monte_carlo(tp, scen, spec, n, seed=0, chunk_size=256, inputs=None, save=True, axis=None, truncation_tol=0.0):
+    model = BatchModel(tp, scen, inputs=inputs, axis=axis, truncation_tol=truncation_tol)
+    results = model.run(sample_parameters(spec, n, seed), n=n, chunk_size=chunk_size)
+    summary = {k: summarize(v) for k, v in results.items()}
+    if save:
+        os.makedirs('results/monte_carlo', exist_ok=True)
+        for k, df in summary.items():
+            df.to_csv('results/monte_carlo/{}_{}_{}.csv'.format(k, tp, scen))
+    return results, summary
+
+"""
+=================
+Scenario analysis
+=================
+"""
+if __name__ == '__main__':
+    args = get_parser()
+    if args.list:
+        for k, v in BatchModel(args.tp, args.scen).nominal().items():
+            print(k, v)
+    else:
+        if args.spec is None:
+            spec = EXAMPLE_SPEC
+        else:
+            with open(args.spec) as f:
+                spec = json.load(f)
+        run_monte_carlo(args.tp, args.scen, spec, args.n, seed=args.seed, chunk_size=args.chunk,
+                        axis=_time_axis.get_time_axis(end_year=args.end_year, step=args.step), truncation_tol=args.truncation_tol)
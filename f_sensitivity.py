@@ -0,0 +1,203 @@
+"""
+This script is used to rank the model parameters by their influence on the model outputs
+
+It contains:
+- Saltelli sample design and Sobol first-order/total-order indices
+- Morris elementary effects (mu, mu*, sigma)
+- outputs: annual Nd and Dy demand (onshore + offshore) and net energy/CO2 (production minus closed-loop recycling savings)
+
+Every design is evaluated in batches through the capacity -> material -> EoL -> impact chain (see _batch_model.BatchModel).
+
+e.g. python f_sensitivity.py --method sobol --tp 0 --scen GNZ --n 512
+     python f_sensitivity.py --method morris --params weibull_shape future_lifetime recycling_rate --rel 0.2
+
+The parameters vary uniformly within +-rel of their point estimate, the recycling rates and market shares within
++-rel in absolute terms clipped to [0, 1] (so that a zero rate is varied too), or within the bounds of a json spec {parameter: [low, high]}.
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+import os
+import json
+import argparse
+import numpy as np
+
+from _utils import pd
+from _batch_model import BatchModel, STRATEGIES
+import _time_axis
+
+# parameters (names or prefixes) analysed by default
+DEFAULT_PARAMETERS = ['weibull_shape', 'historical_lifetime', 'future_lifetime', 'nacelle_share_onshore.', 'nacelle_share_offshore.',
+                      'recycling_rate.', 'energy_consumption.', 'energy_saved.', 'co2_emission.', 'co2_reduction.']
+
+# parameters varied by an absolute range limited to [0, 1]
+FRACTIONS = ['nacelle_share_onshore.', 'nacelle_share_offshore.', 'recycling_rate.']
+
+"""
+================
+Define functions
+================
+"""
+def get_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tp', type=int, default=0, help='The time period tp')
+    parser.add_argument('--scen', type=str, default='Gcam', choices=['Gcam', 'GNZ'])
+    parser.add_argument('--method', type=str, default='sobol', choices=['sobol', 'morris'])
+    parser.add_argument('--n', type=int, default=256, help='Base sample size (rounded up to a power of 2) for sobol, number of trajectories for morris')
+    parser.add_argument('--levels', type=int, default=4, help='Number of grid levels for morris')
+    parser.add_argument('--params', type=str, nargs='+', default=DEFAULT_PARAMETERS, help='Parameters (names or prefixes) to vary')
+    parser.add_argument('--rel', type=float, default=0.1, help='Relative range around the point estimate, absolute for the recycling rates and market shares')
+    parser.add_argument('--spec', type=str, default=None, help='json file {parameter: [low, high]}, overrides --params and --rel')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk', type=int, default=256, help='Number of samples evaluated together')
+    _time_axis.add_arguments(parser)
+
+    return parser.parse_args()
+
+# uniform ranges of the parameters matching the names or prefixes, constant parameters are left out
+def get_bounds(nominal, names, rel=0.1):
+    '''
+    :param nominal: {parameter: point estimate}
+    :param names: parameter names or prefixes
+    :param rel: relative half-width of the range, absolute half-width for the FRACTIONS
+    :return: {parameter: (low, high)}
+    '''
+    bounds = {}
+    for name in names:
+        matches = [k for k in nominal if k == name or k.startswith(name)]
+        if len(matches) == 0:
+            raise ValueError('Unknown parameter: {}'.format(name))
+        for k in matches:
+            if any(k.startswith(f) for f in FRACTIONS):
+                low, high = max(nominal[k] - rel, 0.0), min(nominal[k] + rel, 1.0)
+            else:
+                low, high = sorted([nominal[k] * (1 - rel), nominal[k] * (1 + rel)])
+            if high > low:
+                bounds[k] = (low, high)
+    return bounds
+
+# scale points of the unit hypercube to the parameter bounds
+def scale_to_bounds(unit, bounds):
+    low, high = np.asarray(list(bounds.values())).T
+    return {k: v for k, v in zip(bounds, (low + unit * (high - low)).T)}
+
+# outputs analysed, each [S, year]
+def get_outputs(results):
+    material = results['material_onshore'].values.copy()
+    material[:, -results['material_offshore'].shape[1]:] += results['material_offshore'].values
+    materials = results['material_onshore'].coords['material']
+    impact = results['impact_total']
+    outputs = {'Nd demand': material[:, :, materials.index('Nd')], 'Dy demand': material[:, :, materials.index('Dy')]}
+    for k, s in enumerate(STRATEGIES):
+        values = impact.values[:, k]
+        outputs['net energy ({})'.format(s)] = values[:, :, impact.index('impact', 'Energy consumption')] - values[:, :, impact.index('impact', 'Energy saved')]
+        outputs['net CO2 ({})'.format(s)] = values[:, :, impact.index('impact', 'CO2 emission')] - values[:, :, impact.index('impact', 'CO2 saved')]
+    return outputs, impact.coords['year']
+
+# Saltelli design: matrices A, B and A with column i taken from B, in the unit hypercube
+def saltelli_design(k, n, seed=0):
+    '''
+    :param k: number of parameters
+    :param n: base sample size, rounded up to a power of 2
+    :return: [(k + 2) * n, k] samples ordered as A, B, AB_1, ..., AB_k
+    '''
+    from scipy.stats import qmc
+    base = qmc.Sobol(d=2 * k, scramble=True, seed=seed).random_base2(int(np.ceil(np.log2(n))))
+    a, b = base[:, :k], base[:, k:]
+    ab = np.repeat(a[None], k, axis=0)
+    ab[np.arange(k), :, np.arange(k)] = b[:, np.arange(k)].T
+    return np.concatenate([a, b, ab.reshape(-1, k)], axis=0)
+
+# first-order (Saltelli 2010) and total-order (Jansen) indices
+def sobol_indices(y, k):
+    '''
+    :param y: [(k + 2) * n, ...] outputs of the saltelli design
+    :return: S1, ST, each [k, ...], nan where the output does not vary
+    '''
+    n = len(y) // (k + 2)
+    ya, yb, yab = y[:n], y[n:2 * n], y[2 * n:].reshape((k, n) + y.shape[1:])
+    var = np.var(np.concatenate([ya, yb]), axis=0)
+    var = np.where(var > 0, var, np.nan)
+    s1 = np.mean(yb[None] * (yab - ya[None]), axis=1) / var
+    st = 0.5 * np.mean((ya[None] - yab) ** 2, axis=1) / var
+    return s1, st
+
+# Morris trajectories on a grid of the unit hypercube, one parameter moving by delta at each step
+def morris_design(k, r, levels=4, seed=0):
+    '''
+    :param k: number of parameters
+    :param r: number of trajectories
+    :param levels: number of grid levels
+    :return: [r * (k + 1), k] samples, the parameter moved at each step [r, k] and its step (+-delta) [r, k]
+    '''
+    rng = np.random.default_rng(seed)
+    delta = levels / (2 * (levels - 1))
+    x = rng.integers(0, levels // 2, [r, k]) / (levels - 1)
+    # start from the upper half for the parameters moving down
+    sign = rng.choice([-1.0, 1.0], [r, k])
+    x = np.where(sign > 0, x, x + delta)
+    order = np.argsort(rng.random([r, k]), axis=1)
+    points = [x.copy()]
+    for j in range(k):
+        x[np.arange(r), order[:, j]] += sign[np.arange(r), order[:, j]] * delta
+        points.append(x.copy())
+    steps = np.take_along_axis(sign, order, axis=1) * delta
+    return np.stack(points, axis=1).reshape(-1, k), order, steps
+
+# mean, mean of the absolute values and standard deviation of the elementary effects
+def morris_indices(y, order, steps):
+    '''
+    :param y: [r * (k + 1), ...] outputs of the morris design
+    :return: mu, mu_star, sigma, each [k, ...] in output units per unit range of the parameter
+    '''
+    r, k = order.shape
+    y = y.reshape((r, k + 1) + y.shape[1:])
+    effects = np.zeros((r, k) + y.shape[2:])
+    for t in range(r):
+        effects[t, order[t]] = np.diff(y[t], axis=0) / steps[t].reshape((-1,) + (1,) * (y.ndim - 2))
+    return effects.mean(axis=0), np.abs(effects).mean(axis=0), effects.std(axis=0)
+
+# build the design, run the model and compute the indices of every output and year
+def run_sensitivity(tp, scen, method='sobol', n=256, bounds=None, names=DEFAULT_PARAMETERS, rel=0.1, levels=4, seed=0,
+                    chunk_size=256, inputs=None, save=True, axis=None):
+    model = BatchModel(tp, scen, inputs=inputs, axis=axis)
+    bounds = bounds if bounds is not None else get_bounds(model.nominal(), names, rel)
+    k = len(bounds)
+    if method == 'sobol':
+        unit = saltelli_design(k, n, seed)
+    else:
+        unit, order, steps = morris_design(k, n, levels, seed)
+    outputs, years = get_outputs(model.run(scale_to_bounds(unit, bounds), n=len(unit), chunk_size=chunk_size))
+
+    frames = []
+    for name, y in outputs.items():
+        if method == 'sobol':
+            indices = dict(zip(['S1', 'ST'], sobol_indices(y, k)))
+        else:
+            indices = dict(zip(['mu', 'mu_star', 'sigma'], morris_indices(y, order, steps)))
+        index = pd.MultiIndex.from_product([[name], years, list(bounds)], names=['output', 'year', 'parameter'])
+        frames.append(pd.DataFrame({c: v.T.ravel() for c, v in indices.items()}, index=index))
+    df = pd.concat(frames)
+    if save:
+        os.makedirs('results/sensitivity', exist_ok=True)
+        df.to_csv('results/sensitivity/{}_{}_{}.csv'.format(method, tp, scen))
+    return df
+
+"""
+=================
+Scenario analysis
+=================
+"""
+if __name__ == '__main__':
+    args = get_parser()
+    bounds = None
+    if args.spec is not None:
+        with open(args.spec) as f:
+            bounds = {k: tuple(v) for k, v in json.load(f).items()}
+    run_sensitivity(args.tp, args.scen, method=args.method, n=args.n, bounds=bounds, names=args.params, rel=args.rel,
+                    levels=args.levels, seed=args.seed, chunk_size=args.chunk,
+                    axis=_time_axis.get_time_axis(end_year=args.end_year, step=args.step))
@@ -0,0 +1,104 @@
+"""
+This script is used to run the model of several regions (provinces, countries) side by side in one vectorized batch
+
+It contains:
+- loading of a regional input package, one workbook per region (see _regions.load_regional_inputs)
+- evaluation of every region at once (see _batch_model.BatchModel), at the point estimates or for Monte Carlo draws
+- national (or any group) totals of the capacity flows, material demand, EoL flows and energy/CO2 impact, summed over the regions
+
+e.g. python g_regional.py --regions input_data/regions --tp 0 --scen GNZ
+     python g_regional.py --regions input_data/regions --n 1000 --spec my_distributions.json
+
+The regional results are saved in results/regions/ and the group totals in results/regions/totals/.
+With --spec the Monte Carlo draws are shared by the regions, and the mean and percentiles are saved (see e_monte_carlo).
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+import os
+import json
+import argparse
+
+from _utils import pd
+from _batch_model import BatchModel
+from _regions import read_manifest, load_regional_inputs, get_group_totals
+from e_monte_carlo import sample_parameters, summarize
+import _time_axis
+
+"""
+================
+Define functions
+================
+"""
+def get_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--regions', type=str, required=True, help='Folder of the regional input package')
+    parser.add_argument('--tp', type=int, default=0, help='The time period tp')
+    parser.add_argument('--scen', type=str, default='Gcam', choices=['Gcam', 'GNZ'])
+    parser.add_argument('--spec', type=str, default=None, help='json file {parameter: [distribution, *arguments]}, the point estimates are used if not given')
+    parser.add_argument('--n', type=int, default=1000, help='Number of Monte Carlo draws (with --spec)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk', type=int, default=64, help='Number of draws evaluated together, for every region')
+    parser.add_argument('--list', action='store_true', help='Print the regions and the groups of the package and exit')
+    _time_axis.add_arguments(parser)
+
+    return parser.parse_args()
+
+# one row per label of the dims other than 'sample', the point estimate or the mean and percentiles over the samples
+def to_table(array):
+    '''
+    :param array: LabelledArray with a 'sample' dim
+    :return: DataFrame indexed by the labels of the other dims
+    '''
+    array = array.transpose('sample', *[d for d in array.dims if d != 'sample'])
+    if array.shape[0] > 1:
+        return summarize(array)
+    dims = array.dims[1:]
+    index = pd.MultiIndex.from_product([array.coords[d] for d in dims], names=dims)
+    return pd.DataFrame({'value': array.values.reshape(-1)}, index=index)
+
+# run every region of a package in one batch, and sum the regions of each group
+def run_regional(tp, scen, path, spec=None, n=1, seed=0, chunk_size=64, save=True, axis=None):
+    '''
+    :param path: folder of the regional input package
+    :param spec: {parameter: [distribution, *arguments]} shared by the regions, the point estimates are used if None
+    :return: {output: LabelledArray ('region', 'sample', ...)} of the regions, the same for the groups
+    '''
+    _, groups = read_manifest(path)
+    model = BatchModel(tp, scen, inputs=load_regional_inputs(path), axis=axis)
+    params = sample_parameters(spec, n, seed) if spec is not None else {}
+    results = model.run(params, n=n if spec is not None else 1, chunk_size=chunk_size)
+    totals = get_group_totals(results, groups)
+    if save:
+        for folder, values in [('results/regions', results), ('results/regions/totals', totals)]:
+            os.makedirs(folder, exist_ok=True)
+            for k, v in values.items():
+                to_table(v).to_csv(os.path.join(folder, '{}_{}_{}.csv'.format(k, tp, scen)))
+    return results, totals
+
+"""
+=================
+Scenario analysis
+=================
+"""
+if __name__ == '__main__':
+    args = get_parser()
+    if args.list:
+        workbooks, groups = read_manifest(args.regions)
+        for region, path in workbooks.items():
+            print(region, path)
+        for group, regions in groups.items():
+            print(group, ', '.join(regions))
+    else:
+        spec = None
+        if args.spec is not None:
+            with open(args.spec) as f:
+                spec = json.load(f)
+        # the regions share their years, the time axis is the one of the first region
+        first_inputs = next(iter(load_regional_inputs(args.regions).values()))
+        run_regional(args.tp, args.scen, args.regions, spec, args.n, seed=args.seed, chunk_size=args.chunk,
+                     axis=_time_axis.get_time_axis(first_inputs, end_year=args.end_year, step=args.step))
@@ -0,0 +1,227 @@
+"""
+This script is used to sweep the EoL treatment shares of chosen materials over a grid of rates
+
+It contains:
+- a grid of rates of one EoL treatment (closed-loop recycling by default) for chosen materials, e.g. 0-100% in 1% steps,
+  applied to an EoL strategy of the recy_rate_new sheet; the other treatments of these materials keep their relative shares
+- the material inflows and EoL outflows of capacity_onshore/capacity_offshore, computed once for all grid points
+- the virgin material demand (as c_onshore_EoL/c_offshore_EoL) and the energy/CO2 impact (as d_onshore_env_impact/
+  d_offshore_env_impact) of every grid point in one batched pass, the grid points taking the place of the EoL strategies
+- the first grid point reaching a target, e.g. the lowest recycling rate keeping the cumulative virgin Nd and Dy demand under X
+
+e.g. python h_recycling_sweep.py --materials Nd Dy --tp 0 --scen GNZ
+     python h_recycling_sweep.py --materials Composites --rates 0 1 0.05 --metric 'CO2 net' --target 20
+     python h_recycling_sweep.py --materials Composites Nd --product
+
+The cumulative results of every grid point are saved in results/recycling_sweep/, onshore, offshore and their total.
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+import os
+import argparse
+import numpy as np
+
+from _utils import pd, get_strategy_tensor
+from _inputs import get_model_inputs
+from _labelled import LabelledArray
+from _impact import IMPACTS, NET_IMPACTS, get_recycled_supply, get_env_impact
+from b_onshore_material import capacity_onshore
+from b_offshore_material import capacity_offshore
+import _time_axis
+
+SITES = ['onshore', 'offshore']
+
+"""
+================
+Define functions
+================
+"""
+def get_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--materials', type=str, nargs='+', required=True, help='Materials whose treatment share is swept, e.g. Nd Dy')
+    parser.add_argument('--treatment', type=str, default='Closed-loop recycling', help='EoL treatment whose share is swept')
+    parser.add_argument('--strategy', type=str, default='EoL_C', help='EoL strategy giving the shares of the other materials and treatments')
+    parser.add_argument('--rates', type=float, nargs=3, default=[0.0, 1.0, 0.01], metavar=('START', 'STOP', 'STEP'), help='Grid of rates')
+    parser.add_argument('--product', action='store_true', help='Every combination of the rates of the materials, otherwise they share one rate')
+    parser.add_argument('--metric', type=str, default='virgin', help="Column of the total results compared with --target, e.g. virgin, 'CO2 net' or 'Energy net'")
+    parser.add_argument('--target', type=float, default=None, help='Print the first grid point whose metric is at most this value')
+    parser.add_argument('--tp', type=int, default=0, help='The time period tp')
+    parser.add_argument('--scen', type=str, default='Gcam', choices=['Gcam', 'GNZ'])
+    parser.add_argument('--strategies', type=str, default=None, help='csv file of EoL strategies added to those of the recy_rate_new sheet, see _inputs.load_eol_strategies')
+    parser.add_argument('--chunk', type=int, default=1024, help='Number of grid points evaluated together')
+    _time_axis.add_arguments(parser)
+
+    return parser.parse_args()
+
+# rates of every grid point, one column per swept material
+def get_rate_grid(n_materials, start=0.0, stop=1.0, step=0.01, product=False):
+    '''
+    :param n_materials: number of swept materials
+    :param start, stop, step: rates start + k * step up to stop, stop being a grid point only if the step falls on it
+    :param product: every combination of the rates of the materials, otherwise the materials share the same rate
+    :return: [grid point, material] rates
+    '''
+    if step <= 0:
+        raise ValueError('The step of the rates must be positive, got {:g}'.format(step))
+    if stop < start:
+        raise ValueError('The rates must start before they stop, got {:g} to {:g}'.format(start, stop))
+    # a step falling on stop up to rounding keeps it as the last grid point
+    n = int(np.floor((stop - start) / step + 1e-9)) + 1
+    rates = np.minimum(start + step * np.arange(n), stop)
+    if rates.min() < 0 or rates.max() > 1:
+        raise ValueError('The rates must be within 0 and 1, got {:g} to {:g}'.format(rates.min(), rates.max()))
+    if product:
+        return np.stack(np.meshgrid(*[rates] * n_materials, indexing='ij'), axis=-1).reshape(-1, n_materials)
+    return np.repeat(rates[:, None], n_materials, axis=1)
+
+# treatment shares of every grid point, the swept treatment set to the rates and the other treatments scaled to the rest
+def get_swept_shares(shares, columns, treatment, rates):
+    '''
+    :param shares: [material, treatment] shares of the EoL strategy
+    :param columns: indices of the swept materials
+    :param treatment: index of the swept treatment
+    :param rates: [grid point, swept material] rates, see get_rate_grid
+    :return: [grid point, material, treatment] shares
+    '''
+    shares = np.asarray(shares, dtype=float)
+    n_treatments = shares.shape[1]
+    base = shares[columns]
+    others = base.sum(axis=1) - base[:, treatment]
+    # the other treatments keep their relative shares, the rest goes to the last other treatment (landfill) if they are all zero
+    fallback = np.eye(n_treatments)[n_treatments - 1 if treatment != n_treatments - 1 else n_treatments - 2]
+    weights = np.where(others[:, None] > 0, base / np.where(others > 0, others, 1)[:, None], fallback)
+    weights[:, treatment] = 0
+    swept = np.repeat(shares[None], len(rates), axis=0)
+    swept[:, columns] = (1 - rates)[..., None] * weights
+    swept[:, columns, treatment] = rates
+    return swept
+
+# material inflows and EoL outflows of one site, shared by every grid point
+def get_site_flows(tp, scen, site, inputs, material=None, axis=None):
+    '''
+    :param site: 'onshore' or 'offshore'
+    :param material: output of capacity_onshore/capacity_offshore for (tp, scen), computed if not given
+    :return: {'year', 'materials', 'inflow': [year, material] material demand with the replacements (t),
+              'outflow': [year, material] EoL outflow of the EoL stage (t), 'impact_outflow': [year, material] EoL outflow of the impact stage (t),
+              'n_history': number of historical periods left out of the virgin demand}
+    '''
+    capacity = capacity_onshore if site == 'onshore' else capacity_offshore
+    mass_by_year, rep_mass, ratio = material if material is not None else capacity(tp=tp, scen=scen, inputs=inputs, plot=False, axis=axis)
+    df = pd.DataFrame(mass_by_year).T.sort_index()
+    inflow = df.values + rep_mass
+    return {'year': list(df.index), 'materials': list(df.columns), 'inflow': inflow,
+            'outflow': ratio['ratio'].dot_cohorts(df.values) + rep_mass,
+            # the impact stages count the replacements in the mass of the cohorts too
+            'impact_outflow': ratio['ratio'].dot_cohorts(inflow) + rep_mass,
+            'n_history': ratio['axis'].n_history if site == 'onshore' else 0}
+
+# virgin material demand and energy/CO2 impact of every grid point of one site
+def sweep_site(flows, shares, env_impact, carry_over, chunk_size=1024):
+    '''
+    :param flows: see get_site_flows
+    :param shares: [grid point, material, treatment] shares, see get_swept_shares
+    :param env_impact: {column of the envir_impact sheet: {material group: factor}}
+    :param carry_over: the recycled mass exceeding the demand of a year is used the next years (onshore)
+    :return: LabelledArray [point, year, material] virgin demand (Mt), LabelledArray [point, year, impact] energy (PJ) and CO2 (Mt)
+    '''
+    closed_loop = shares[..., 0] # [point, material]
+    H = flows['n_history']
+    points = list(range(len(shares)))
+    # demand minus the closed-loop recycled outflow, over the future periods onshore
+    virgin = (flows['inflow'][None, H:] - flows['outflow'][None, H:] * closed_loop[:, None]) / 1e6
+    impact = []
+    for i in range(0, len(shares), chunk_size):
+        recycled, _ = get_recycled_supply(flows['impact_outflow'], closed_loop[i:i + chunk_size], flows['inflow'], carry_over=carry_over)
+        chunk = get_env_impact(flows['inflow'], recycled, flows['materials'], env_impact, points[i:i + chunk_size], flows['year'])
+        impact.append(chunk.sum('category').values)
+    virgin = LabelledArray(virgin, ('point', 'year', 'material'), {'point': points, 'year': flows['year'][H:], 'material': flows['materials']})
+    impact = LabelledArray(np.concatenate(impact), ('point', 'year', 'impact'), {'point': points, 'year': flows['year'], 'impact': IMPACTS + NET_IMPACTS})
+    return virgin, impact
+
+# cumulative virgin demand of the swept materials and cumulative energy/CO2 of every grid point
+def summarize_sweep(rates, materials, virgin, impact):
+    '''
+    :param rates: [grid point, swept material] rates
+    :return: DataFrame indexed by the grid point: the rate of each swept material, their virgin demand and its sum 'virgin' (Mt),
+             then the energy (PJ) and CO2 (Mt) impacts summed over the years
+    '''
+    df = pd.DataFrame(rates, columns=['rate {}'.format(m) for m in materials])
+    for m in materials:
+        df['virgin {}'.format(m)] = virgin.sel(material=m).values.sum(axis=1)
+    df['virgin'] = df[['virgin {}'.format(m) for m in materials]].sum(axis=1)
+    for k in impact.coords['impact']:
+        df[k] = impact.sel(impact=k).values.sum(axis=1)
+    df.index.name = 'point'
+    return df
+
+# first grid point whose metric is at most the target, None if no grid point reaches it
+def find_target(summary, metric, target):
+    reached = np.flatnonzero(summary[metric].values <= target)
+    return summary.iloc[reached[0]] if len(reached) else None
+
+# evaluate every grid point onshore and offshore, and save the cumulative results
+def run_sweep(tp, scen, materials, treatment='Closed-loop recycling', strategy='EoL_C', rates=(0.0, 1.0, 0.01), product=False,
+              inputs=None, material=None, chunk_size=1024, save=True, axis=None):
+    '''
+    :param materials: swept materials
+    :param treatment: swept EoL treatment, one of inputs.proc_methods
+    :param strategy: EoL strategy giving the shares of the other materials and treatments
+    :param rates: (start, stop, step) of the grid
+    :param material: {site: output of capacity_onshore/capacity_offshore for (tp, scen)}, computed if not given
+    :return: {site: {'virgin', 'impact'}} LabelledArrays with a leading 'point' dim, {site or 'total': summary DataFrame}
+    '''
+    inputs = inputs if inputs is not None else get_model_inputs()
+    if treatment not in inputs.proc_methods:
+        raise ValueError('Unknown treatment: {} (available: {})'.format(treatment, ', '.join(inputs.proc_methods)))
+    grid = get_rate_grid(len(materials), *rates, product=product)
+    material = material if material is not None else {}
+
+    results, summaries = {}, {}
+    for site in SITES:
+        flows = get_site_flows(tp, scen, site, inputs, material.get(site), axis)
+        unknown = [m for m in materials if m not in flows['materials']]
+        if unknown:
+            raise ValueError('Unknown materials: {} (available: {})'.format(', '.join(unknown), ', '.join(flows['materials'])))
+        strategies, shares = get_strategy_tensor(inputs.recy_table, site, flows['materials'])
+        if strategy not in strategies:
+            raise ValueError('Unknown EoL strategy: {} (available: {})'.format(strategy, ', '.join(strategies)))
+        shares = get_swept_shares(shares[strategies.index(strategy)], [flows['materials'].index(m) for m in materials],
+                                  list(inputs.proc_methods).index(treatment), grid)
+        virgin, impact = sweep_site(flows, shares, inputs.env_impact, carry_over=site == 'onshore', chunk_size=chunk_size)
+        results[site] = {'virgin': virgin, 'impact': impact}
+        summaries[site] = summarize_sweep(grid, materials, virgin, impact)
+
+    # the rates are shared by the sites, the cumulative results add up
+    total = summaries['onshore'].copy()
+    total.iloc[:, len(materials):] += summaries['offshore'].iloc[:, len(materials):]
+    summaries['total'] = total
+    if save:
+        os.makedirs('results/recycling_sweep', exist_ok=True)
+        for site, df in summaries.items():
+            df.to_csv('results/recycling_sweep/{}_{}_{}_{}_{}.csv'.format(site, '_'.join(materials), strategy, tp, scen))
+    return results, summaries
+
+"""
+=================
+Scenario analysis
+=================
+"""
+if __name__ == '__main__':
+    args = get_parser()
+    inputs = get_model_inputs(strategies=args.strategies)
+    results, summaries = run_sweep(args.tp, args.scen, args.materials, treatment=args.treatment, strategy=args.strategy,
+                                   rates=args.rates, product=args.product, inputs=inputs, chunk_size=args.chunk,
+                                   axis=_time_axis.get_time_axis(inputs, end_year=args.end_year, step=args.step))
+    print('{} grid points saved in results/recycling_sweep/'.format(len(summaries['total'])))
+    if args.target is not None:
+        point = find_target(summaries['total'], args.metric, args.target)
+        if point is None:
+            print('No grid point reaches {} <= {:g}'.format(args.metric, args.target))
+        else:
+            print('First grid point with {} <= {:g}:'.format(args.metric, args.target))
+            print(point.to_string())
@@ -0,0 +1,324 @@
+"""
+This script is used to time every stage of the model and to detect slowdowns against stored baselines
+
+It contains:
+- cold (xls parsed, no binary cache) and warm (binary cache) loading of the model inputs
+- each stage on its own: capacity flow, historical fleet, material, EoL and environmental impact of one scenario
+- the full sweep of every tech and energy demand scenario through the pipeline (no figures, no cache)
+- one scenario through the pipeline at a monthly step up to 2100
+- scaled synthetic inputs: a fleet repeated --scale times, --scale x 100 capacity scenarios and Monte Carlo draws,
+  --scale regions evaluated in one regional batch, --scale x 100 recycling rates of a sweep
+- comparison with the baseline json, failing when a benchmark is more than --threshold times slower
+
+e.g. python run_benchmarks.py
+     python run_benchmarks.py --bench capacity onshore --repeat 10
+     python run_benchmarks.py --save-baseline
+
+The results are saved in a ResultsStore while timing, so no csv file or figure is written.
+Exits with status 1 if a benchmark regressed.
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import argparse
+import platform
+import tempfile
+import collections
+import numpy as np
+
+import _inputs
+import _input_cache
+from _inputs import get_model_inputs
+from _results_store import ResultsStore, use_store
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+
+# slowdowns smaller than this (in s) are ignored, they are within the timer noise of the short benchmarks
+MIN_DELTA = 0.005
+
+"""
+================
+Define functions
+================
+"""
+def get_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bench', type=str, nargs='+', default=None,
+                        help='Benchmarks to run (name or prefix), one of: {}'.format(', '.join(BENCHMARKS)))
+    parser.add_argument('--repeat', type=int, default=5, help='Number of runs per benchmark, the fastest is compared')
+    parser.add_argument('--scale', type=int, default=10, help='Size multiplier of the synthetic inputs')
+    parser.add_argument('--baseline', type=str, default=DEFAULT_BASELINE, help='Baseline json file')
+    parser.add_argument('--threshold', type=float, default=1.5, help='Fail if a benchmark is this many times slower than its baseline')
+    parser.add_argument('--save-baseline', action='store_true', help='Save the measurements as the new baseline')
+    parser.add_argument('--json', type=str, default=None, help='Save the measurements to this json file')
+
+    return parser.parse_args()
+
+# forget the workbooks and inputs loaded in this process
+def clear_input_memos():
+    for memo in [_input_cache._HASHES, _input_cache._WORKBOOKS, _input_cache._FRAMES, _input_cache._SHEET_HASHES, _inputs._MODEL_INPUTS]:
+        memo.clear()
+
+# copy of the workbook in a temporary folder, so its binary cache can be removed without touching input_data/.cache
+def get_workbook_copy(path=_input_cache.DEFAULT_PATH):
+    tmp_dir = tempfile.mkdtemp(prefix='bench_')
+    atexit.register(shutil.rmtree, tmp_dir, ignore_errors=True)
+    tmp_path = os.path.join(tmp_dir, os.path.basename(path))
+    shutil.copy(path, tmp_path)
+    return tmp_path
+
+def bench_inputs_cold(inputs, scale):
+    path = get_workbook_copy()
+    def reset():
+        clear_input_memos()
+        shutil.rmtree(os.path.join(os.path.dirname(path), _input_cache.CACHE_DIR_NAME), ignore_errors=True)
+    return lambda: _inputs.load_model_inputs(path), reset
+
+def bench_inputs_warm(inputs, scale):
+    path = get_workbook_copy()
+    _inputs.load_model_inputs(path)
+    return lambda: _inputs.load_model_inputs(path), clear_input_memos
+
+def bench_load_original_data(inputs, scale):
+    return lambda: _inputs.load_original_data(inputs.excel_path), None
+
+def bench_capacity_flow(inputs, scale):
+    from a_capacity_flow import CapacityFlow
+    model = CapacityFlow(inputs=inputs, banded=True)
+    return lambda: model(0, 'Gcam'), None
+
+def bench_capacity_flow_dense(inputs, scale):
+    from a_capacity_flow import CapacityFlow
+    model = CapacityFlow(inputs=inputs)
+    return lambda: model(0, 'Gcam'), None
+
+def bench_material_by_year(inputs, scale):
+    from _utils import calculate_material_mass_by_year
+    return lambda: calculate_material_mass_by_year(*inputs.historical_fleet, inputs.onshore_dict), None
+
+def bench_capacity_onshore(inputs, scale):
+    from a_capacity_flow import CapacityFlow
+    from b_onshore_material import capacity_onshore
+    flow = CapacityFlow(inputs=inputs, banded=True)(0, 'Gcam')
+    return lambda: capacity_onshore(0, 'Gcam', inputs=inputs, flow=flow, plot=False), None
+
+def bench_capacity_offshore(inputs, scale):
+    from a_capacity_flow import CapacityFlow
+    from b_offshore_material import capacity_offshore
+    flow = CapacityFlow(inputs=inputs, banded=True)(0, 'Gcam')
+    return lambda: capacity_offshore(0, 'Gcam', inputs=inputs, flow=flow, plot=False), None
+
+def bench_onshore_eol(inputs, scale):
+    from b_onshore_material import capacity_onshore
+    from c_onshore_EoL import get_onshore_eol
+    material = capacity_onshore(0, 'Gcam', inputs=inputs, plot=False)
+    return lambda: get_onshore_eol(0, 'Gcam', inputs=inputs, material=material, plot=False), None
+
+def bench_onshore_tech_eol(inputs, scale):
+    from b_onshore_material import capacity_onshore
+    from c_onshore_tech_EoL import get_onshore_tech_eol
+    material = capacity_onshore(0, 'Gcam', inputs=inputs, plot=False)
+    return lambda: get_onshore_tech_eol(0, 'Gcam', inputs=inputs, material=material, plot=False), None
+
+def bench_offshore_eol(inputs, scale):
+    from b_offshore_material import capacity_offshore
+    from c_offshore_EoL import get_offshore_eol
+    material = capacity_offshore(0, 'Gcam', inputs=inputs, plot=False)
+    return lambda: get_offshore_eol(0, 'Gcam', inputs=inputs, material=material, plot=False), None
+
+def bench_onshore_env_impact(inputs, scale):
+    from b_onshore_material import capacity_onshore
+    from d_onshore_env_impact import get_onshore_env_impact
+    material = capacity_onshore(0, 'Gcam', inputs=inputs, plot=False)
+    return lambda: get_onshore_env_impact(0, 'Gcam', inputs=inputs, material=material, plot=False), None
+
+def bench_offshore_env_impact(inputs, scale):
+    from b_offshore_material import capacity_offshore
+    from d_offshore_env_impact import get_offshore_env_impact
+    material = capacity_offshore(0, 'Gcam', inputs=inputs, plot=False)
+    return lambda: get_offshore_env_impact(0, 'Gcam', inputs=inputs, material=material, plot=False), None
+
+def bench_total_env_impact(inputs, scale):
+    from d_onshore_env_impact import get_onshore_env_impact
+    from d_offshore_env_impact import get_offshore_env_impact
+    from d_total_env_impact import get_total_env_impact
+    onshore_env = get_onshore_env_impact(0, 'Gcam', inputs=inputs, plot=False)
+    offshore_env = get_offshore_env_impact(0, 'Gcam', inputs=inputs, plot=False)
+    return lambda: get_total_env_impact(0, 'Gcam', inputs=inputs, onshore_env=onshore_env, offshore_env=offshore_env, plot=False), None
+
+def bench_sweep(inputs, scale):
+    from _pipeline import Pipeline
+    return lambda: Pipeline(inputs=inputs, plot=False).run(), None
+
+def bench_horizon_monthly(inputs, scale):
+    from _pipeline import Pipeline
+    from _time_axis import get_time_axis
+    axis = get_time_axis(inputs, end_year=2100, step='monthly')
+    return lambda: Pipeline(inputs=inputs, plot=False, axis=axis).run(tps=[0], scens=['Gcam']), None
+
+def bench_synthetic_fleet(inputs, scale):
+    from _utils import calculate_material_mass_by_year
+    fleet = [list(v) * scale for v in inputs.historical_fleet]
+    return lambda: calculate_material_mass_by_year(*fleet, inputs.onshore_dict), None
+
+def bench_synthetic_capacity_batch(inputs, scale):
+    from a_capacity_flow import CapacityFlow
+    model = CapacityFlow(inputs=inputs)
+    stock_onshore, stock_offshore = model.get_future_stock()
+    # scenarios drawn around the Gcam and GNZ stocks
+    factors = np.random.default_rng(0).uniform(0.8, 1.2, [50 * scale, 1])
+    stock_onshore, stock_offshore = np.tile(stock_onshore, [50 * scale, 1]), np.tile(stock_offshore, [50 * scale, 1])
+    return lambda: model.batch(stock_onshore * factors.repeat(2, axis=0), stock_offshore * factors.repeat(2, axis=0)), None
+
+def bench_synthetic_monte_carlo(inputs, scale):
+    from _batch_model import BatchModel
+    model = BatchModel(0, 'Gcam', inputs=inputs)
+    return lambda: model.run(n=100 * scale), None
+
+def bench_synthetic_recycling_sweep(inputs, scale):
+    from b_onshore_material import capacity_onshore
+    from b_offshore_material import capacity_offshore
+    from h_recycling_sweep import run_sweep
+    material = {'onshore': capacity_onshore(0, 'Gcam', inputs=inputs, plot=False), 'offshore': capacity_offshore(0, 'Gcam', inputs=inputs, plot=False)}
+    return lambda: run_sweep(0, 'Gcam', ['Composites', 'Nd', 'Dy'], rates=(0, 1, 1 / (100 * scale)), inputs=inputs, material=material, save=False), None
+
+def bench_synthetic_regions(inputs, scale):
+    from _batch_model import BatchModel
+    model = BatchModel(0, 'Gcam', inputs=collections.OrderedDict(('R{}'.format(i), inputs) for i in range(scale)))
+    return lambda: model.run(n=10), None
+
+BENCHMARKS = collections.OrderedDict([
+    ('inputs_cold', bench_inputs_cold),
+    ('inputs_warm', bench_inputs_warm),
+    ('load_original_data', bench_load_original_data),
+    ('capacity_flow', bench_capacity_flow),
+    ('capacity_flow_dense', bench_capacity_flow_dense),
+    ('material_by_year', bench_material_by_year),
+    ('capacity_onshore', bench_capacity_onshore),
+    ('capacity_offshore', bench_capacity_offshore),
+    ('onshore_eol', bench_onshore_eol),
+    ('onshore_tech_eol', bench_onshore_tech_eol),
+    ('offshore_eol', bench_offshore_eol),
+    ('onshore_env_impact', bench_onshore_env_impact),
+    ('offshore_env_impact', bench_offshore_env_impact),
+    ('total_env_impact', bench_total_env_impact),
+    ('sweep', bench_sweep),
+    ('horizon_monthly', bench_horizon_monthly),
+    ('synthetic_fleet', bench_synthetic_fleet),
+    ('synthetic_capacity_batch', bench_synthetic_capacity_batch),
+    ('synthetic_monte_carlo', bench_synthetic_monte_carlo),
+    ('synthetic_regions', bench_synthetic_regions),
+    ('synthetic_recycling_sweep', bench_synthetic_recycling_sweep),
+])
+
+# names of the benchmarks matching the names or prefixes
+def select_benchmarks(names=None):
+    if names is None:
+        return list(BENCHMARKS)
+    selected = []
+    for name in names:
+        matches = [b for b in BENCHMARKS if b == name or b.startswith(name)]
+        if len(matches) == 0:
+            raise ValueError('Unknown benchmark: {} (available: {})'.format(name, ', '.join(BENCHMARKS)))
+        selected += [b for b in matches if b not in selected]
+    return selected
+
+# time a benchmark, the setup and a warm-up run are not timed and reset runs before every run
+def time_benchmark(name, inputs, repeat=5, scale=10):
+    '''
+    :param name: name of the benchmark
+    :param repeat: number of timed runs
+    :return: {'min': s, 'median': s, 'runs': repeat}
+    '''
+    func, reset = BENCHMARKS[name](inputs, scale)
+    # one-time costs (lazy imports, first-call allocations) are paid by the warm-up run
+    if reset is not None:
+        reset()
+    func()
+    times = []
+    for _ in range(repeat):
+        if reset is not None:
+            reset()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': float(np.median(times)), 'runs': repeat}
+
+# run the benchmarks, every table saved by the model goes to a throw-away store
+def run_benchmarks(names=None, repeat=5, scale=10, verbose=False):
+    inputs = get_model_inputs()
+    results = collections.OrderedDict()
+    with use_store(ResultsStore()):
+        for name in select_benchmarks(names):
+            results[name] = time_benchmark(name, inputs, repeat, scale)
+            if verbose:
+                print('{:<28}{:>10.4f}{:>10.4f}'.format(name, results[name]['min'], results[name]['median']))
+    return results
+
+# benchmarks whose fastest run is more than threshold times (and MIN_DELTA s) slower than the baseline
+def compare_to_baseline(results, baseline, threshold=1.5):
+    '''
+    :param results: {name: {'min': s, ...}}
+    :param baseline: {name: {'min': s, ...}}
+    :return: {name: ratio to the baseline}, [names of the regressions]
+    '''
+    ratios, regressions = collections.OrderedDict(), []
+    for name, r in results.items():
+        if name not in baseline:
+            continue
+        ratios[name] = r['min'] / baseline[name]['min']
+        if ratios[name] > threshold and r['min'] - baseline[name]['min'] > MIN_DELTA:
+            regressions.append(name)
+    return ratios, regressions
+
+def get_machine():
+    return {'platform': platform.platform(), 'python': platform.python_version(), 'numpy': np.__version__, 'cpus': os.cpu_count()}
+
+"""
+=================
+Scenario analysis
+=================
+"""
+if __name__ == '__main__':
+    args = get_parser()
+    print('{:<28}{:>10}{:>10}'.format('benchmark', 'min (s)', 'median'))
+    results = run_benchmarks(args.bench, args.repeat, args.scale, verbose=True)
+    measurements = {'machine': get_machine(), 'scale': args.scale, 'benchmarks': results}
+    if args.json is not None:
+        os.makedirs(os.path.dirname(args.json) or '.', exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump(measurements, f, indent=2)
+    regressions = []
+    if args.save_baseline:
+        # benchmarks not run this time keep their previous baseline
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                previous = json.load(f)
+            if previous.get('scale') == args.scale:
+                measurements['benchmarks'] = collections.OrderedDict(list(previous['benchmarks'].items()) + list(results.items()))
+        with open(args.baseline, 'w') as f:
+            json.dump(measurements, f, indent=2)
+        print('Baseline saved to {}'.format(args.baseline))
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('scale') != args.scale:
+            print('The baseline was measured with --scale {}, the synthetic benchmarks are not compared'.format(baseline.get('scale')))
+            baseline['benchmarks'] = {k: v for k, v in baseline['benchmarks'].items() if not k.startswith('synthetic')}
+        ratios, regressions = compare_to_baseline(results, baseline['benchmarks'], args.threshold)
+        print('\n{:<28}{:>10}'.format('benchmark', 'x baseline'))
+        for name, ratio in ratios.items():
+            print('{:<28}{:>10.2f}{}'.format(name, ratio, '  REGRESSION' if name in regressions else ''))
+    else:
+        print('No baseline at {}, run with --save-baseline to create it'.format(args.baseline))
+    sys.exit(1 if len(regressions) > 0 else 0)
@@ -0,0 +1,86 @@
+"""
+This script is used to run every stage of the model for every scenario in a single process
+
+It contains:
+- the same experiments as run_all_experiments.sh, each (stage, tp, scen) computed once
+- selection of stages, tech scenarios and energy demand scenarios from the command line
+- --no-plots to compute and save the results only, without importing matplotlib
+- --store to write every result table of the run into one compressed file instead of the csv files,
+  --export to write the csv files of such a file in the legacy layout
+- the results of every (stage, tp, scen) are cached in results/.cache, a stage is only computed again when
+  the input sheets it reads (or the stages it depends on) changed, --no-cache computes everything
+- --end-year/--step to run the model up to another year or at a quarterly/monthly time step
+- --profile/--trace to write the time and memory of each step as a json report/Chrome trace
+
+e.g. python run_pipeline.py --stages c d_total --tp 0 1 --scen GNZ --workers 4
+     python run_pipeline.py --no-plots --store results/sweep.npz
+     python run_pipeline.py --export results/sweep.npz
+     python run_pipeline.py --no-plots --end-year 2100 --step monthly --store results/sweep_2100_monthly.npz
+
+"""
+
+"""
+================
+Import libraries
+================
+"""
+import argparse
+
+from _inputs import get_model_inputs
+from _pipeline import Pipeline, STAGES, TECH_SCENARIOS, CAPACITY_SCENARIOS, DEFAULT_CACHE_DIR
+from _results_store import ResultsStore
+from _instrument import add_arguments, setup
+import _time_axis
+
+"""
+================
+Define functions
+================
+"""
+def get_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stages', type=str, nargs='+', default=None,
+                        help='Stages to run (name or prefix, dependencies are added), one of: {}. Every stage but {} by default'.format(
+                            ', '.join(STAGES), ', '.join(s for s in STAGES if STAGES[s].opt_in)))
+    parser.add_argument('--tp', type=int, nargs='+', default=TECH_SCENARIOS, help='The tech scenarios tp')
+    parser.add_argument('--scen', type=str, nargs='+', default=CAPACITY_SCENARIOS, choices=CAPACITY_SCENARIOS)
+    parser.add_argument('--workers', type=int, default=1, help='Number of worker processes, 1 runs in this process, 0 uses every core')
+    parser.add_argument('--list', action='store_true', help='Print the nodes to run and exit')
+    parser.add_argument('--no-plots', action='store_true', help='Only compute and save the results, matplotlib is not imported')
+    parser.add_argument('--store', type=str, default=None, help='Write the result tables to this .npz file instead of the csv files')
+    parser.add_argument('--export', type=str, default=None, help='Write the csv files of a .npz results store to results/ and exit')
+    parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR, help='Folder of the cached stage results')
+    parser.add_argument('--no-cache', action='store_true', help='Compute every stage, without reading or writing the cache')
+    parser.add_argument('--strategies', type=str, default=None, help='csv file of EoL strategies added to those of the recy_rate_new sheet, see _inputs.load_eol_strategies')
+    _time_axis.add_arguments(parser)
+    add_arguments(parser)
+
+    return parser.parse_args()
+
+"""
+=================
+Scenario analysis
+=================
+"""
+if __name__ == '__main__':
+    args = get_parser()
+    setup(args.profile, args.trace, args.profile_alloc)
+    if args.export is not None:
+        paths = ResultsStore.load(args.export).export_csv()
+        print('Wrote {} csv files'.format(len(paths)))
+    else:
+        if not args.no_plots:
+            import matplotlib
+            matplotlib.use('Agg')
+        pipeline = Pipeline(inputs=get_model_inputs(strategies=args.strategies), plot=not args.no_plots, store=ResultsStore() if args.store is not None else None,
+                            cache_dir=None if args.no_cache else args.cache_dir,
+                            axis=_time_axis.get_time_axis(end_year=args.end_year, step=args.step))
+        if args.list:
+            for node in pipeline.nodes(args.stages, args.tp, args.scen):
+                print(*node)
+        elif args.workers == 1:
+            pipeline.run(args.stages, args.tp, args.scen, verbose=True)
+        else:
+            pipeline.run_parallel(args.stages, args.tp, args.scen, max_workers=args.workers or None, verbose=True)
+        if args.store is not None and not args.list:
+            pipeline.store.save(args.store)